@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Trip, Stop, Itinerary, Expense, SuggestedEvent, MyActivity
+from .models import Trip, Stop, Itinerary, Expense, SuggestedEvent, MyActivity, ExchangeRate, GenerationJob, FlightInfo
 
 # Register your models here.
 admin.site.register(Trip)
@@ -8,3 +8,6 @@ admin.site.register(Itinerary)
 admin.site.register(Expense)
 admin.site.register(SuggestedEvent)
 admin.site.register(MyActivity)
+admin.site.register(ExchangeRate)
+admin.site.register(GenerationJob)
+admin.site.register(FlightInfo)
@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+
+def restore_sqlite_search(using, **kwargs):
+    """
+    SQLite rebuilds tables for most schema changes, which silently drops the
+    FTS triggers on api_myactivity, and flush leaves the FTS table stale.
+    Reinstall and re-index after every migrate/flush.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    if ('api', '0021_myactivity_search') not in MigrationRecorder(connection).applied_migrations():
+        return
+    from .search import install_sqlite_fts
+    install_sqlite_fts(connection)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        post_migrate.connect(restore_sqlite_search, sender=self)
+        from .versioning import connect_signals
+        connect_signals()
@@ -0,0 +1,280 @@
+# api/benchmark.py
+"""
+Offline API benchmark: a synthetic data generator, a set of endpoint
+scenarios, and a runner that records latency percentiles and query counts
+per scenario through the test client. External services are stubbed, so a
+run needs no network access. Driven by `manage.py benchmark_api`.
+"""
+import contextlib
+import io
+import logging
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from .destinations import normalize_destination
+from .models import Trip, Stop, Itinerary, Expense, TravelMethod, MyActivity, SuggestedEvent
+
+DESTINATIONS = ['Paris', 'Tokyo', 'Singapore', 'New York', 'Lisbon', 'Bangkok', 'Rome', 'Sydney']
+CATEGORIES = ['Food', 'Transport', 'Accommodation', 'Activities', 'Shopping', 'Other']
+CURRENCIES = ['USD', 'EUR', 'SGD', 'JPY']
+MODES = ['WALK', 'BUS', 'TRAIN', 'CYCLE', 'DRIVE', 'PRIVATE_HIRE']
+TRAVELERS = ['Alice', 'Bob', 'Carol', 'Dan']
+
+STUB_EVENTS = [
+    {'name': 'Old town walking tour', 'category': 'Tour', 'duration': 2.0, 'estimatedCost': 20,
+     'description': 'Guided walk through the historic centre'},
+    {'name': 'Street food market', 'category': 'Food', 'duration': 1.5, 'estimatedCost': 15,
+     'description': 'Local dishes from a dozen stalls'},
+]
+STUB_FLIGHT = {
+    'flight_status': 'scheduled',
+    'departure': {'airport': 'Singapore Changi', 'iata': 'SIN', 'scheduled': '2026-05-01T08:00:00+00:00'},
+    'arrival': {'airport': 'Paris Charles de Gaulle', 'iata': 'CDG', 'scheduled': '2026-05-01T15:00:00+00:00'},
+    'airline': {'name': 'Singapore Airlines'},
+}
+
+
+def generate_dataset(trips=200, items_per_trip=20, expenses_per_trip=100, travel_methods_per_trip=None,
+                     activities_per_trip=5, chunk_size=100, seed=0):
+    """
+    Bulk-insert a synthetic data set, `chunk_size` trips at a time so memory
+    stays flat however large it gets. Travel methods default to one leg
+    between each pair of consecutive itinerary items. Returns row counts.
+    """
+    rng = random.Random(seed)
+    if travel_methods_per_trip is None:
+        travel_methods_per_trip = max(items_per_trip - 1, 0)
+    start = date(2026, 5, 1)
+    days = 7
+
+    for first in range(0, trips, chunk_size):
+        batch = Trip.objects.bulk_create([
+            Trip(
+                name=f'Benchmark trip {n}', destination=rng.choice(DESTINATIONS),
+                start_date=start, end_date=start + timedelta(days=days - 1),
+                budget=Decimal(rng.randrange(500, 5000)), currency=rng.choice(CURRENCIES),
+                travelers=TRAVELERS[:rng.randint(1, len(TRAVELERS))],
+            )
+            for n in range(first, min(first + chunk_size, trips))
+        ])
+
+        stops, items = [], []
+        for trip in batch:
+            for i in range(items_per_trip):
+                day = i * days // max(items_per_trip, 1)
+                stops.append(Stop(
+                    trip=trip, name=f'Stop {i}', latitude=rng.uniform(-60, 60), longitude=rng.uniform(-180, 180),
+                    day=day + 1, order=i,
+                ))
+                items.append(Itinerary(
+                    trip=trip, date=start + timedelta(days=day), position=i, location=f'Place {i}',
+                    activity='Sightseeing', duration=Decimal('1.50'), estimated_cost=Decimal(rng.randrange(0, 80)),
+                ))
+        Stop.objects.bulk_create(stops, batch_size=1000)
+        Itinerary.objects.bulk_create(items, batch_size=1000)
+
+        legs, expenses, activities = [], [], []
+        for t, trip in enumerate(batch):
+            trip_items = items[t * items_per_trip:(t + 1) * items_per_trip]
+            for n in range(min(travel_methods_per_trip, len(trip_items) - 1) if trip_items else 0):
+                legs.append(TravelMethod(
+                    trip=trip, from_stop=trip_items[n], to_stop=trip_items[n + 1], mode=rng.choice(MODES),
+                    distance=Decimal(rng.randrange(1, 300)) / 10, duration=Decimal(rng.randrange(5, 90)),
+                ))
+            for n in range(expenses_per_trip):
+                payer = rng.choice(trip.travelers)
+                expenses.append(Expense(
+                    trip=trip, description=f'Expense {n}', amount=Decimal(rng.randrange(100, 20000)) / 100,
+                    currency=rng.choice(CURRENCIES), category=rng.choice(CATEGORIES),
+                    date=start + timedelta(days=rng.randrange(days)), paid_by=payer,
+                    split_between=list(trip.travelers),
+                ))
+            for n in range(activities_per_trip):
+                activities.append(MyActivity(
+                    trip=trip, place=f'{trip.destination} spot {n}', activity='Worth a visit',
+                    recommended_time=Decimal('2.00'), cost=Decimal(rng.randrange(0, 60)),
+                ))
+        TravelMethod.objects.bulk_create(legs, batch_size=1000)
+        Expense.objects.bulk_create(expenses, batch_size=1000)
+        MyActivity.objects.bulk_create(activities, batch_size=1000)
+
+    for destination in DESTINATIONS:
+        SuggestedEvent.objects.update_or_create(
+            destination_key=normalize_destination(destination),
+            defaults={'destination': destination, 'events_data': STUB_EVENTS},
+        )
+    return dataset_counts()
+
+
+def dataset_counts():
+    return {
+        'trips': Trip.objects.count(),
+        'itinerary': Itinerary.objects.count(),
+        'expenses': Expense.objects.count(),
+        'travel_methods': TravelMethod.objects.count(),
+        'my_activities': MyActivity.objects.count(),
+    }
+
+
+class Scenario:
+    def __init__(self, name, method, path, body=None):
+        self.name = name
+        self.method = method
+        self.path = path    # callable(context, iteration) -> URL
+        self.body = body    # callable(context, iteration) -> JSON payload, or None
+
+    def request(self, client, context, iteration):
+        path = self.path(context, iteration)
+        body = self.body(context, iteration) if self.body else None
+        return getattr(client, self.method.lower())(path, body, format='json'), path
+
+
+def _trip(context, i):
+    return context['trip_ids'][i % len(context['trip_ids'])]
+
+
+def _item(context, i):
+    return context['item_ids'][i % len(context['item_ids'])]
+
+
+def _expenses_payload(context, i):
+    return [
+        {'trip': _trip(context, i), 'description': f'Bulk {n}', 'amount': '12.50', 'currency': 'EUR',
+         'category': 'Food', 'date': '2026-05-02', 'paid_by': 'Alice', 'split_between': ['Alice']}
+        for n in range(100)
+    ]
+
+
+SCENARIOS = [
+    Scenario('trip list', 'GET', lambda c, i: '/api/trips/'),
+    Scenario('trip list (sparse)', 'GET', lambda c, i: '/api/trips/?fields=id,name,start_date,end_date'),
+    Scenario('trip detail', 'GET', lambda c, i: f'/api/trips/{_trip(c, i)}/'),
+    Scenario('trip bundle', 'GET', lambda c, i: f'/api/trips/{_trip(c, i)}/bundle/'),
+    Scenario('trip itinerary', 'GET', lambda c, i: f'/api/trips/{_trip(c, i)}/itinerary/'),
+    Scenario('trip travel methods', 'GET', lambda c, i: f'/api/trips/{_trip(c, i)}/travel-methods/'),
+    Scenario('trip my activities', 'GET', lambda c, i: f'/api/trips/{_trip(c, i)}/my-activities/'),
+    Scenario('expense summary', 'GET', lambda c, i: f'/api/trips/{_trip(c, i)}/expenses/summary/'),
+    Scenario('itinerary detail', 'GET', lambda c, i: f'/api/itinerary/{_item(c, i)}/'),
+    Scenario('itinerary create', 'POST', lambda c, i: '/api/itinerary/', lambda c, i: {
+        'trip': _trip(c, i), 'date': '2026-05-03', 'location': f'New place {i}',
+    }),
+    Scenario('itinerary update', 'PATCH', lambda c, i: f'/api/itinerary/{_item(c, i)}/', lambda c, i: {
+        'notes': f'Edited {i}',
+    }),
+    Scenario('travel method page', 'GET', lambda c, i: f'/api/travel-methods/?trip={_trip(c, i)}'),
+    Scenario('activity search', 'GET', lambda c, i: '/api/my-activities/search/?q=spot'),
+    Scenario('expense bulk create (100)', 'POST', lambda c, i: '/api/expenses/bulk/', _expenses_payload),
+    Scenario('generate events (cached)', 'POST', lambda c, i: '/api/generate-events/', lambda c, i: {
+        'destination': DESTINATIONS[i % len(DESTINATIONS)],
+    }),
+    Scenario('generate events (miss)', 'POST', lambda c, i: '/api/generate-events/', lambda c, i: {
+        'destination': f'Benchmark city {c["run_id"]}-{i}',
+    }),
+    Scenario('flight lookup', 'POST', lambda c, i: f'/api/trips/{_trip(c, i)}/flights/', lambda c, i: {
+        'flight_number': f'SQ{i % 50}', 'flight_date': '2026-05-01',
+    }),
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+@contextlib.contextmanager
+def stub_external_services(latency_ms=0):
+    """Replace the LLM and AviationStack calls with canned responses after an optional delay"""
+    def fake_llm(destination):
+        time.sleep(latency_ms / 1000)
+        return [dict(event, name=f"{event['name']} in {destination}") for event in STUB_EVENTS]
+
+    def fake_flight(flight_number):
+        time.sleep(latency_ms / 1000)
+        return dict(STUB_FLIGHT, flight={'iata': flight_number})
+
+    with mock.patch('api.views.generate_events_with_llm', side_effect=fake_llm), \
+            mock.patch('api.flight_info.fetch_flight_data', side_effect=fake_flight), \
+            override_settings(LLM_JOB_BACKEND='sync'):
+        yield
+
+
+@contextlib.contextmanager
+def _disabled(logger):
+    previous, logger.disabled = logger.disabled, True
+    try:
+        yield
+    finally:
+        logger.disabled = previous
+
+
+def run_scenarios(scenarios=None, iterations=20, warmup=2, sample_trips=50, stub_latency_ms=0):
+    """Time every scenario; returns one result dict per scenario"""
+    scenarios = SCENARIOS if scenarios is None else scenarios
+    client = APIClient()
+    context = {
+        'trip_ids': list(Trip.objects.order_by('?').values_list('pk', flat=True)[:sample_trips]),
+        'item_ids': list(Itinerary.objects.order_by('?').values_list('pk', flat=True)[:sample_trips]),
+        'run_id': int(time.time()),
+    }
+    if not context['trip_ids'] or not context['item_ids']:
+        raise ValueError('The benchmark needs at least one trip with itinerary items')
+
+    results = []
+    # Views print progress messages and the performance middleware may log every
+    # request; keep both out of the report
+    performance_log = logging.getLogger('api.performance')
+    with stub_external_services(stub_latency_ms), contextlib.redirect_stdout(io.StringIO()), \
+            _disabled(performance_log):
+        for scenario in scenarios:
+            timings, query_counts, statuses = [], [], set()
+            for i in range(warmup + iterations):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response, path = scenario.request(client, context, warmup + i)
+                    elapsed = (time.perf_counter() - started) * 1000
+                statuses.add(response.status_code)
+                if i >= warmup:
+                    timings.append(elapsed)
+                    query_counts.append(len(queries))
+            results.append({
+                'name': scenario.name,
+                'method': scenario.method,
+                'path': path,
+                'iterations': iterations,
+                'statuses': sorted(statuses),
+                'mean_ms': round(statistics.mean(timings), 3),
+                'p50_ms': round(_percentile(timings, 50), 3),
+                'p95_ms': round(_percentile(timings, 95), 3),
+                'max_ms': round(max(timings), 3),
+                'queries': round(statistics.median(query_counts)),
+                'max_queries': max(query_counts),
+            })
+    return results
+
+
+def compare_results(baseline, results, threshold=1.25, min_delta_ms=1.0):
+    """
+    List regressions against a previous report: p50 latency up by more than
+    `threshold` times (and at least `min_delta_ms`), or more queries per request.
+    """
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        if (result['p50_ms'] > before['p50_ms'] * threshold
+                and result['p50_ms'] - before['p50_ms'] >= min_delta_ms):
+            regressions.append(f"{result['name']}: p50 {before['p50_ms']}ms -> {result['p50_ms']}ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{result['name']}: queries {before['queries']} -> {result['queries']}")
+    return regressions
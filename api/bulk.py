@@ -0,0 +1,155 @@
+# api/bulk.py
+"""
+List-payload bulk operations for ModelViewSets.
+
+Adding BulkModelMixin to a viewset exposes `/<resource>/bulk/`:
+
+- POST   [{...}, ...]            create every row with one bulk_create
+- PATCH  [{"id": 1, ...}, ...]   partially update rows with one bulk_update
+- DELETE {"ids": [1, 2, ...]}    delete rows with one query
+
+Nothing is written unless every item validates; errors come back as a list
+aligned with the payload (an empty object for items that were fine). Batches
+are capped at settings.BULK_MAX_BATCH_SIZE items.
+"""
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from .versioning import touch_trips
+
+
+def _check_batch(items):
+    if not isinstance(items, list):
+        raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+    if not items:
+        raise ValidationError({'non_field_errors': ['Expected at least one item.']})
+    if len(items) > settings.BULK_MAX_BATCH_SIZE:
+        raise ValidationError({
+            'non_field_errors': [f"At most {settings.BULK_MAX_BATCH_SIZE} items can be sent in one request."]
+        })
+
+
+def related_lookup(serializer, items):
+    """
+    Fetch every object referenced by a writable relation across the batch,
+    one query per field, for BatchRelatedField to resolve ids from.
+    """
+    lookup = {}
+    for name, field in serializer.fields.items():
+        if not isinstance(field, PrimaryKeyRelatedField) or field.read_only:
+            continue
+        ids = {
+            item[name] for item in items
+            if isinstance(item, dict) and isinstance(item.get(name), (int, str))
+        }
+        ids = [int(pk) for pk in ids if str(pk).isdigit()]
+        objects = field.get_queryset().in_bulk(ids) if ids else {}
+        lookup[name] = {str(pk): obj for pk, obj in objects.items()}
+    return lookup
+
+
+class BulkModelMixin:
+    def prepare_bulk_create(self, instances):
+        """Hook for filling in values that `serializer.create` would normally set"""
+
+    def prepare_bulk_update(self, changes):
+        """
+        Hook for values that `serializer.update` would normally set: `changes` is a
+        list of (instance, validated_data) with the instances still unchanged
+        """
+
+    def _bulk_context(self, items):
+        context = self.get_serializer_context()
+        context['related_objects'] = related_lookup(self.get_serializer_class()(context=context), items)
+        return context
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        if request.method == 'POST':
+            return self.bulk_create(request)
+        if request.method == 'PATCH':
+            return self.bulk_update(request)
+        return self.bulk_destroy(request)
+
+    def bulk_create(self, request):
+        items = request.data
+        _check_batch(items)
+        serializer = self.get_serializer(data=items, many=True, context=self._bulk_context(items))
+        serializer.is_valid(raise_exception=True)
+
+        model = self.get_queryset().model
+        instances = [model(**data) for data in serializer.validated_data]
+        with transaction.atomic():
+            self.prepare_bulk_create(instances)
+            model.objects.bulk_create(instances)
+            # bulk_create skips post_save, so bump the trips' versions here
+            touch_trips(instance.trip_id for instance in instances)
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        items = request.data
+        _check_batch(items)
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        context = self._bulk_context(items)
+
+        with transaction.atomic():
+            existing = self.get_queryset().select_for_update().in_bulk(
+                [pk for pk in ids if isinstance(pk, int)]
+            )
+            errors, changes, fields = [], [], set()
+            trip_ids = {instance.trip_id for instance in existing.values()}
+            for item in items:
+                instance = existing.get(item.get('id')) if isinstance(item, dict) else None
+                if instance is None:
+                    errors.append({'id': ['Expected the id of an existing item.']})
+                    continue
+                serializer = self.get_serializer(instance, data=item, partial=True, context=context)
+                if not serializer.is_valid():
+                    errors.append(serializer.errors)
+                    continue
+                errors.append({})
+                changes.append((instance, dict(serializer.validated_data)))
+
+            if any(errors):
+                raise ValidationError(errors)
+
+            self.prepare_bulk_update(changes)
+            updated = []
+            for instance, validated_data in changes:
+                for name, value in validated_data.items():
+                    setattr(instance, name, value)
+                    fields.add(name)
+                updated.append(instance)
+
+            model = self.get_queryset().model
+            # bulk_update skips save(), so refresh auto_now columns by hand
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in updated:
+                        field.pre_save(instance, add=False)
+                    fields.add(field.name)
+            if fields:
+                model.objects.bulk_update(updated, sorted(fields))
+                touch_trips(trip_ids | {instance.trip_id for instance in updated})
+        return Response(self.get_serializer(updated, many=True).data)
+
+    def bulk_destroy(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        _check_batch(ids)
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ValidationError({'ids': ['Expected a list of integer ids.']})
+
+        with transaction.atomic():
+            queryset = self.get_queryset().filter(pk__in=ids)
+            trip_ids = dict(queryset.values_list('pk', 'trip_id'))
+            missing = set(ids) - set(trip_ids)
+            if missing:
+                raise ValidationError({'ids': [f"Unknown ids: {sorted(missing)}"]})
+            queryset.delete()
+            touch_trips(trip_ids.values())
+        return Response(status=status.HTTP_204_NO_CONTENT)
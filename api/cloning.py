@@ -0,0 +1,73 @@
+# api/cloning.py
+from django.db import transaction
+
+from .models import Trip, Stop, Itinerary, Expense, TravelMethod, MyActivity
+
+
+def _detach(queryset, trip, **changes):
+    """Load rows in primary key order and turn them into unsaved copies attached to `trip`"""
+    rows = list(queryset.order_by('pk'))
+    old_ids = [row.pk for row in rows]
+    for row in rows:
+        row.pk = None
+        row._state.adding = True
+        row.trip = trip
+        for field, change in changes.items():
+            setattr(row, field, change(getattr(row, field)))
+    return old_ids, rows
+
+
+def clone_trip(trip, name=None, start_date=None, include_expenses=False):
+    """
+    Deep-copy a trip with its stops, itinerary, travel methods and saved
+    activities (and expenses if asked), shifting every date so the copy
+    starts on `start_date`.
+
+    Each table is read once and written with one bulk_create, so the number
+    of queries does not grow with the size of the trip.
+    """
+    shift = (start_date - trip.start_date) if start_date else None
+    shift_date = (lambda day: day + shift) if shift else (lambda day: day)
+
+    with transaction.atomic():
+        new_trip = Trip.objects.create(
+            name=name or f"{trip.name} (copy)",
+            destination=trip.destination,
+            start_date=shift_date(trip.start_date),
+            end_date=shift_date(trip.end_date),
+            budget=trip.budget,
+            currency=trip.currency,
+            travelers=list(trip.travelers or []),
+        )
+
+        _, stops = _detach(Stop.objects.filter(trip=trip), new_trip)
+        Stop.objects.bulk_create(stops)
+
+        old_item_ids, items = _detach(Itinerary.objects.filter(trip=trip), new_trip, date=shift_date)
+        Itinerary.objects.bulk_create(items)
+        new_item_ids = dict(zip(old_item_ids, (item.pk for item in items)))
+
+        # Only legs whose endpoints belong to this trip can be remapped
+        _, legs = _detach(
+            TravelMethod.objects.filter(trip=trip, from_stop__trip=trip, to_stop__trip=trip), new_trip
+        )
+        for leg in legs:
+            leg.from_stop_id = new_item_ids[leg.from_stop_id]
+            leg.to_stop_id = new_item_ids[leg.to_stop_id]
+        TravelMethod.objects.bulk_create(legs)
+
+        _, activities = _detach(MyActivity.objects.filter(trip=trip), new_trip)
+        MyActivity.objects.bulk_create(activities)
+
+        expenses = []
+        if include_expenses:
+            _, expenses = _detach(Expense.objects.filter(trip=trip), new_trip, date=shift_date)
+            Expense.objects.bulk_create(expenses)
+
+    return new_trip, {
+        'stops': len(stops),
+        'itinerary': len(items),
+        'travel_methods': len(legs),
+        'my_activities': len(activities),
+        'expenses': len(expenses),
+    }
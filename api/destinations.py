@@ -0,0 +1,45 @@
+# api/destinations.py
+import re
+import unicodedata
+
+from django.conf import settings
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Common alternate names, keyed by their normalized form
+DESTINATION_ALIASES = {
+    'nyc': 'new york',
+    'new york city': 'new york',
+    'new york, ny': 'new york',
+    'la': 'los angeles',
+    'sf': 'san francisco',
+    'kl': 'kuala lumpur',
+    'hk': 'hong kong',
+    'saigon': 'ho chi minh city',
+    'bombay': 'mumbai',
+    'peking': 'beijing',
+    'rome, italy': 'rome',
+    'paris, france': 'paris',
+    'london, uk': 'london',
+    'tokyo, japan': 'tokyo',
+}
+
+
+def _fold(text):
+    # NFKD splits accented letters into base + combining mark; drop the marks
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WHITESPACE.sub(' ', stripped).strip().casefold()
+
+
+def normalize_destination(destination):
+    """
+    Canonical cache/coalescing key for a destination name.
+
+    Folds case, whitespace and accents ("  São  Paulo " -> "sao paulo") and maps
+    known aliases ("NYC" -> "new york"). Extra aliases can be configured with
+    settings.DESTINATION_ALIASES.
+    """
+    key = _fold(destination)
+    aliases = {**DESTINATION_ALIASES, **getattr(settings, 'DESTINATION_ALIASES', {})}
+    return aliases.get(key, key)
@@ -0,0 +1,153 @@
+# api/distance_matrix.py
+"""
+Per-trip distance and travel-time matrix between Stops.
+
+A TripMatrix holds the great-circle distance (km, float32) between every pair
+of a trip's stops. It is computed in one vectorised pass and kept in an
+in-process LRU cache keyed by trip id and stamped with the trip's
+(version, updated_at); updated_at keeps apart a new trip that reuses a
+deleted trip's id.
+
+When the stamp has moved on, the trip's stop coordinates are re-read (one
+small query) and compared with the cached ones. Added, moved and deleted
+stops only have their own rows and columns recomputed, which is O(n) each.
+The whole matrix is rebuilt only when many stops changed at once.
+
+Travel times are derived per TravelMethod mode from settings.TRAVEL_SPEED_PROFILES:
+minutes = km * detour / speed_kmh * 60 + overhead_min.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .geo import haversine_matrix
+from .metrics import REGISTRY
+from .models import Stop, TravelMethod
+
+MATRIX_LOOKUPS = REGISTRY.counter(
+    'travelplanner_distance_matrix_lookups_total',
+    'Trip distance matrix lookups by result (hit, incremental, rebuild)', ['result'],
+)
+
+
+def speed_profiles():
+    """[(mode, profile)] in TravelMethod.MODE_CHOICES order, for modes that have a profile"""
+    profiles = settings.TRAVEL_SPEED_PROFILES
+    return [(mode, profiles[mode]) for mode, _ in TravelMethod.MODE_CHOICES if mode in profiles]
+
+
+class TripMatrix:
+    """Distances between a trip's stops; treat instances as immutable once cached"""
+    def __init__(self, stamp, ids, lats, lons, dist):
+        self.stamp = stamp
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.dist = dist
+        self.index = {int(pk): i for i, pk in enumerate(self.ids)}
+        self._durations = None
+
+    @classmethod
+    def build(cls, stamp, rows):
+        """`rows` are (stop id, latitude, longitude) tuples"""
+        ids, lats, lons = _columns(rows)
+        return cls(stamp, ids, lats, lons, haversine_matrix(lats, lons).astype(np.float32))
+
+    def refresh(self, stamp, rows):
+        """
+        Matrix for the stops in `rows`, reusing this one's distances for stops
+        that have not moved. Returns None when a rebuild would be cheaper.
+        """
+        ids, lats, lons = _columns(rows)
+        keep = [self.index[pk] for pk in ids if pk in self.index]
+        changed = [
+            i for i, pk in enumerate(ids)
+            if pk not in self.index
+            or self.lats[self.index[pk]] != lats[i] or self.lons[self.index[pk]] != lons[i]
+        ]
+        removed = len(self.ids) - len(keep)
+        if not changed and not removed:
+            # Something else about the trip changed; the arrays can be shared as they are
+            matrix = TripMatrix(stamp, self.ids, self.lats, self.lons, self.dist)
+            matrix._durations = self._durations
+            return matrix
+        if (len(changed) + removed) * 2 > len(ids):
+            return None
+
+        # Carry over the surviving block, then recompute only the changed rows/columns
+        dist = np.zeros((len(ids), len(ids)), dtype=np.float32)
+        carried = [i for i, pk in enumerate(ids) if pk in self.index]
+        dist[np.ix_(carried, carried)] = self.dist[np.ix_(keep, keep)]
+        if changed:
+            rows_changed = haversine_matrix(lats[changed], lons[changed], lats, lons).astype(np.float32)
+            dist[changed, :] = rows_changed
+            dist[:, changed] = rows_changed.T
+        return TripMatrix(stamp, ids, lats, lons, dist)
+
+    def submatrix(self, stops):
+        """Distances between `stops` (in that order), or None if any is unknown or has moved"""
+        positions = []
+        for stop in stops:
+            i = self.index.get(stop.pk)
+            if i is None or self.lats[i] != stop.latitude or self.lons[i] != stop.longitude:
+                return None
+            positions.append(i)
+        return self.dist[np.ix_(positions, positions)]
+
+    def durations(self):
+        """{mode: minutes matrix}, computed for every mode in one broadcast"""
+        if self._durations is None:
+            profiles = speed_profiles()
+            factor = np.array([p['detour'] / p['speed_kmh'] * 60 for _, p in profiles], dtype=np.float32)
+            overhead = np.array([p.get('overhead_min', 0) for _, p in profiles], dtype=np.float32)
+            minutes = self.dist[None, :, :] * factor[:, None, None] + overhead[:, None, None]
+            minutes[:, np.arange(len(self.ids)), np.arange(len(self.ids))] = 0
+            self._durations = {mode: minutes[i] for i, (mode, _) in enumerate(profiles)}
+        return self._durations
+
+
+def _columns(rows):
+    rows = sorted(rows)
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1] for row in rows], dtype=float),
+        np.array([row[2] for row in rows], dtype=float),
+    )
+
+
+_cache = OrderedDict()   # trip id -> TripMatrix
+_cache_lock = threading.Lock()
+
+
+def clear_matrix_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def get_trip_matrix(trip):
+    """The trip's distance matrix at its current version, from cache when possible"""
+    stamp = (trip.version, trip.updated_at)
+    with _cache_lock:
+        cached = _cache.get(trip.pk)
+        if cached is not None:
+            _cache.move_to_end(trip.pk)
+    if cached is not None and cached.stamp == stamp:
+        MATRIX_LOOKUPS.inc(result='hit')
+        return cached
+
+    rows = list(Stop.objects.filter(trip=trip).values_list('id', 'latitude', 'longitude'))
+    matrix = cached.refresh(stamp, rows) if cached is not None else None
+    if matrix is not None:
+        MATRIX_LOOKUPS.inc(result='incremental')
+    else:
+        matrix = TripMatrix.build(stamp, rows)
+        MATRIX_LOOKUPS.inc(result='rebuild')
+
+    with _cache_lock:
+        _cache[trip.pk] = matrix
+        _cache.move_to_end(trip.pk)
+        while len(_cache) > settings.DISTANCE_MATRIX_CACHE_TRIPS:
+            _cache.popitem(last=False)
+    return matrix
@@ -0,0 +1,193 @@
+# api/expense_summary.py
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Sum
+
+from .fx import conversion_factor_expression, converted_amount_expression
+from .models import Expense
+
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    """Format a Decimal the way DRF's DecimalField does (two places, as a string)"""
+    return str(Decimal(value).quantize(CENT))
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal('0')
+
+
+def _grouped_totals(queryset, field):
+    """Sum amounts per value of `field`, kept apart per currency"""
+    rows = (
+        queryset.values(field, 'currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by(field, 'currency')
+    )
+    return [
+        {
+            field: row[field],
+            'currency': row['currency'],
+            'total': _money(row['total']),
+            'count': row['count'],
+        }
+        for row in rows
+    ]
+
+
+def _apply_splits(groups, travelers):
+    """
+    Fold split groups into balances: positive means the traveler is owed money.
+
+    Each group carries `total` (sum of amounts) and `units` (how many expenses it
+    stands for, or the summed conversion factors when amounts were converted),
+    so fixed shares scale the same way as the amounts they are taken from.
+    """
+    balances = {traveler: Decimal('0') for traveler in travelers}
+    for group in groups:
+        split_between = group['split_between'] or []
+        if not split_between or group['total'] is None:
+            continue
+        total = group['total']
+        details = group['split_details'] or {}
+
+        balances[group['paid_by']] = balances.get(group['paid_by'], Decimal('0')) + total
+        for person in split_between:
+            if group['split_type'] == 'percentage':
+                share = total * _to_decimal(details.get(person, 0)) / 100
+            elif group['split_type'] == 'fixed':
+                share = _to_decimal(details.get(person, 0)) * group['units']
+            else:
+                share = total / len(split_between)
+            balances[person] = balances.get(person, Decimal('0')) - share
+    return balances
+
+
+def _split_groups(queryset, *extra_fields):
+    return (
+        queryset.exclude(paid_by='')
+        .values(*extra_fields, 'paid_by', 'split_type', 'split_between', 'split_details')
+        .order_by()
+    )
+
+
+def compute_balances(queryset, travelers=()):
+    """
+    Per-currency balances for every traveler.
+
+    Expenses sharing the same payer and split configuration are summed in the
+    database first, so the Python side only walks the distinct split groups.
+    """
+    groups = _split_groups(queryset, 'currency').annotate(total=Sum('amount'), units=Count('id'))
+    by_currency = defaultdict(list)
+    for group in groups:
+        by_currency[group['currency']].append(group)
+    return {
+        currency: _apply_splits(currency_groups, travelers)
+        for currency, currency_groups in by_currency.items()
+    }
+
+
+def compute_converted_balances(queryset, factor, travelers=()):
+    """Balances with every expense converted to one currency by the SQL `factor` expression"""
+    groups = _split_groups(queryset).annotate(
+        total=Sum(converted_amount_expression(factor)), units=Sum(factor)
+    )
+    return _apply_splits(groups, travelers)
+
+
+def settle_up(balances):
+    """
+    Turn balances into transfers by repeatedly matching the largest debtor with
+    the largest creditor, which needs at most (people - 1) transfers.
+    """
+    creditors = [[amount, person] for person, amount in balances.items() if amount >= CENT]
+    debtors = [[-amount, person] for person, amount in balances.items() if amount <= -CENT]
+
+    transfers = []
+    while creditors and debtors:
+        creditors.sort(reverse=True)
+        debtors.sort(reverse=True)
+        credit, creditor = creditors[0]
+        debt, debtor = debtors[0]
+        amount = min(credit, debt)
+        transfers.append({'from': debtor, 'to': creditor, 'amount': _money(amount)})
+
+        creditors[0][0] -= amount
+        debtors[0][0] -= amount
+        creditors = [entry for entry in creditors if entry[0] >= CENT]
+        debtors = [entry for entry in debtors if entry[0] >= CENT]
+    return transfers
+
+
+def _converted_totals(queryset, field, amount):
+    rows = queryset.values(field).annotate(total=Sum(amount)).order_by(field)
+    return [{field: row[field], 'total': _money(row['total'] or 0)} for row in rows]
+
+
+def summarize_converted(trip, queryset):
+    """Totals, balances and budget comparison normalized to the trip's base currency"""
+    base_currency = trip.currency
+    factor, missing = conversion_factor_expression(queryset, base_currency)
+    amount = converted_amount_expression(factor)
+
+    spent = queryset.aggregate(total=Sum(amount))['total'] or Decimal('0')
+    balances = compute_converted_balances(queryset, factor, trip.travelers or [])
+    budget = trip.budget or Decimal('0')
+
+    return {
+        'converted': {
+            'currency': base_currency,
+            'total': _money(spent),
+            'by_category': _converted_totals(queryset, 'category', amount),
+            'by_day': _converted_totals(queryset, 'date', amount),
+            'by_payer': _converted_totals(queryset, 'paid_by', amount),
+            'balances': {person: _money(value) for person, value in balances.items()},
+            'settlements': settle_up(balances),
+            'missing_rates': missing,
+        },
+        'budget': {
+            'currency': base_currency,
+            'budget': _money(budget),
+            'spent': _money(spent),
+            'remaining': _money(budget - spent),
+            'percent_used': round(float(spent / budget * 100), 2) if budget > 0 else 0,
+        },
+    }
+
+
+def summarize_expenses(trip):
+    """Build the expense summary for a trip: totals, balances and settle-up transfers"""
+    queryset = Expense.objects.filter(trip=trip)
+
+    by_currency = (
+        queryset.values('currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by('currency')
+    )
+    balances = compute_balances(queryset, trip.travelers or [])
+
+    summary = {
+        'trip': trip.id,
+        'by_currency': [
+            {'currency': row['currency'], 'total': _money(row['total']), 'count': row['count']}
+            for row in by_currency
+        ],
+        'by_category': _grouped_totals(queryset, 'category'),
+        'by_day': _grouped_totals(queryset, 'date'),
+        'by_payer': _grouped_totals(queryset, 'paid_by'),
+        'balances': {
+            currency: {person: _money(amount) for person, amount in people.items()}
+            for currency, people in balances.items()
+        },
+        'settlements': {
+            currency: settle_up(people) for currency, people in balances.items()
+        },
+    }
+    summary.update(summarize_converted(trip, queryset))
+    return summary
@@ -0,0 +1,119 @@
+# api/export.py
+"""
+Streaming trip exports as JSON Lines or CSV.
+
+Each collection is read with `.values().iterator(chunk_size=EXPORT_CHUNK_SIZE)`
+and written out as it arrives, so memory use does not grow with the size of
+the export. Rows are grouped by collection (trips first), not by trip, which
+keeps an all-trips export at one query per collection. Every record carries
+a `type`, child records carry the `trip` they belong to, and field names
+match the API serializers.
+
+JSON Lines has one object per line. CSV has one header row holding the union of
+every collection's columns; a row leaves blank the columns its type lacks, and
+JSON fields (links, split_between, ...) are written as JSON text.
+"""
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Trip, Stop, Itinerary, Expense, Flight, TravelMethod, MyActivity
+
+# Yield to the server in pieces of about this many characters rather than line by line
+BUFFER_CHARS = 64 * 1024
+
+# (type, model, fields, extra value expressions); 'trip' is the trip id
+EXPORT_COLLECTIONS = [
+    ('trip', Trip, ['id', 'name', 'destination', 'start_date', 'end_date', 'budget', 'currency',
+                    'travelers', 'version', 'updated_at'], {}),
+    ('stop', Stop, ['id', 'trip', 'name', 'latitude', 'longitude', 'order', 'category', 'reservation_required',
+                    'day', 'visit_time', 'remarks'], {}),
+    ('itinerary', Itinerary, ['id', 'trip', 'date', 'position', 'time', 'location', 'activity', 'duration',
+                              'estimated_cost', 'notes', 'photo_url', 'links'], {}),
+    ('expense', Expense, ['id', 'trip', 'date', 'description', 'amount', 'currency', 'category', 'paid_by',
+                          'split_between', 'split_type', 'split_details', 'is_recurring', 'recurrence_pattern'], {}),
+    ('travel_method', TravelMethod, ['id', 'trip', 'from_stop', 'to_stop', 'order', 'mode', 'distance', 'duration',
+                                     'estimated_cost', 'line_number', 'boarding_stop', 'alighting_stop',
+                                     'number_of_stops'], {}),
+    ('flight', Flight, ['id', 'trip', 'flight_number', 'flight_date', 'created_at'],
+     {'flight_data': F('info__data')}),
+    ('my_activity', MyActivity, ['id', 'trip', 'place', 'activity', 'recommended_time', 'cost', 'photo_url',
+                                 'links', 'created_at', 'updated_at'], {}),
+]
+
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def csv_columns():
+    """'type' followed by every collection's columns, each once, in first-seen order"""
+    columns = ['type']
+    for _, _, fields, extra in EXPORT_COLLECTIONS:
+        columns += [name for name in [*fields, *extra] if name not in columns]
+    return columns
+
+
+def export_records(trip_ids=None):
+    """Yield a dict per exported row: every trip (or those in `trip_ids`), then their children"""
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    for kind, model, fields, extra in EXPORT_COLLECTIONS:
+        queryset = model.objects.all()
+        if trip_ids is not None:
+            queryset = queryset.filter(**{'pk__in' if model is Trip else 'trip__in': trip_ids})
+        # Primary key order is index-backed for both the per-trip and all-trips exports
+        rows = queryset.order_by('pk').values(*fields, **extra).iterator(chunk_size=chunk_size)
+        for row in rows:
+            yield {'type': kind, **row}
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back each line instead of storing it"""
+    def write(self, value):
+        return value
+
+
+def _jsonl_lines(records):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+def _csv_value(value, encoder):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return encoder.encode(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(records):
+    columns = csv_columns()
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for record in records:
+        yield writer.writerow([_csv_value(record.get(column), encoder) for column in columns])
+
+
+def _buffered(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_CHARS:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def stream_export(export_format, trip_ids=None):
+    """Iterator of encoded chunks for a StreamingHttpResponse"""
+    lines = _jsonl_lines if export_format == 'jsonl' else _csv_lines
+    return _buffered(lines(export_records(trip_ids)))
@@ -0,0 +1,81 @@
+# api/flight_info.py
+"""
+Shared flight-status cache. One FlightInfo row per (flight_number, flight_date)
+holds the AviationStack payload; Flight rows point at it.
+"""
+import logging
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .http_client import ProviderUnavailable, get_client
+from .metrics import FLIGHT_CACHE_LOOKUPS
+from .models import FlightInfo
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_flight_number(flight_number):
+    return ''.join(flight_number.split()).upper()
+
+
+def is_fresh(info):
+    """An empty payload (the provider had no data yet) is never fresh, so the next lookup asks again"""
+    return bool(info.data) and info.fetched_at >= timezone.now() - timedelta(seconds=settings.FLIGHT_INFO_TTL)
+
+
+def _check_response(api_data):
+    # AviationStack reports bad keys and exhausted quotas in a 200 body
+    if not isinstance(api_data, dict):
+        raise ValueError(f"AviationStack returned {type(api_data).__name__}, not an object")
+    if 'error' in api_data:
+        raise ValueError(f"AviationStack error: {api_data['error']}")
+
+
+def fetch_flight_data(flight_number):
+    """Look the flight up on AviationStack and return the first match (or {})"""
+    params = {
+        'access_key': settings.AVIATIONSTACK_API_KEY,
+        'flight_iata': flight_number
+    }
+    api_data = get_client('aviationstack').get_json(
+        f'{settings.AVIATIONSTACK_URL}/flights', check=_check_response, params=params
+    )
+    return api_data.get('data', [{}])[0] if api_data.get('data') else {}
+
+
+def get_flight_info(flight_number, flight_date):
+    """
+    Return the cached FlightInfo for a flight, refreshing it from AviationStack
+    when missing or older than FLIGHT_INFO_TTL. A single index probe on the
+    (flight_number, flight_date) unique key serves the cache hit. If the
+    provider is down, stale cached data is served rather than failing. An
+    empty answer is stored so flights can point at the row, but never counts
+    as fresh and never replaces an earlier payload.
+    """
+    flight_number = normalize_flight_number(flight_number)
+    info = FlightInfo.objects.filter(flight_number=flight_number, flight_date=flight_date).first()
+    if info is not None and is_fresh(info):
+        FLIGHT_CACHE_LOOKUPS.inc(result='hit')
+        return info
+    FLIGHT_CACHE_LOOKUPS.inc(result='miss' if info is None else 'stale')
+
+    try:
+        data = fetch_flight_data(flight_number)
+    except (ProviderUnavailable, requests.RequestException, ValueError) as e:
+        if info is None:
+            raise
+        logger.warning('Serving stale flight data for %s: %s', flight_number, e)
+        FLIGHT_CACHE_LOOKUPS.inc(result='stale_served')
+        return info
+    if not data and info is not None:
+        # Nothing new to share: keep the row (and any older payload) due for a refetch
+        return info
+    info, _ = FlightInfo.objects.update_or_create(
+        flight_number=flight_number,
+        flight_date=flight_date,
+        defaults={'data': data, 'fetched_at': timezone.now()},
+    )
+    return info
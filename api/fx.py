@@ -0,0 +1,145 @@
+# api/fx.py
+"""
+Offline currency conversion backed by the ExchangeRate table.
+
+Rates are loaded from a local CSV or JSON snapshot (no network access) and
+looked up through an in-process cache keyed by (currency, date). Conversion
+of whole expense sets happens in SQL via `conversion_factor_expression`.
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import date as date_cls
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .models import ExchangeRate
+
+PIVOT_CURRENCY = 'USD'
+
+# (currency, date) -> (rate or None, expires_at)
+_rate_cache = {}
+
+
+def clear_rate_cache():
+    _rate_cache.clear()
+
+
+def _parse_rows(path):
+    """Yield (currency, date, rate) tuples from a CSV or JSON snapshot"""
+    if str(path).endswith('.json'):
+        with open(path) as handle:
+            payload = json.load(handle)
+        if isinstance(payload, dict):
+            # {"2026-05-01": {"EUR": 0.92, "SGD": 1.34}, ...}
+            for day, rates in payload.items():
+                for currency, rate in rates.items():
+                    yield currency, day, rate
+        else:
+            # [{"date": "2026-05-01", "currency": "EUR", "rate": 0.92}, ...]
+            for row in payload:
+                yield row['currency'], row['date'], row['rate']
+    else:
+        with open(path, newline='') as handle:
+            for row in csv.DictReader(handle):
+                yield row['currency'], row['date'], row['rate']
+
+
+def load_rates(path):
+    """Insert or update rates from a local snapshot file. Returns the number of rows loaded."""
+    rates = {}
+    for currency, day, rate in _parse_rows(path):
+        try:
+            key = (currency.strip().upper(), date_cls.fromisoformat(str(day).strip()))
+            rates[key] = Decimal(str(rate))
+        except (InvalidOperation, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid rate row {currency!r}, {day!r}, {rate!r}: {e}")
+
+    ExchangeRate.objects.bulk_create(
+        [ExchangeRate(currency=currency, date=day, rate=rate) for (currency, day), rate in rates.items()],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['currency', 'date'],
+        update_fields=['rate'],
+    )
+    clear_rate_cache()
+    return len(rates)
+
+
+def get_rate(currency, on_date):
+    """Units of `currency` per 1 USD on `on_date`, using the latest rate on or before that day"""
+    currency = currency.upper()
+    if currency == PIVOT_CURRENCY:
+        return Decimal('1')
+
+    key = (currency, on_date)
+    cached = _rate_cache.get(key)
+    now = time.monotonic()
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    rate = (
+        ExchangeRate.objects.filter(currency=currency, date__lte=on_date)
+        .order_by('-date')
+        .values_list('rate', flat=True)
+        .first()
+    )
+    _rate_cache[key] = (rate, now + getattr(settings, 'FX_RATE_CACHE_SECONDS', 3600))
+    return rate
+
+
+def conversion_factor(from_currency, to_currency, on_date):
+    """Multiplier converting an amount in `from_currency` to `to_currency`, or None if a rate is missing"""
+    if from_currency.upper() == to_currency.upper():
+        return Decimal('1')
+    from_rate = get_rate(from_currency, on_date)
+    to_rate = get_rate(to_currency, on_date)
+    if not from_rate or not to_rate:
+        return None
+    return to_rate / from_rate
+
+
+def conversion_factor_expression(queryset, to_currency):
+    """
+    Build a SQL CASE expression giving each expense row its conversion factor.
+
+    Only the distinct (currency, date) pairs are resolved in Python; the
+    multiplication itself runs in the database over the whole set. Rows whose
+    rate is missing get NULL so they drop out of SUM(). Returns the expression
+    and the sorted list of currencies that could not be converted.
+    """
+    pairs = (
+        queryset.exclude(currency__iexact=to_currency)
+        .values_list('currency', 'date')
+        .distinct()
+        .order_by()
+    )
+
+    # currency -> factor -> [dates], so a rate that is flat over the trip is one WHEN
+    factors = defaultdict(lambda: defaultdict(list))
+    missing = set()
+    for currency, day in pairs:
+        factor = conversion_factor(currency, to_currency, day)
+        if factor is None:
+            missing.add(currency)
+        else:
+            factors[currency][factor].append(day)
+
+    output_field = DecimalField(max_digits=28, decimal_places=10)
+    whens = [When(currency__iexact=to_currency, then=Value(Decimal('1')))]
+    for currency, by_factor in factors.items():
+        if len(by_factor) == 1:
+            factor = next(iter(by_factor))
+            whens.append(When(currency=currency, then=Value(factor)))
+        else:
+            for factor, days in by_factor.items():
+                whens.append(When(currency=currency, date__in=days, then=Value(factor)))
+
+    return Case(*whens, default=Value(None), output_field=output_field), sorted(missing)
+
+
+def converted_amount_expression(factor):
+    return F('amount') * factor
@@ -0,0 +1,135 @@
+# api/geo.py
+"""
+Great-circle distances and an integer geohash for spatial lookups.
+
+Stop.geohash packs a stop's position into 52 bits: 26 bits of longitude and
+26 bits of latitude, interleaved the way text geohashes are (longitude bit
+first). Cells at any coarser level are then contiguous ranges of the integer.
+A "nearby" query becomes a handful of B-tree range scans that work the same
+on SQLite and Postgres, with no PostGIS and no collation surprises.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+GEOHASH_AXIS_BITS = 26
+
+
+def haversine_matrix(lats, lons, to_lats=None, to_lons=None):
+    """Great-circle distances in km from each (lat, lon) to each target point (default: the same points)"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    to_lat = lat if to_lats is None else np.radians(np.asarray(to_lats, dtype=float))
+    to_lon = lon if to_lons is None else np.radians(np.asarray(to_lons, dtype=float))
+    dlat = lat[:, None] - to_lat[None, :]
+    dlon = lon[:, None] - to_lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(to_lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _spread(x):
+    """Move bit i of each value to bit 2i (values up to 32 bits)"""
+    x = np.asarray(x, dtype=np.int64)
+    x = (x | (x << 16)) & 0x0000FFFF0000FFFF
+    x = (x | (x << 8)) & 0x00FF00FF00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F0F0F0F0F
+    x = (x | (x << 2)) & 0x3333333333333333
+    return (x | (x << 1)) & 0x5555555555555555
+
+
+def _interleave(lon_cells, lat_cells):
+    return (_spread(lon_cells) << 1) | _spread(lat_cells)
+
+
+def _cells(latitude, longitude, bits=GEOHASH_AXIS_BITS):
+    size = 1 << bits
+    lat = np.floor((np.asarray(latitude, dtype=float) + 90) / 180 * size).astype(np.int64)
+    lon = np.floor((np.asarray(longitude, dtype=float) + 180) / 360 * size).astype(np.int64)
+    return np.clip(lat, 0, size - 1), np.clip(lon, 0, size - 1)
+
+
+def encode_geohash(latitude, longitude):
+    """52-bit integer geohash; accepts scalars or arrays"""
+    lat_cells, lon_cells = _cells(latitude, longitude)
+    codes = _interleave(lon_cells, lat_cells)
+    return int(codes) if codes.ndim == 0 else codes
+
+
+def assign_geohashes(stops):
+    """Fill in `geohash` on Stop instances in one vectorised pass (for bulk_create/bulk_update)"""
+    if stops:
+        codes = encode_geohash([stop.latitude for stop in stops], [stop.longitude for stop in stops])
+        for stop, code in zip(stops, codes.tolist()):
+            stop.geohash = code
+
+
+def _level_for(latitude, radius_km):
+    """Finest level whose cells are at least radius_km on each side around `latitude`"""
+    # Longitude cells narrow towards the poles; size them at the circle's poleward edge
+    edge = abs(latitude) + radius_km / KM_PER_DEGREE
+    if edge >= 90:
+        return 0   # the circle contains a pole, so every longitude is in range
+    lon_km = 360 * KM_PER_DEGREE * math.cos(math.radians(edge))
+    lat_km = 180 * KM_PER_DEGREE
+    level = 0
+    while level < GEOHASH_AXIS_BITS and min(lat_km, lon_km) / (1 << (level + 1)) >= radius_km:
+        level += 1
+    return level
+
+
+def geohash_ranges(latitude, longitude, radius_km):
+    """
+    [(low, high)] half-open geohash ranges that together cover every point
+    within radius_km: the cell holding the point plus its eight neighbours,
+    at a level where a cell is at least radius_km wide.
+    """
+    level = _level_for(latitude, radius_km)
+    size = 1 << level
+    lat_cell, lon_cell = (int(c) >> (GEOHASH_AXIS_BITS - level) for c in _cells(latitude, longitude))
+    shift = 2 * (GEOHASH_AXIS_BITS - level)
+
+    prefixes = set()
+    for dlat in (-1, 0, 1):
+        if not 0 <= lat_cell + dlat < size:
+            continue
+        for dlon in (-1, 0, 1):
+            prefixes.add(int(_interleave((lon_cell + dlon) % size, lat_cell + dlat)))
+
+    ranges = []
+    for prefix in sorted(prefixes):
+        low, high = prefix << shift, (prefix + 1) << shift
+        if ranges and ranges[-1][1] == low:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((low, high))
+    return ranges
+
+
+def geohash_filter(latitude, longitude, radius_km):
+    """Q matching every Stop within radius_km (and some just outside it)"""
+    cover = Q()
+    for low, high in geohash_ranges(latitude, longitude, radius_km):
+        cover |= Q(geohash__gte=low, geohash__lt=high)
+    return cover
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit):
+    """
+    [(pk, km)] for the `limit` closest rows of a Stop queryset within
+    radius_km, nearest first. Candidates come from geohash range scans; exact
+    distances are then computed for those rows only.
+    """
+    candidates = list(
+        queryset.filter(geohash_filter(latitude, longitude, radius_km))
+        .order_by().values_list('pk', 'latitude', 'longitude')
+    )
+    if not candidates:
+        return []
+    pks, lats, lons = zip(*candidates)
+    distances = haversine_matrix([latitude], [longitude], lats, lons)[0]
+    inside = np.flatnonzero(distances <= radius_km)
+    nearest = inside[np.argsort(distances[inside], kind='stable')][:limit]
+    return [(pks[i], float(distances[i])) for i in nearest]
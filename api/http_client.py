@@ -0,0 +1,156 @@
+# api/http_client.py
+"""
+Shared outbound HTTP client for third-party providers.
+
+Each provider gets a pooled `requests.Session` (keep-alive, so repeated calls
+skip the TCP/TLS handshake), connect/read timeouts, bounded retries with
+exponential backoff, and a circuit breaker. After `failure_threshold`
+consecutive failures (connection errors, timeouts, 4xx or 5xx answers) the
+breaker opens and calls fail fast with
+ProviderUnavailable for `reset_timeout` seconds, after which a single trial
+call is let through.
+
+Provider settings come from settings.OUTBOUND_HTTP_PROVIDERS, falling back to
+settings.OUTBOUND_HTTP_DEFAULTS.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .instrumentation import span
+from .metrics import EXTERNAL_REQUEST_SECONDS, EXTERNAL_REQUESTS
+
+
+class ProviderUnavailable(Exception):
+    """Raised without making a request while a provider's circuit is open"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                # Let one trial request through; its outcome decides the state
+                self.state = self.HALF_OPEN
+                return True
+            if self.state == self.HALF_OPEN:
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ProviderClient:
+    def __init__(self, name, config):
+        self.name = name
+        self.timeout = (config['connect_timeout'], config['read_timeout'])
+        self.breaker = CircuitBreaker(config['failure_threshold'], config['reset_timeout'])
+
+        retry = Retry(
+            total=config['retries'],
+            backoff_factor=config['backoff_factor'],
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=config['pool_connections'],
+            pool_maxsize=config['pool_maxsize'],
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, parse=None, **kwargs):
+        """
+        Send a request through the breaker. With `parse`, return parse(response)
+        instead of the response; a ValueError from it (bad or error body) counts
+        as a failure rather than a success.
+        """
+        if not self.breaker.allow_request():
+            EXTERNAL_REQUESTS.inc(provider=self.name, outcome='circuit_open')
+            raise ProviderUnavailable(f"{self.name} is unavailable (circuit open)")
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            with span('http'), EXTERNAL_REQUEST_SECONDS.time(provider=self.name):
+                response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            EXTERNAL_REQUESTS.inc(provider=self.name, outcome='error')
+            self.breaker.record_failure()
+            raise
+        EXTERNAL_REQUESTS.inc(provider=self.name, outcome=f'{response.status_code // 100}xx')
+        if response.status_code >= 400:
+            # 4xx from a provider means a bad key, quota or rate limit: it cannot serve us either
+            self.breaker.record_failure()
+            response.raise_for_status()
+        if parse is not None:
+            try:
+                response = parse(response)
+            except ValueError:
+                self.breaker.record_failure()
+                raise
+        self.breaker.record_success()
+        return response
+
+    def get_json(self, url, check=None, **kwargs):
+        """GET a JSON body; `check(data)` may raise ValueError for an error reported with a 2xx status"""
+        def parse(response):
+            data = response.json()
+            if check is not None:
+                check(data)
+            return data
+        return self.request('GET', url, parse=parse, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider):
+    """Return the process-wide client for a provider, creating it on first use"""
+    with _clients_lock:
+        client = _clients.get(provider)
+        if client is None:
+            config = {
+                **settings.OUTBOUND_HTTP_DEFAULTS,
+                **settings.OUTBOUND_HTTP_PROVIDERS.get(provider, {}),
+            }
+            client = _clients[provider] = ProviderClient(provider, config)
+        return client
+
+
+def reset_clients():
+    """Drop all clients (and their breaker state); used when settings change"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
@@ -0,0 +1,461 @@
+# api/importer.py
+"""
+Streaming CSV import of expenses and itinerary items into a trip.
+
+The file is read line by line through csv.reader and never held in memory.
+The header row names the columns (case and spaces are ignored; unknown
+columns are reported and skipped). Each row is checked with plain column
+parsers rather than a serializer. Invalid rows are reported by line number
+and left out, so one bad line does not sink the file. Valid rows are
+collected into chunks of IMPORT_CHUNK_SIZE and each chunk is written with
+one executemany INSERT (or bulk_create, for a model that overrides it; see
+insert_rows). Everything runs in one transaction and bumps the trip's version
+once at the end.
+
+A `type` column, as written by the CSV export, limits the import to rows of
+the matching type; `id` and `trip` columns are ignored, so an export of one
+trip can be loaded into another.
+"""
+import codecs
+import csv
+import functools
+import json
+import re
+from datetime import date, time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import URLValidator
+from django.db import connections, models, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .export import csv_columns
+from .models import Expense, Itinerary
+from .versioning import touch_trips
+
+# Symbols and prefixes accepted in currency columns and in front of (or after) amounts
+CURRENCY_ALIASES = {
+    '$': 'USD', 'US$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₩': 'KRW', '₹': 'INR', '฿': 'THB',
+    'S$': 'SGD', 'A$': 'AUD', 'C$': 'CAD', 'NZ$': 'NZD', 'HK$': 'HKD', 'RM': 'MYR',
+}
+# A bare '$' in a trip kept in one of these means the trip's own dollars
+DOLLAR_CURRENCIES = {'USD', 'SGD', 'AUD', 'CAD', 'NZD', 'HKD', 'TWD'}
+_AMOUNT = re.compile(r'^(?P<before>[^\d\s.,+-]*)\s*(?P<number>[+-]?[\d.,\s]*\d[\d.,]*)\s*(?P<after>[^\d\s.,]*)$')
+_IGNORED_COLUMNS = {'type', 'id', 'trip'}
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (bad header, not UTF-8 text, ...)"""
+
+
+def normalize_currency(value):
+    """ISO 4217 code for a code, symbol or prefix such as 'eur', '€' or 'S$'"""
+    value = value.strip()
+    code = CURRENCY_ALIASES.get(value) or CURRENCY_ALIASES.get(value.upper()) or value.upper()
+    if len(code) != 3 or not code.isalpha() or not code.isascii():
+        raise ValueError(f"Unknown currency {value!r}")
+    return code
+
+
+# Thousands groups split by '.' or ',', e.g. '1,234,567'
+_GROUPED = {separator: re.compile(r'[+-]?\d{1,3}(?:%s\d{3})+' % re.escape(separator)) for separator in '.,'}
+# Digits with at most two decimals after a '.': the common case, with nothing to disambiguate
+_PLAIN_NUMBER = re.compile(r'[+-]?\d+(?:\.\d{1,2})?')
+
+
+def _grouped(text, separator):
+    return _GROUPED[separator].fullmatch(text) is not None
+
+
+def _ambiguous(text):
+    return ValueError(f"Ambiguous number {text!r}: write it as 1234.50, 1,234.50 or 1.234,50.")
+
+
+def _number(text):
+    """
+    Decimal from '1,234.50', '1.234,50', '1 234.50' or '12,50'. With both '.'
+    and ',' the last one is the decimal separator; a lone comma before 1-2
+    digits is a decimal comma. '1.234' could be either, so it is rejected.
+    """
+    if _PLAIN_NUMBER.fullmatch(text):
+        return Decimal(text)
+    text = text.replace(' ', '')
+    if '.' in text and ',' in text:
+        decimal = '.' if text.rfind('.') > text.rfind(',') else ','
+        whole, _, fraction = text.rpartition(decimal)
+        if decimal in whole or not _grouped(whole, ',' if decimal == '.' else '.'):
+            raise _ambiguous(text)
+        text = re.sub(r'[.,]', '', whole) + '.' + fraction
+    elif ',' in text:
+        if text.count(',') == 1 and re.search(r',\d{1,2}$', text):
+            text = text.replace(',', '.')
+        elif _grouped(text, ','):
+            text = text.replace(',', '')
+        else:
+            raise _ambiguous(text)
+    elif text.count('.') > 1:
+        if not _grouped(text, '.'):
+            raise _ambiguous(text)
+        text = text.replace('.', '')
+    elif _grouped(text, '.'):
+        raise _ambiguous(text)
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        raise ValueError('A valid number is required.')
+
+
+_fit_bounds = {}
+
+
+def _fit(value, max_digits, places):
+    bounds = _fit_bounds.get((max_digits, places))
+    if bounds is None:
+        bounds = _fit_bounds[max_digits, places] = (Decimal(10) ** (max_digits - places), Decimal(1).scaleb(-places))
+    limit, exponent = bounds
+    if abs(value) >= limit:
+        raise ValueError(f"Ensure there are no more than {max_digits - places} digits before the decimal point.")
+    value = value.quantize(exponent, rounding=ROUND_HALF_UP)
+    if abs(value) >= limit:
+        raise ValueError(f"Ensure there are no more than {max_digits - places} digits before the decimal point.")
+    return value
+
+
+def split_amount(text):
+    """(Decimal, currency symbol or code as written, or None) from '€12.50', '12.50 EUR', '1.200,50 €', ..."""
+    match = _AMOUNT.match(text)
+    if not match:
+        raise ValueError('A valid number is required.')
+    symbols = [s for s in (match['before'], match['after']) if s]
+    if len(symbols) > 1:
+        raise ValueError('A valid number is required.')
+    if symbols:
+        normalize_currency(symbols[0])
+    return _fit(_number(match['number']), 10, 2), symbols[0] if symbols else None
+
+
+def _decimal(max_digits, places):
+    return lambda text: _fit(_number(text), max_digits, places)
+
+
+def _text(max_length=None):
+    def parse(text):
+        if max_length is not None and len(text) > max_length:
+            raise ValueError(f"Ensure this field has no more than {max_length} characters.")
+        return text
+    return parse
+
+
+def _choice(*choices):
+    def parse(text):
+        if text.lower() not in choices:
+            raise ValueError(f"Expected one of: {', '.join(choices)}")
+        return text.lower()
+    return parse
+
+
+def _date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise ValueError('Date has wrong format. Use YYYY-MM-DD.')
+
+
+def _time(text):
+    try:
+        return time.fromisoformat(text)
+    except ValueError:
+        raise ValueError('Time has wrong format. Use hh:mm[:ss].')
+
+
+def _boolean(text):
+    value = text.lower()
+    if value in ('1', 'true', 'yes', 'y'):
+        return True
+    if value in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError('Must be a valid boolean.')
+
+
+def _names(text):
+    """A JSON list, or names separated by ';' or ','"""
+    if text.startswith('['):
+        return _json(list)(text)
+    return [name.strip() for name in re.split(r'[;,]', text) if name.strip()]
+
+
+def _json(kind):
+    def parse(text):
+        try:
+            value = json.loads(text)
+        except ValueError:
+            raise ValueError('Value must be valid JSON.')
+        if not isinstance(value, kind):
+            raise ValueError(f"Expected a JSON {'list' if kind is list else 'object'}.")
+        return value
+    return parse
+
+
+_validate_url = URLValidator()
+# scheme://[user@]host[:port], then a path/query/fragment that URLValidator only requires to be free of whitespace
+_URL_PARTS = re.compile(r'([^:/?#\s]+://[^/?#\s]*)([/?#]\S*)?')
+
+
+@functools.lru_cache(maxsize=1024)
+def _valid_url_origin(origin):
+    try:
+        _validate_url(origin)
+    except DjangoValidationError:
+        return False
+    return True
+
+
+def _url(text):
+    if len(text) > 500:
+        raise ValueError('Ensure this field has no more than 500 characters.')
+    # Whether a URL is valid depends only on its origin, so photos on one host share a check
+    match = _URL_PARTS.fullmatch(text)
+    if match is None or not _valid_url_origin(match[1]):
+        raise ValueError('Enter a valid URL.')
+    return text
+
+
+def _clean_expense(values, trip):
+    amount, symbol = values['amount']
+    if symbol == '$' and trip.currency in DOLLAR_CURRENCIES:
+        symbol = trip.currency
+    symbol = symbol and normalize_currency(symbol)
+    currency = values.pop('currency', None)
+    if symbol and currency and symbol != currency:
+        raise ValueError({'amount': [f"Amount is in {symbol} but the currency column says {currency}."]})
+    values['amount'] = amount
+    values['currency'] = currency or symbol or trip.currency
+
+
+# column -> (parser, required); blank optional cells take the model field's default
+EXPENSE_COLUMNS = {
+    'date': (_date, True),
+    'description': (_text(200), True),
+    'amount': (split_amount, True),
+    'currency': (normalize_currency, False),
+    'category': (_text(50), False),
+    'paid_by': (_text(100), False),
+    'split_between': (_names, False),
+    'split_type': (_choice('equal', 'percentage', 'fixed'), False),
+    'split_details': (_json(dict), False),
+    'is_recurring': (_boolean, False),
+    'recurrence_pattern': (_choice('daily', 'weekly', 'monthly'), False),
+}
+
+ITINERARY_COLUMNS = {
+    'date': (_date, True),
+    'location': (_text(200), True),
+    'activity': (_text(200), False),
+    'time': (_time, False),
+    'duration': (_decimal(5, 2), False),
+    'estimated_cost': (_decimal(10, 2), False),
+    'notes': (_text(), False),
+    'photo_url': (_url, False),
+    'links': (_json(list), False),
+}
+
+
+def _append_to_days(trip, rows):
+    """Positions at the end of each row's day, like reorder.assign_positions does for instances"""
+    last = (
+        Itinerary.objects.filter(trip=trip, date__in={row['date'] for row in rows})
+        .values('date').annotate(last=Max('position')).order_by()
+    )
+    next_free = {entry['date']: entry['last'] + 1 for entry in last}
+    for row in rows:
+        row['position'] = next_free.get(row['date'], 0)
+        next_free[row['date']] = row['position'] + 1
+
+
+# kind -> (model, columns, per-row clean hook, hook run on each chunk before it is inserted)
+IMPORT_KINDS = {
+    'expense': (Expense, EXPENSE_COLUMNS, _clean_expense, None),
+    'itinerary': (Itinerary, ITINERARY_COLUMNS, None, _append_to_days),
+}
+
+# Fields whose Python values the database drivers take as they are
+_PLAIN_FIELDS = (models.CharField, models.TextField, models.BooleanField, models.IntegerField, models.ForeignKey)
+# Callable defaults that return an equal fresh value every call, e.g. JSONField(default=list)
+_VALUE_FACTORIES = (list, dict)
+
+
+def _plain_bulk_create(model):
+    """Whether the default manager and its queryset use QuerySet.bulk_create unchanged"""
+    manager = model._default_manager
+    manager_method = type(manager).bulk_create
+    return (
+        getattr(manager_method, '__wrapped__', None) is models.QuerySet.bulk_create
+        and type(manager.get_queryset()).bulk_create is models.QuerySet.bulk_create
+    )
+
+
+def _insert_plan(model, connection):
+    """
+    (attname, prep, default, make_default) per concrete non-pk field. Constant
+    defaults (and list/dict ones, which are equal every call) are prepared
+    once; other callable defaults and auto_now(_add) fields get `make_default`,
+    called for every row as Model.__init__/pre_save would.
+    """
+    plan = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        prep = None if isinstance(field, _PLAIN_FIELDS) else field.get_db_prep_save
+        make_default = None
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            make_default = timezone.now
+        elif field.has_default() and callable(field.default) and field.default not in _VALUE_FACTORIES:
+            make_default = field.get_default
+        default = None if make_default else field.get_default()
+        if prep is not None and default is not None:
+            default = prep(default, connection)
+        plan.append((field.attname, prep, default, make_default))
+    return plan
+
+
+def insert_rows(model, rows, batch_size):
+    """
+    INSERT `rows` (dicts of attname -> value; missing fields take their
+    defaults). bulk_create compiles SQL for every value and builds a model
+    instance per row, which costs several times the parsing itself, so models
+    without a bulk_create override get one executemany per batch instead.
+    Values still go through get_db_prep_save, so JSON, decimals and dates are
+    adapted per backend. A model whose manager or queryset overrides
+    bulk_create goes through it, so the override runs.
+    """
+    if not _plain_bulk_create(model):
+        model._default_manager.bulk_create([model(**row) for row in rows], batch_size=batch_size)
+        return
+    connection = connections[router.db_for_write(model)]
+    plan = _insert_plan(model, connection)
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(model._meta.get_field(name).column) for name, *_ in plan),
+        ', '.join(['%s'] * len(plan)),
+    )
+    params = []
+    for row in rows:
+        values = []
+        for name, prep, default, make_default in plan:
+            if name in row:
+                value = row[name]
+            elif make_default is None:
+                values.append(default)
+                continue
+            else:
+                value = make_default()
+            values.append(value if prep is None or value is None else prep(value, connection))
+        params.append(values)
+    with connection.cursor() as cursor:
+        for start in range(0, len(params), batch_size):
+            cursor.executemany(sql, params[start:start + batch_size])
+
+
+def decode_lines(chunks):
+    """Text lines from an iterable of byte lines (an upload or request body), dropping a UTF-8 BOM"""
+    return codecs.iterdecode(chunks, 'utf-8-sig')
+
+
+def _header(reader, columns):
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ImportFileError('The file is empty.')
+    except (UnicodeDecodeError, csv.Error):
+        raise ImportFileError('The header row is not readable CSV text.')
+    names = [name.strip().lower().replace(' ', '_') for name in header]
+    missing = [name for name, (_, required) in columns.items() if required and name not in names]
+    if missing:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+    duplicates = {name for name in names if name and names.count(name) > 1}
+    if duplicates:
+        raise ImportFileError(f"Duplicate column(s): {', '.join(sorted(duplicates))}")
+    return names
+
+
+def import_csv(trip, kind, lines, chunk_size=None):
+    """
+    Import rows of `kind` ('expense' or 'itinerary') from CSV text `lines` into
+    `trip`. Returns a report: created/failed/skipped counts, per-line errors
+    (at most IMPORT_MAX_ERRORS of them) and the columns that were ignored.
+    Raises ImportFileError, rolling back, when the file itself is unusable.
+    """
+    model, columns, clean, prepare = IMPORT_KINDS[kind]
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    max_errors = settings.IMPORT_MAX_ERRORS
+    reader = csv.reader(lines)
+    names = _header(reader, columns)
+    # (column, cell index, parser, required) for the columns present in the file
+    present = [(name, names.index(name), *columns[name]) for name in columns if name in names]
+    type_index = names.index('type') if 'type' in names else None
+    # In an export, the other record types' columns are expected rather than ignored by mistake
+    expected = _IGNORED_COLUMNS | (set(csv_columns()) if type_index is not None else set())
+
+    report = {
+        'created': 0, 'failed': 0, 'skipped': 0, 'errors': [], 'errors_truncated': False,
+        'ignored_columns': [name for name in names if name and name not in columns and name not in expected],
+    }
+    pending = []
+
+    def flush():
+        if prepare:
+            prepare(trip, pending)
+        insert_rows(model, pending, chunk_size)
+        report['created'] += len(pending)
+        pending.clear()
+
+    with transaction.atomic():
+        try:
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    continue
+                if type_index is not None and type_index < len(row) and row[type_index].strip() not in ('', kind):
+                    report['skipped'] += 1
+                    continue
+
+                values, errors = {}, {}
+                for name, index, parse, required in present:
+                    text = row[index].strip() if index < len(row) else ''
+                    if text:
+                        try:
+                            values[name] = parse(text)
+                        except ValueError as e:
+                            errors[name] = [str(e)]
+                    elif required:
+                        errors[name] = ['This field is required.']
+                if clean and not errors:
+                    try:
+                        clean(values, trip)
+                    except ValueError as e:
+                        errors = e.args[0]
+
+                if errors:
+                    report['failed'] += 1
+                    if len(report['errors']) < max_errors:
+                        report['errors'].append({'line': reader.line_num, 'errors': errors})
+                    else:
+                        report['errors_truncated'] = True
+                    continue
+                values['trip_id'] = trip.pk
+                pending.append(values)
+                if len(pending) >= chunk_size:
+                    flush()
+        except UnicodeDecodeError:
+            raise ImportFileError(f"Line {reader.line_num + 1} is not valid UTF-8 text.")
+        except csv.Error as e:
+            raise ImportFileError(f"Line {reader.line_num}: {e}")
+
+        if pending:
+            flush()
+        if report['created']:
+            # Neither insert path sends post_save, so bump the trip's version here
+            touch_trips([trip.pk])
+    return report
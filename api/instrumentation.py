@@ -0,0 +1,75 @@
+# api/instrumentation.py
+"""
+Request-scoped timing spans.
+
+PerformanceMiddleware opens a RequestMetrics for each request; code anywhere
+below it wraps expensive work in `span('serialize')`, `span('http')` or
+`span('llm')`. Outside a request (management commands, background job
+threads) spans are no-ops. A span nested inside another span of the same
+name is not counted twice.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self, capture_sql=0):
+        self.started = time.perf_counter()
+        self.totals = {}     # span name -> seconds
+        self.counts = {}     # span name -> number of outermost spans
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.capture_sql = capture_sql
+        self.queries = []    # (sql, seconds), up to capture_sql entries
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record_query(self, sql, seconds):
+        self.db_queries += 1
+        self.db_time += seconds
+        if len(self.queries) < self.capture_sql:
+            self.queries.append((sql, seconds))
+
+
+def current():
+    return _current.get()
+
+
+def start_request(capture_sql=0):
+    metrics = RequestMetrics(capture_sql)
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    metrics = _current.get()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add(name, time.perf_counter() - started)
+
+
+class TimedSerializerMixin:
+    """Count time spent turning objects into primitives towards the request's 'serialize' span"""
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
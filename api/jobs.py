@@ -0,0 +1,191 @@
+# api/jobs.py
+"""
+Background runner for LLM suggestion generation.
+
+Jobs are stored as GenerationJob rows so any gunicorn worker can answer a
+status poll. How they are executed depends on settings.LLM_JOB_BACKEND:
+
+- 'thread': an in-process thread pool picks the job up right away (default)
+- 'db':     the job stays PENDING until `manage.py run_generation_jobs` claims it
+- 'sync':   the job runs inline before the request returns (tests, debugging)
+
+Concurrent LLM calls are capped per process by settings.LLM_MAX_CONCURRENT_CALLS.
+
+A job RUNNING for longer than LLM_JOB_TIMEOUT has lost its runner (the
+process died or hung), and so has one left PENDING that long by the thread
+or sync backend. Such jobs are requeued, with a fresh queued_at, when their
+destination is requested, they are polled, or run_generation_jobs looks for
+work. PENDING jobs are never stale with the db backend: they are waiting in
+its queue. Every claim stamps started_at, and a runner only records its
+result while that claim still holds, so a late runner cannot overwrite a
+job that was requeued meanwhile.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .destinations import normalize_destination
+from .instrumentation import span
+from .models import GenerationJob
+from .singleflight import SingleFlight
+from .suggestion_cache import cache_suggestions
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_llm_slots = None
+# In-process de-duplication of LLM calls for the same destination
+_generation_flights = SingleFlight()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.LLM_JOB_WORKERS, thread_name_prefix='llm-job'
+            )
+    return _executor
+
+
+def _get_llm_slots():
+    global _llm_slots
+    with _executor_lock:
+        if _llm_slots is None:
+            _llm_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENT_CALLS)
+    return _llm_slots
+
+
+def _generate_and_cache(destination):
+    from .views import generate_events_with_llm
+
+    with _get_llm_slots(), span('llm'):
+        events = generate_events_with_llm(destination)
+    cache_suggestions(destination, events)
+    return events
+
+
+def generate_suggestions(destination):
+    """
+    Call the LLM (bounded by the concurrency limit) and cache the result.
+
+    Concurrent calls for the same normalized destination share one LLM call.
+    """
+    return _generation_flights.do(
+        normalize_destination(destination), _generate_and_cache, destination
+    )
+
+
+def run_job(job_id):
+    """Execute a PENDING job. Returns False if another runner already claimed it."""
+    started_at = timezone.now()
+    claimed = GenerationJob.objects.filter(
+        pk=job_id, status=GenerationJob.STATUS_PENDING
+    ).update(status=GenerationJob.STATUS_RUNNING, started_at=started_at)
+    if not claimed:
+        return False
+
+    job = GenerationJob.objects.get(pk=job_id)
+    try:
+        events = generate_suggestions(job.destination)
+    except Exception as e:
+        logger.exception('Generation job %s failed', job_id)
+        result = {'status': GenerationJob.STATUS_FAILED, 'error': str(e)}
+    else:
+        result = {'status': GenerationJob.STATUS_SUCCEEDED, 'events_data': events}
+    # Only while our claim holds: the job may have been requeued (and reclaimed) meanwhile
+    if not GenerationJob.objects.filter(
+        pk=job_id, status=GenerationJob.STATUS_RUNNING, started_at=started_at
+    ).update(finished_at=timezone.now(), **result):
+        logger.warning('Generation job %s was requeued while running; result dropped', job_id)
+    return True
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+def _dispatch(job_id):
+    """Hand a PENDING job to the configured backend"""
+    backend = settings.LLM_JOB_BACKEND
+    if backend == 'sync':
+        run_job(job_id)
+    elif backend == 'thread':
+        _get_executor().submit(_run_in_thread, job_id)
+    # 'db': left PENDING for run_generation_jobs
+
+
+def requeue_stale_jobs(**filters):
+    """Put jobs matching `filters` whose runner was lost back in the queue; returns how many"""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.LLM_JOB_TIMEOUT)
+    stale = Q(status=GenerationJob.STATUS_RUNNING, started_at__lt=cutoff)
+    if settings.LLM_JOB_BACKEND != 'db':
+        # Nothing else will pick these up; the db backend's queue does
+        stale |= Q(status=GenerationJob.STATUS_PENDING, queued_at__lt=cutoff)
+    job_ids = list(GenerationJob.objects.filter(stale, **filters).values_list('pk', flat=True))
+    if not job_ids:
+        return 0
+    requeued = GenerationJob.objects.filter(stale, pk__in=job_ids).update(
+        status=GenerationJob.STATUS_PENDING, started_at=None, queued_at=now,
+    )
+    # A job requeued by another process at the same time is claimed by only one runner
+    for job_id in job_ids:
+        _dispatch(job_id)
+    return requeued
+
+
+def _active_job(destination_key):
+    requeue_stale_jobs(destination_key=destination_key)
+    return GenerationJob.objects.filter(
+        destination_key=destination_key,
+        status__in=[GenerationJob.STATUS_PENDING, GenerationJob.STATUS_RUNNING],
+    ).first()
+
+
+def enqueue_generation(destination):
+    """
+    Create a generation job and hand it to the configured backend.
+
+    If a job for the same destination is already pending or running, that job
+    is returned instead, so simultaneous requests trigger a single generation.
+    The partial unique constraint on destination_key settles races between
+    processes.
+    """
+    destination_key = normalize_destination(destination)
+    job = _active_job(destination_key)
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            job = GenerationJob.objects.create(destination=destination, destination_key=destination_key)
+    except IntegrityError:
+        job = _active_job(destination_key)
+        if job is not None:
+            return job
+        # The competing job finished between our insert and lookup; queue a fresh one
+        job = GenerationJob.objects.create(destination=destination, destination_key=destination_key)
+
+    _dispatch(job.pk)
+    if settings.LLM_JOB_BACKEND == 'sync':
+        job.refresh_from_db()
+    return job
+
+
+def pending_job_ids(limit):
+    return list(
+        GenerationJob.objects.filter(status=GenerationJob.STATUS_PENDING)
+        .order_by('created_at')
+        .values_list('pk', flat=True)[:limit]
+    )
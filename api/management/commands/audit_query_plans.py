@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.query_audit import audit_hot_queries, is_supported
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot per-trip queries on seeded data and fail on sequential scans or sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just failing ones')
+
+    def handle(self, *args, **options):
+        if not is_supported(connection.vendor):
+            raise CommandError(
+                f"Query plan audit supports SQLite and PostgreSQL; the {connection.vendor} backend is not checked"
+            )
+
+        try:
+            with transaction.atomic():
+                results = audit_hot_queries()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        failures = 0
+        for name, plan, problems in results:
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"✗ {name}"))
+                for problem in problems:
+                    self.stdout.write(f"    {problem}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✓ {name}"))
+            if problems or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"      {line}")
+
+        if failures:
+            raise CommandError(f"{failures} of {len(results)} hot queries are not served by an index")
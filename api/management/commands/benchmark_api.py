@@ -0,0 +1,111 @@
+import json
+import platform
+import sys
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmark import SCENARIOS, compare_results, dataset_counts, generate_dataset, run_scenarios
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark API endpoints against a synthetic data set in a throwaway test database, '
+        'with the LLM and AviationStack stubbed out'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=200)
+        parser.add_argument('--items-per-trip', type=int, default=20)
+        parser.add_argument('--expenses-per-trip', type=int, default=100)
+        parser.add_argument('--travel-methods-per-trip', type=int, default=None,
+                            help='Defaults to one leg between each pair of consecutive items')
+        parser.add_argument('--activities-per-trip', type=int, default=5)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Run only scenarios whose name contains NAME')
+        parser.add_argument('--stub-latency-ms', type=float, default=0,
+                            help='Simulated latency of the stubbed LLM and flight provider')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the benchmark database and reuse its data on the next run')
+        parser.add_argument('--output', help='Write the JSON report to this file ("-" for stdout)')
+        parser.add_argument('--compare', help='Previous JSON report to check for regressions')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Flag a regression when p50 grows by more than this factor')
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            scenarios = [s for s in SCENARIOS if any(name.lower() in s.name.lower() for name in options['only'])]
+            if not scenarios:
+                raise CommandError(f"No scenario matches {options['only']}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            report = self._run(scenarios, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self._print_table(report['results'])
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as handle:
+                regressions = compare_results(json.load(handle), report['results'], options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f"✗ {regression}"))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def _run(self, scenarios, options):
+        counts = dataset_counts()
+        if not counts['trips']:
+            started = time.perf_counter()
+            counts = generate_dataset(
+                trips=options['trips'],
+                items_per_trip=options['items_per_trip'],
+                expenses_per_trip=options['expenses_per_trip'],
+                travel_methods_per_trip=options['travel_methods_per_trip'],
+                activities_per_trip=options['activities_per_trip'],
+            )
+            self.stderr.write(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+        else:
+            self.stderr.write(f"Reusing data set {counts}")
+
+        results = run_scenarios(
+            scenarios, iterations=options['iterations'], warmup=options['warmup'],
+            stub_latency_ms=options['stub_latency_ms'],
+        )
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'dataset': counts,
+                'iterations': options['iterations'],
+                'stub_latency_ms': options['stub_latency_ms'],
+            },
+            'results': results,
+        }
+
+    def _print_table(self, results):
+        self.stdout.write(f"{'scenario':<28} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'queries':>8}  status")
+        for r in results:
+            self.stdout.write(
+                f"{r['name']:<28} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['max_ms']:>9.2f} "
+                f"{r['queries']:>8}  {','.join(map(str, r['statuses']))}"
+            )
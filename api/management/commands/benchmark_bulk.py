@@ -0,0 +1,90 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.models import Trip
+from api.views import ExpenseViewSet, ItineraryViewSet
+
+
+def _expense(trip, i):
+    return {
+        'trip': trip.id,
+        'description': f'Expense {i}',
+        'amount': '12.50',
+        'currency': 'EUR',
+        'category': 'Food',
+        'date': str(trip.start_date + timedelta(days=i % 5)),
+        'paid_by': 'Alice',
+        'split_between': ['Alice', 'Bob'],
+    }
+
+
+def _itinerary(trip, i):
+    return {
+        'trip': trip.id,
+        'date': str(trip.start_date + timedelta(days=i % 5)),
+        'location': f'Stop {i}',
+        'activity': 'Sightseeing',
+    }
+
+
+RESOURCES = {
+    'expenses': (ExpenseViewSet, _expense),
+    'itinerary': (ItineraryViewSet, _itinerary),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row POSTs with the /bulk/ endpoint; all rows are rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='Batch sizes to time')
+        parser.add_argument('--resource', choices=sorted(RESOURCES), default='expenses')
+
+    def _run(self, view, requests):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for request in requests:
+                response = view(request)
+                if response.status_code != 201:
+                    raise RuntimeError(f"Unexpected {response.status_code}: {response.data}")
+            elapsed = time.perf_counter() - started
+        return elapsed * 1000, len(queries)
+
+    def handle(self, *args, **options):
+        viewset, make_item = RESOURCES[options['resource']]
+        factory = APIRequestFactory()
+        single = viewset.as_view({'post': 'create'})
+        bulk = viewset.as_view({'post': 'bulk'})
+        path = f"/api/{options['resource']}/"
+
+        self.stdout.write(f"{'rows':>6} {'per-row ms':>12} {'queries':>8} {'bulk ms':>10} {'queries':>8} {'speedup':>8}")
+        try:
+            with transaction.atomic():
+                trip = Trip.objects.create(
+                    name='Bulk benchmark', destination='Paris',
+                    start_date=date(2026, 5, 1), end_date=date(2026, 5, 5), travelers=['Alice', 'Bob'],
+                )
+                for size in options['sizes']:
+                    items = [make_item(trip, i) for i in range(size)]
+                    per_row_ms, per_row_queries = self._run(
+                        single, [factory.post(path, item, format='json') for item in items]
+                    )
+                    bulk_ms, bulk_queries = self._run(
+                        bulk, [factory.post(f'{path}bulk/', items, format='json')]
+                    )
+                    self.stdout.write(
+                        f"{size:>6} {per_row_ms:>12.1f} {per_row_queries:>8} {bulk_ms:>10.1f} {bulk_queries:>8} "
+                        f"{per_row_ms / bulk_ms:>7.1f}x"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
@@ -0,0 +1,124 @@
+import gc
+import resource
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.models import Trip, Expense
+
+
+def current_rss_mb():
+    """Resident set size now (Linux), or the peak so far where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as handle:
+            pages = int(handle.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class RssSampler(threading.Thread):
+    """Track the highest RSS seen while running"""
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream the all-trips export over a synthetic data set in a throwaway test database '
+        'and report how far peak RSS rises above the starting point'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=1_000_000)
+        parser.add_argument('--trips', type=int, default=100)
+        parser.add_argument('--formats', nargs='+', default=['jsonl', 'csv'], choices=['jsonl', 'csv'])
+        parser.add_argument('--max-growth-mb', type=float, default=None,
+                            help='Exit non-zero when RSS grows by more than this during an export')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            results = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write(f"{'format':<7} {'rows':>9} {'MB out':>8} {'seconds':>8} {'start MB':>9} {'peak MB':>8} {'growth':>7}")
+        for result in results:
+            self.stdout.write(
+                f"{result['format']:<7} {result['rows']:>9} {result['bytes'] / 2**20:>8.1f} {result['seconds']:>8.1f} "
+                f"{result['start_mb']:>9.1f} {result['peak_mb']:>8.1f} {result['peak_mb'] - result['start_mb']:>7.1f}"
+            )
+
+        limit = options['max_growth_mb']
+        if limit is not None:
+            over = [r['format'] for r in results if r['peak_mb'] - r['start_mb'] > limit]
+            if over:
+                raise CommandError(f"RSS grew by more than {limit} MB during the {', '.join(over)} export")
+            self.stdout.write(self.style.SUCCESS(f"RSS stayed within {limit} MB of its starting point"))
+
+    def _generate(self, options):
+        started = time.perf_counter()
+        trips = Trip.objects.bulk_create([
+            Trip(name=f'Export trip {n}', destination='Anywhere', start_date=date(2026, 5, 1),
+                 end_date=date(2026, 5, 30), travelers=['Alice', 'Bob'])
+            for n in range(options['trips'])
+        ])
+        # Small batches keep the generator's own footprint out of the measurement
+        batch = 5000
+        for first in range(0, options['expenses'], batch):
+            Expense.objects.bulk_create([
+                Expense(trip=trips[n % len(trips)], description=f'Expense {n}', amount=Decimal(n % 500) + Decimal('0.99'),
+                        currency='EUR', category='Food', date=date(2026, 5, 1) + timedelta(days=n % 30),
+                        paid_by='Alice', split_between=['Alice', 'Bob'])
+                for n in range(first, min(first + batch, options['expenses']))
+            ])
+        self.stderr.write(f"Generated {options['expenses']} expenses in {time.perf_counter() - started:.1f}s")
+
+    def _run(self, options):
+        if not Expense.objects.exists():
+            self._generate(options)
+        rows = Trip.objects.count() + Expense.objects.count()
+
+        client = Client()
+        results = []
+        for export_format in options['formats']:
+            gc.collect()
+            sampler = RssSampler()
+            start_mb = sampler.peak
+            sampler.start()
+            started = time.perf_counter()
+            response = client.get('/api/trips/export/', {'format': export_format})
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            response.close()
+            seconds = time.perf_counter() - started
+            sampler.stop()
+            results.append({
+                'format': export_format, 'rows': rows, 'bytes': size, 'seconds': seconds,
+                'start_mb': start_mb, 'peak_mb': sampler.peak,
+            })
+        return results
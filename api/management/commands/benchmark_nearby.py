@@ -0,0 +1,101 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.geo import KM_PER_DEGREE, haversine_matrix, nearby
+from api.models import Trip, Stop
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare /api/stops/nearby/ (geohash range scans) with loading every stop and '
+        'filtering in Python, on a synthetic data set in a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, default=1_000_000)
+        parser.add_argument('--trips', type=int, default=1000)
+        parser.add_argument('--cities', type=int, default=200, help='Stops cluster around this many centres')
+        parser.add_argument('--radius', type=float, default=2.0, help='Search radius in km')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--naive-queries', type=int, default=3)
+        parser.add_argument('--keepdb', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    def _generate(self, options, rng):
+        started = time.perf_counter()
+        trips = Trip.objects.bulk_create([
+            Trip(name=f'Nearby trip {n}', destination='Anywhere', start_date='2026-05-01', end_date='2026-05-07')
+            for n in range(options['trips'])
+        ])
+        centres = np.column_stack([rng.uniform(-55, 60, options['cities']), rng.uniform(-180, 180, options['cities'])])
+        chunk = 50_000
+        for first in range(0, options['stops'], chunk):
+            size = min(chunk, options['stops'] - first)
+            # ~5 km spread around each centre
+            picked = centres[rng.integers(0, len(centres), size)]
+            lats = np.clip(picked[:, 0] + rng.normal(0, 5 / KM_PER_DEGREE, size), -90, 90)
+            lons = (picked[:, 1] + rng.normal(0, 5 / KM_PER_DEGREE, size) + 180) % 360 - 180
+            Stop.objects.bulk_create([
+                Stop(trip=trips[(first + i) % len(trips)], name=f'Stop {first + i}',
+                     latitude=float(lat), longitude=float(lon), order=i)
+                for i, (lat, lon) in enumerate(zip(lats, lons))
+            ], batch_size=5000)
+        self.stderr.write(f"Generated {options['stops']} stops in {time.perf_counter() - started:.1f}s")
+
+    def _naive(self, latitude, longitude, radius):
+        rows = list(Stop.objects.order_by().values_list('pk', 'latitude', 'longitude'))
+        pks, lats, lons = zip(*rows)
+        distances = haversine_matrix([latitude], [longitude], lats, lons)[0]
+        return {pks[i] for i in np.flatnonzero(distances <= radius)}
+
+    def _run(self, options):
+        rng = np.random.default_rng(options['seed'])
+        if not Stop.objects.exists():
+            self._generate(options, rng)
+        total = Stop.objects.count()
+        radius = options['radius']
+
+        ids = Stop.objects.order_by().values_list('pk', flat=True)
+        probes = [
+            Stop.objects.values_list('latitude', 'longitude').get(pk=ids[int(i)])
+            for i in rng.integers(0, total, options['queries'])
+        ]
+
+        indexed, found = [], []
+        for latitude, longitude in probes:
+            started = time.perf_counter()
+            hits = nearby(Stop.objects.all(), latitude, longitude, radius, limit=total)
+            indexed.append((time.perf_counter() - started) * 1000)
+            found.append(len(hits))
+
+        naive = []
+        for latitude, longitude in probes[:options['naive_queries']]:
+            started = time.perf_counter()
+            expected = self._naive(latitude, longitude, radius)
+            naive.append((time.perf_counter() - started) * 1000)
+            got = {pk for pk, _ in nearby(Stop.objects.all(), latitude, longitude, radius, limit=total)}
+            if got != expected:
+                raise RuntimeError(f"Index and scan disagree at ({latitude}, {longitude})")
+
+        self.stdout.write(f"{total} stops, radius {radius} km, {statistics.mean(found):.0f} matches per query")
+        self.stdout.write(f"{'method':<14} {'queries':>8} {'p50 ms':>9} {'max ms':>9}")
+        for name, timings in (('geohash index', indexed), ('full scan', naive)):
+            self.stdout.write(
+                f"{name:<14} {len(timings):>8} {statistics.median(timings):>9.2f} {max(timings):>9.2f}"
+            )
+        self.stdout.write(f"Speed-up: {statistics.median(naive) / statistics.median(indexed):.0f}x")
@@ -0,0 +1,38 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.geo import haversine_matrix
+from api.routing import DayRoute
+
+
+class Command(BaseCommand):
+    help = 'Time the optimize-route solver on random city-sized days (no database needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[8, 20, 50, 100, 200], help='Stops per day')
+        parser.add_argument('--anchors', type=int, default=2, help='Stops with a fixed visit_time per day')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        self.stdout.write(f"{'stops':>6} {'method':<10} {'p50 ms':>9} {'max ms':>9} {'greedy km':>10} {'route km':>9}")
+        for size in options['sizes']:
+            timings, greedy, best = [], [], []
+            for _ in range(options['repeat']):
+                # ~10 km across, roughly a city centre; stop 0 is the hotel
+                dist = haversine_matrix(48.80 + rng.random(size) * 0.09, 2.25 + rng.random(size) * 0.14)
+                anchors = sorted(rng.choice(np.arange(1, size), size=min(options['anchors'], size - 1), replace=False))
+                problem = DayRoute(dist, start=0, end=0, anchors=[int(node) for node in anchors])
+                started = time.perf_counter()
+                route, method = problem.solve()
+                timings.append((time.perf_counter() - started) * 1000)
+                greedy.append(problem.length(problem.nearest_neighbour()))
+                best.append(problem.length(route))
+            self.stdout.write(
+                f"{size:>6} {method:<10} {statistics.median(timings):>9.1f} {max(timings):>9.1f} "
+                f"{statistics.mean(greedy):>10.2f} {statistics.mean(best):>9.2f}"
+            )
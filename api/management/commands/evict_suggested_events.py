@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.suggestion_cache import evict_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Evict expired suggested events, then least recently used ones down to a size cap'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-entries', type=int, default=settings.SUGGESTED_EVENTS_MAX_ENTRIES,
+            help='Maximum number of cached destinations to keep'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be evicted without deleting')
+
+    def handle(self, *args, **options):
+        expired, evicted = evict_suggestions(options['max_entries'], dry_run=options['dry_run'])
+        verb = 'Would evict' if options['dry_run'] else 'Evicted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {expired} expired and {evicted} least recently used suggestion entries"
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import ImportFileError, import_csv
+from api.models import Trip
+
+
+class Command(BaseCommand):
+    help = 'Import expenses and/or itinerary items from CSV files into an existing trip'
+
+    def add_arguments(self, parser):
+        parser.add_argument('trip_id', type=int)
+        parser.add_argument('--expenses', metavar='CSV', help='Expense rows (date, description, amount, ...)')
+        parser.add_argument('--itinerary', metavar='CSV', help='Itinerary rows (date, location, ...)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per bulk insert (IMPORT_CHUNK_SIZE)')
+        parser.add_argument('--show-errors', type=int, default=20, help='Print at most this many row errors')
+
+    def handle(self, *args, **options):
+        if not options['expenses'] and not options['itinerary']:
+            raise CommandError('Pass --expenses and/or --itinerary')
+        try:
+            trip = Trip.objects.get(pk=options['trip_id'])
+        except Trip.DoesNotExist:
+            raise CommandError(f"Trip {options['trip_id']} does not exist")
+
+        for kind, path in (('expense', options['expenses']), ('itinerary', options['itinerary'])):
+            if not path:
+                continue
+            started = time.perf_counter()
+            try:
+                with open(path, newline='', encoding='utf-8-sig') as handle:
+                    report = import_csv(trip, kind, handle, chunk_size=options['chunk_size'])
+            except (OSError, ImportFileError) as e:
+                raise CommandError(f"Could not import {path}: {e}")
+            elapsed = time.perf_counter() - started
+
+            rows = report['created'] + report['failed']
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {path}: {report['created']} {kind} rows imported, {report['failed']} failed, "
+                f"{report['skipped']} skipped in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)"
+            ))
+            if report['ignored_columns']:
+                self.stdout.write(f"  Ignored columns: {', '.join(report['ignored_columns'])}")
+            for error in report['errors'][:options['show_errors']]:
+                details = '; '.join(f"{name}: {' '.join(messages)}" for name, messages in error['errors'].items())
+                self.stderr.write(f"  line {error['line']}: {details}")
+            if report['failed'] > options['show_errors']:
+                self.stderr.write(f"  ... and {report['failed'] - options['show_errors']} more")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.fx import load_rates
+
+
+class Command(BaseCommand):
+    help = 'Load FX rates from a local CSV (date,currency,rate) or JSON snapshot; rates are units per 1 USD'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .json rate snapshot')
+
+    def handle(self, *args, **options):
+        try:
+            count = load_rates(options['path'])
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Could not load rates from {options['path']}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Loaded {count} exchange rates"))
@@ -0,0 +1,31 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import _run_in_thread, pending_job_ids, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued LLM generation jobs (for LLM_JOB_BACKEND=db)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = settings.LLM_JOB_WORKERS
+        self.stdout.write(f"Processing generation jobs with {workers} worker(s)")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-job') as pool:
+            while True:
+                requeue_stale_jobs()
+                job_ids = pending_job_ids(workers)
+                if job_ids:
+                    # run_job claims each id atomically, so several runners can share the queue
+                    wait([pool.submit(_run_in_thread, job_id) for job_id in job_ids])
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
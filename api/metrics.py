@@ -0,0 +1,271 @@
+# api/metrics.py
+"""
+In-process metrics registry with Prometheus text output.
+
+Counters and histograms live in memory per process. With settings.METRICS_DIR
+set (one directory shared by all gunicorn workers), a background thread in
+each process rewrites a snapshot file there every METRICS_FLUSH_INTERVAL
+seconds once something has changed, so the last increments before a worker
+goes idle still land. The /metrics view sums every worker's snapshot, so a
+scrape sees the whole server whichever worker answers it. Clear the directory
+when the server restarts.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}   # label values tuple -> value
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        self.registry.changed()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            # [count per bucket..., sum, count]; buckets are not cumulative here
+            sample = self.samples.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+        self.registry.changed()
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._flusher_pid = None
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    'kind': metric.kind,
+                    'documentation': metric.documentation,
+                    'labelnames': list(metric.labelnames),
+                    'buckets': list(getattr(metric, 'buckets', [])),
+                    'samples': [[list(key), value] for key, value in metric.samples.items()],
+                }
+                for name, metric in self.metrics.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.samples.clear()
+
+    # --- multi-process support ---
+
+    def _path(self):
+        return os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+
+    def changed(self):
+        if not settings.METRICS_DIR:
+            return
+        self._dirty = True
+        # Threads do not survive gunicorn's fork, so each worker starts its own
+        if self._flusher_pid != os.getpid():
+            with self._flush_lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(max(settings.METRICS_FLUSH_INTERVAL, 0.05))
+            if self._dirty and settings.METRICS_DIR:
+                self.flush()
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR (atomically, via rename)"""
+        if not settings.METRICS_DIR:
+            return
+        path = self._path()
+        with self._flush_lock:
+            self._dirty = False
+            tmp = None
+            try:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                # Unique name, so a flush racing another process or thread never shares a temp file
+                with tempfile.NamedTemporaryFile('w', dir=settings.METRICS_DIR, prefix='.metrics-',
+                                                 suffix='.tmp', delete=False) as handle:
+                    tmp = handle.name
+                    json.dump(self.snapshot(), handle)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"⚠️ Could not write metrics snapshot {path}: {e}")
+                if tmp and os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def collect(self):
+        """Snapshot for the whole server: every worker's file summed, or just this process"""
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for filename in sorted(os.listdir(settings.METRICS_DIR)):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, filename)) as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            for name, data in snapshot.items():
+                _merge(merged, name, data)
+        return merged
+
+
+def _merge(merged, name, data):
+    target = merged.setdefault(name, {**data, 'samples': []})
+    samples = {tuple(key): value for key, value in target['samples']}
+    for key, value in data['samples']:
+        key = tuple(key)
+        if key not in samples:
+            samples[key] = value
+        elif data['kind'] == 'histogram':
+            samples[key] = [a + b for a, b in zip(samples[key], value)]
+        else:
+            samples[key] += value
+    target['samples'] = [[list(key), value] for key, value in samples.items()]
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name in sorted(snapshot):
+        data = snapshot[name]
+        lines.append(f"# HELP {name} {data['documentation']}")
+        lines.append(f"# TYPE {name} {data['kind']}")
+        for key, value in sorted(data['samples']):
+            if data['kind'] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(data['buckets'], value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(data['labelnames'], key, [('le', _number(float(bound)))])} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(data['labelnames'], key, [('le', '+Inf')])} {value[-1]}")
+                lines.append(f"{name}_sum{_labels(data['labelnames'], key)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(data['labelnames'], key)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_labels(data['labelnames'], key)} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'travelplanner_http_request_duration_seconds', 'API request latency by view',
+    ['view', 'method', 'status'],
+)
+SUGGESTION_CACHE_LOOKUPS = REGISTRY.counter(
+    'travelplanner_suggestion_cache_lookups_total', 'SuggestedEvent cache lookups by result (hit, miss, expired)',
+    ['result'],
+)
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    'travelplanner_llm_call_seconds', 'Latency of LLM calls', ['provider', 'outcome'],
+)
+LLM_TOKENS = REGISTRY.counter(
+    'travelplanner_llm_tokens_total', 'Tokens consumed by LLM calls', ['provider', 'type'],
+)
+LLM_FALLBACKS = REGISTRY.counter(
+    'travelplanner_llm_fallbacks_total', 'Suggestion requests served by the keyword fallback instead of an LLM',
+)
+EXTERNAL_REQUESTS = REGISTRY.counter(
+    'travelplanner_external_requests_total',
+    'Outbound provider calls by outcome (HTTP status class, error or circuit_open)', ['provider', 'outcome'],
+)
+EXTERNAL_REQUEST_SECONDS = REGISTRY.histogram(
+    'travelplanner_external_request_seconds', 'Latency of outbound provider calls', ['provider'],
+)
+FLIGHT_CACHE_LOOKUPS = REGISTRY.counter(
+    'travelplanner_flight_cache_lookups_total', 'FlightInfo cache lookups by result (hit, miss, stale, stale_served)',
+    ['result'],
+)
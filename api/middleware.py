@@ -0,0 +1,119 @@
+# api/middleware.py
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import instrumentation
+from .metrics import REQUEST_SECONDS
+
+logger = logging.getLogger('api.performance')
+
+SPANS = ('serialize', 'http', 'llm')
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request: wall time, SQL query count and time, and the
+    serialize/http/llm spans from api.instrumentation.
+
+    The numbers go out as a Server-Timing header (visible in the browser's
+    network panel) and, with PERF_LOG_REQUESTS, as one JSON log line on the
+    `api.performance` logger. Requests slower than PERF_SLOW_REQUEST_MS also
+    log the SQL they ran.
+
+    Streaming responses (exports) send their headers before the body is
+    produced, so their Server-Timing only covers the time to the first byte.
+    The log line and the request histogram wait until the body has been
+    sent and include the queries run while streaming it.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERF_INSTRUMENTATION:
+            return self.get_response(request)
+
+        capture = settings.PERF_SLOW_SQL_LIMIT if settings.PERF_SLOW_REQUEST_MS else 0
+        metrics, token = instrumentation.start_request(capture_sql=capture)
+        try:
+            with self._recording(metrics):
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = self._server_timing(metrics, metrics.elapsed())
+        if response.streaming and not response.is_async:
+            response.streaming_content = self._streamed(request, response, metrics, response.streaming_content)
+        else:
+            self._finish(request, response, metrics)
+        return response
+
+    def _recording(self, metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self._sql_recorder(metrics)))
+        return stack
+
+    def _streamed(self, request, response, metrics, content):
+        try:
+            with self._recording(metrics):
+                yield from content
+        finally:
+            self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        total = metrics.elapsed()
+        match = getattr(request, 'resolver_match', None)
+        REQUEST_SECONDS.observe(
+            total, view=match.view_name if match else 'unmatched', method=request.method, status=response.status_code
+        )
+        self._log(request, response, metrics, total)
+
+    @staticmethod
+    def _sql_recorder(metrics):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                metrics.record_query(sql, time.perf_counter() - started)
+        return record
+
+    @staticmethod
+    def _server_timing(metrics, total):
+        entries = [
+            f'app;dur={total * 1000:.1f}',
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"',
+        ]
+        for name in SPANS:
+            if name in metrics.totals:
+                entries.append(f'{name};dur={metrics.totals[name] * 1000:.1f}')
+        return ', '.join(entries)
+
+    def _log(self, request, response, metrics, total):
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+            'db_queries': metrics.db_queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+        }
+        for name in SPANS:
+            record[f'{name}_ms'] = round(metrics.totals.get(name, 0.0) * 1000, 2)
+        if settings.PERF_LOG_REQUESTS:
+            logger.info(json.dumps(record))
+
+        threshold = settings.PERF_SLOW_REQUEST_MS
+        if threshold and total * 1000 >= threshold:
+            record['sql'] = [
+                {'sql': sql, 'ms': round(seconds * 1000, 2)} for sql, seconds in metrics.queries
+            ]
+            logger.warning(json.dumps({'slow_request': record}))
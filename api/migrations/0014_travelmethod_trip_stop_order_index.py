@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_itinerary_photo_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='travelmethod',
+            index=models.Index(fields=['trip', 'from_stop', 'order'], name='travelmethod_trip_stop_order'),
+        ),
+    ]
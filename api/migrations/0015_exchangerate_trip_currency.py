@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_travelmethod_trip_stop_order_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'ordering': ['currency', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='exchangerate_currency_date_unique')],
+            },
+        ),
+    ]
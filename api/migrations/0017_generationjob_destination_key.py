@@ -0,0 +1,68 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:41
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Frozen copy of api.destinations.normalize_destination and its aliases
+DESTINATION_ALIASES = {
+    'nyc': 'new york',
+    'new york city': 'new york',
+    'new york, ny': 'new york',
+    'la': 'los angeles',
+    'sf': 'san francisco',
+    'kl': 'kuala lumpur',
+    'hk': 'hong kong',
+    'saigon': 'ho chi minh city',
+    'bombay': 'mumbai',
+    'peking': 'beijing',
+    'rome, italy': 'rome',
+    'paris, france': 'paris',
+    'london, uk': 'london',
+    'tokyo, japan': 'tokyo',
+}
+
+
+def normalize_destination(destination):
+    decomposed = unicodedata.normalize('NFKD', destination)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    key = _WHITESPACE.sub(' ', stripped).strip().casefold()
+    aliases = {**DESTINATION_ALIASES, **getattr(settings, 'DESTINATION_ALIASES', {})}
+    return aliases.get(key, key)
+
+
+def populate_destination_keys(apps, schema_editor):
+    GenerationJob = apps.get_model('api', 'GenerationJob')
+    active_keys = set()
+    for job in GenerationJob.objects.order_by('created_at'):
+        job.destination_key = normalize_destination(job.destination)
+        if job.status in ('PENDING', 'RUNNING'):
+            if job.destination_key in active_keys:
+                job.status = 'FAILED'
+                job.error = 'Superseded by an earlier job for the same destination'
+            active_keys.add(job.destination_key)
+        job.save(update_fields=['destination_key', 'status', 'error'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='destination_key',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.RunPython(populate_destination_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='generationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('destination_key',), name='generationjob_one_active_per_destination'),
+        ),
+    ]
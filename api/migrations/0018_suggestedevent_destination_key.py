@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:45
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Frozen copy of api.destinations.normalize_destination and its aliases
+DESTINATION_ALIASES = {
+    'nyc': 'new york',
+    'new york city': 'new york',
+    'new york, ny': 'new york',
+    'la': 'los angeles',
+    'sf': 'san francisco',
+    'kl': 'kuala lumpur',
+    'hk': 'hong kong',
+    'saigon': 'ho chi minh city',
+    'bombay': 'mumbai',
+    'peking': 'beijing',
+    'rome, italy': 'rome',
+    'paris, france': 'paris',
+    'london, uk': 'london',
+    'tokyo, japan': 'tokyo',
+}
+
+
+def normalize_destination(destination):
+    decomposed = unicodedata.normalize('NFKD', destination)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    key = _WHITESPACE.sub(' ', stripped).strip().casefold()
+    aliases = {**DESTINATION_ALIASES, **getattr(settings, 'DESTINATION_ALIASES', {})}
+    return aliases.get(key, key)
+
+
+def populate_destination_keys(apps, schema_editor):
+    SuggestedEvent = apps.get_model('api', 'SuggestedEvent')
+    seen = set()
+    # Keep the most recently updated entry when several names normalize alike
+    for entry in SuggestedEvent.objects.order_by('-updated_at'):
+        key = normalize_destination(entry.destination)
+        if key in seen:
+            entry.delete()
+            continue
+        seen.add(key)
+        SuggestedEvent.objects.filter(pk=entry.pk).update(destination_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_generationjob_destination_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='suggestedevent',
+            name='destination',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AddField(
+            model_name='suggestedevent',
+            name='destination_key',
+            field=models.CharField(max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='suggestedevent',
+            name='last_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_destination_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='suggestedevent',
+            name='destination_key',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
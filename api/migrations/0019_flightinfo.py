@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_flight_number(flight_number):
+    # Frozen copy of api.flight_info.normalize_flight_number
+    return ''.join(flight_number.split()).upper()
+
+
+def move_flight_data(apps, schema_editor):
+    """Collapse per-trip copies of flight_data into one FlightInfo per (number, date)"""
+    Flight = apps.get_model('api', 'Flight')
+    FlightInfo = apps.get_model('api', 'FlightInfo')
+    infos = {}
+    # Newest copy wins when trips disagree
+    for flight in Flight.objects.order_by('-created_at'):
+        key = (normalize_flight_number(flight.flight_number), flight.flight_date)
+        if key not in infos and flight.flight_data:
+            infos[key] = FlightInfo.objects.create(
+                flight_number=key[0], flight_date=key[1],
+                data=flight.flight_data, fetched_at=flight.created_at,
+            )
+        if key in infos:
+            flight.info = infos[key]
+            flight.save(update_fields=['info'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_suggestedevent_destination_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightInfo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(max_length=20)),
+                ('flight_date', models.DateField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['flight_date', 'flight_number'],
+                'constraints': [models.UniqueConstraint(fields=('flight_number', 'flight_date'), name='flightinfo_number_date_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='info',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flights', to='api.flightinfo'),
+        ),
+        migrations.RunPython(move_flight_data, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='flight',
+            name='flight_data',
+        ),
+    ]
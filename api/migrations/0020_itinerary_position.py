@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+def number_positions(apps, schema_editor):
+    """Number each day's items 0..n-1 in their previous (date, time) order"""
+    Itinerary = apps.get_model('api', 'Itinerary')
+    items = list(Itinerary.objects.order_by('trip_id', 'date', 'time', 'id'))
+    day, position = None, 0
+    for item in items:
+        if (item.trip_id, item.date) != day:
+            day, position = (item.trip_id, item.date), 0
+        item.position = position
+        position += 1
+    Itinerary.objects.bulk_update(items, ['position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_flightinfo'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='itinerary',
+            options={'ordering': ['date', 'position', 'time'], 'verbose_name_plural': 'Itineraries'},
+        ),
+        migrations.AddField(
+            model_name='itinerary',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(number_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+from api.search import drop_sqlite_fts, install_sqlite_fts, search_vector
+
+GIN_INDEX_NAME = 'myactivity_search_gin'
+
+
+def _gin_index():
+    from django.contrib.postgres.indexes import GinIndex
+    return GinIndex(search_vector(), name=GIN_INDEX_NAME)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        # Same expression search_activities() filters on, so the planner can use it
+        schema_editor.add_index(apps.get_model('api', 'MyActivity'), _gin_index())
+    elif vendor == 'sqlite':
+        install_sqlite_fts(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('api', 'MyActivity'), _gin_index())
+    elif vendor == 'sqlite':
+        drop_sqlite_fts(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_itinerary_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_myactivity_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='travelmethod',
+            options={'ordering': ['from_stop_id', 'order']},
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['trip', '-date'], name='expense_trip_date'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['trip', 'flight_date'], name='flight_trip_date'),
+        ),
+        migrations.AddIndex(
+            model_name='itinerary',
+            index=models.Index(fields=['trip', 'date', 'position', 'time'], name='itinerary_trip_date_position'),
+        ),
+        migrations.AddIndex(
+            model_name='myactivity',
+            index=models.Index(fields=['trip', '-created_at', '-id'], name='myactivity_trip_created'),
+        ),
+        migrations.AddIndex(
+            model_name='stop',
+            index=models.Index(fields=['trip', 'day', 'order'], name='stop_trip_day_order'),
+        ),
+        migrations.AddIndex(
+            model_name='travelmethod',
+            index=models.Index(fields=['from_stop', 'order', 'id'], name='travelmethod_stop_order'),
+        ),
+    ]
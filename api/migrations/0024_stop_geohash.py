@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:29
+
+import math
+
+from django.db import migrations, models
+
+AXIS_BITS = 26
+
+
+def encode_geohash(latitude, longitude):
+    # Frozen scalar copy of api.geo.encode_geohash: 26 bits per axis, longitude bit first
+    size = 1 << AXIS_BITS
+    lat = min(max(math.floor((latitude + 90) / 180 * size), 0), size - 1)
+    lon = min(max(math.floor((longitude + 180) / 360 * size), 0), size - 1)
+    code = 0
+    for bit in range(AXIS_BITS):
+        code |= ((lon >> bit) & 1) << (2 * bit + 1) | ((lat >> bit) & 1) << (2 * bit)
+    return code
+
+
+def fill_geohashes(apps, schema_editor):
+    Stop = apps.get_model('api', 'Stop')
+    batch = []
+    for stop in Stop.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        stop.geohash = encode_geohash(stop.latitude, stop.longitude)
+        batch.append(stop)
+        if len(batch) == 2000:
+            Stop.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    Stop.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_trip_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stop',
+            name='geohash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stop',
+            index=models.Index(fields=['geohash'], name='stop_geohash'),
+        ),
+    ]
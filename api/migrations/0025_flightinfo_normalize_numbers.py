@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def normalize_flight_number(flight_number):
+    # Frozen copy of api.flight_info.normalize_flight_number
+    return ''.join(flight_number.split()).upper()
+
+
+def rekey_flight_infos(apps, schema_editor):
+    """
+    0019 keyed backfilled rows on strip().upper(), so numbers such as "SQ 321"
+    kept their inner space and were never found at runtime. Move them to the
+    normalized key, merging into the row lookups have created since.
+    """
+    Flight = apps.get_model('api', 'Flight')
+    FlightInfo = apps.get_model('api', 'FlightInfo')
+    for info in FlightInfo.objects.filter(flight_number__regex=r'\s'):
+        number = normalize_flight_number(info.flight_number)
+        existing = FlightInfo.objects.filter(flight_number=number, flight_date=info.flight_date).first()
+        if existing is None:
+            info.flight_number = number
+            info.save(update_fields=['flight_number'])
+            continue
+        if info.fetched_at > existing.fetched_at:
+            existing.data, existing.fetched_at = info.data, info.fetched_at
+            existing.save(update_fields=['data', 'fetched_at'])
+        Flight.objects.filter(info=info).update(info=existing)
+        info.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_stop_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_flight_infos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:07
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_queued_at(apps, schema_editor):
+    GenerationJob = apps.get_model('api', 'GenerationJob')
+    GenerationJob.objects.update(queued_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_flightinfo_normalize_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='queued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_queued_at, migrations.RunPython.noop),
+    ]
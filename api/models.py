@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+
+from .geo import assign_geohashes, encode_geohash
 
 class Trip(models.Model):
     name = models.CharField(max_length=200)
@@ -6,17 +9,47 @@ class Trip(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     budget = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    currency = models.CharField(max_length=3, default='USD')  # Base currency for budget and expense totals
     # Storing travelers as a JSON list (e.g. ["Alice", "Bob"])
     travelers = models.JSONField(default=list) 
+    # Bumped on every change to the trip or its contents (api/versioning.py); drives ETags
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # version/updated_at only move through touch_trips' atomic UPDATE, so a
+        # full save from a stale instance must not write older values back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('version', 'updated_at')
+            ]
+        super().save(*args, **kwargs)
+
+class StopQuerySet(models.QuerySet):
+    """Keeps Stop.geohash in step with the coordinates on bulk writes too"""
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        assign_geohashes(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if {'latitude', 'longitude'} & set(fields):
+            assign_geohashes(objs)
+            fields = [*fields, 'geohash']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
 class Stop(models.Model):
     trip = models.ForeignKey(Trip, related_name='stops', on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Integer geohash of (latitude, longitude) for nearby lookups (api/geo.py); set on save
+    geohash = models.BigIntegerField(null=True, blank=True, editable=False)
     order = models.IntegerField(default=0) # For Drag & Drop sorting
 
     # --- Specific Details ---
@@ -39,8 +72,21 @@ class Stop(models.Model):
     # User remarks (up to 1000 chars)
     remarks = models.TextField(max_length=1000, blank=True, default="")
 
+    objects = StopQuerySet.as_manager()
+
     class Meta:
         ordering = ['day', 'order'] # Sort by Day first, then by Order
+        indexes = [
+            models.Index(fields=['trip', 'day', 'order'], name='stop_trip_day_order'),
+            models.Index(fields=['geohash'], name='stop_geohash'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
 
 class Itinerary(models.Model):
     trip = models.ForeignKey(Trip, related_name='itinerary', on_delete=models.CASCADE)
@@ -53,10 +99,16 @@ class Itinerary(models.Model):
     notes = models.TextField(blank=True, default='')
     photo_url = models.URLField(max_length=500, blank=True, default='', help_text='Photo URL for the location')
     links = models.JSONField(default=list, blank=True, help_text='List of booking/info links')
+    # Dense 0-based position within the day, set by drag & drop reordering
+    position = models.PositiveIntegerField(default=0)
 
     class Meta:
-        ordering = ['date', 'time']
+        ordering = ['date', 'position', 'time']
         verbose_name_plural = 'Itineraries'
+        indexes = [
+            # A trip's itinerary in display order; also serves single-day lookups
+            models.Index(fields=['trip', 'date', 'position', 'time'], name='itinerary_trip_date_position'),
+        ]
 
     def __str__(self):
         return f"{self.trip.name} - {self.date} - {self.location}"
@@ -83,29 +135,69 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['trip', '-date'], name='expense_trip_date'),
+        ]
 
     def __str__(self):
         return f"{self.trip.name} - {self.description} - {self.currency}{self.amount}"
 
+class ExchangeRate(models.Model):
+    """Daily FX rate: units of `currency` per one unit of the pivot currency (USD)"""
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        ordering = ['currency', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchangerate_currency_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} on {self.date}"
+
+class FlightInfo(models.Model):
+    """Shared AviationStack response for one flight on one day, reused by every trip"""
+    flight_number = models.CharField(max_length=20)
+    flight_date = models.DateField()
+    data = models.JSONField(default=dict, blank=True)  # Store API response data
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['flight_date', 'flight_number']
+        constraints = [
+            models.UniqueConstraint(fields=['flight_number', 'flight_date'], name='flightinfo_number_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.flight_number} on {self.flight_date}"
+
 class Flight(models.Model):
     trip = models.ForeignKey(Trip, related_name='flights', on_delete=models.CASCADE)
     flight_number = models.CharField(max_length=20)
     flight_date = models.DateField()
-    flight_data = models.JSONField(default=dict, blank=True)  # Store API response data
+    info = models.ForeignKey(FlightInfo, related_name='flights', null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['flight_date']
+        indexes = [
+            # Lookups by (flight_number, flight_date) go to FlightInfo's unique index
+            models.Index(fields=['trip', 'flight_date'], name='flight_trip_date'),
+        ]
     
     def __str__(self):
         return f"{self.trip.name} - {self.flight_number} on {self.flight_date}"
 
 class SuggestedEvent(models.Model):
     """Cache for AI-generated event suggestions by destination"""
-    destination = models.CharField(max_length=200, unique=True, db_index=True)
+    destination = models.CharField(max_length=200)  # Display name as first requested
+    destination_key = models.CharField(max_length=200, unique=True)  # normalize_destination(destination)
     events_data = models.JSONField()  # Store the full events array
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)  # For LRU eviction
     
     class Meta:
         ordering = ['-updated_at']
@@ -113,6 +205,43 @@ class SuggestedEvent(models.Model):
     def __str__(self):
         return f"Suggestions for {self.destination}"
 
+class GenerationJob(models.Model):
+    """Background LLM suggestion generation, polled by clients until it finishes"""
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_SUCCEEDED = 'SUCCEEDED'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    destination = models.CharField(max_length=200)
+    destination_key = models.CharField(max_length=200, default='')  # normalize_destination(destination)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    events_data = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    queued_at = models.DateTimeField(default=timezone.now)  # Reset when a stale job is requeued
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            # At most one in-flight job per destination; concurrent requests join it
+            models.UniqueConstraint(
+                fields=['destination_key'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']),
+                name='generationjob_one_active_per_destination',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Generate {self.destination} ({self.status})"
+
 class TravelMethod(models.Model):
     """Travel methods between consecutive stops in itinerary"""
     MODE_CHOICES = [
@@ -142,7 +271,15 @@ class TravelMethod(models.Model):
     order = models.IntegerField(default=0)
     
     class Meta:
-        ordering = ['from_stop', 'order']
+        # from_stop_id, not from_stop: ordering by the relation would join Itinerary
+        # and sort by its (date, position, time) ordering instead of using an index
+        ordering = ['from_stop_id', 'order']
+        indexes = [
+            # Serves the per-trip listing: WHERE trip_id = ? ORDER BY from_stop_id, order
+            models.Index(fields=['trip', 'from_stop', 'order'], name='travelmethod_trip_stop_order'),
+            # Connection lookups and the unfiltered cursor listing (from_stop, order, id)
+            models.Index(fields=['from_stop', 'order', 'id'], name='travelmethod_stop_order'),
+        ]
     
     def __str__(self):
         return f"{self.trip.name} - {self.mode} from {self.from_stop.location} to {self.to_stop.location}"
@@ -162,6 +299,10 @@ class MyActivity(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'My Activities'
+        indexes = [
+            # Trip listing, in MyActivityCursorPagination order
+            models.Index(fields=['trip', '-created_at', '-id'], name='myactivity_trip_created'),
+        ]
     
     def __str__(self):
         return f"{self.place} - {self.activity[:50]}"
@@ -0,0 +1,20 @@
+# api/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class TravelMethodCursorPagination(CursorPagination):
+    """Keyset pagination for travel methods, walking the (trip, from_stop, order) index"""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    # from_stop_id, not from_stop: the cursor stores str() of the first ordering
+    # field, which for the relation would be the Itinerary's text, not its id
+    ordering = ('from_stop_id', 'order', 'id')
+
+
+class MyActivityCursorPagination(CursorPagination):
+    """Newest saved activities first; stable under concurrent inserts"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
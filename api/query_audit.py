@@ -0,0 +1,119 @@
+# api/query_audit.py
+"""
+EXPLAIN audit for the hot per-trip queries behind the API.
+
+Each query is built the way the viewsets build it, run through EXPLAIN
+against a small seeded data set, and flagged if the plan reads a table
+sequentially or sorts rows outside an index:
+
+- SQLite:     `SCAN <table>` without an index, or `USE TEMP B-TREE`
+- PostgreSQL: `Seq Scan` or a `Sort` node. Sequential scans and sorts are
+  disabled for the audit transaction, so one only shows up when no index
+  can serve the query (tiny seeded tables would otherwise always scan).
+"""
+import re
+from datetime import date, timedelta
+
+from django.db import connection
+
+from .geo import geohash_filter
+from .models import Trip, Stop, Itinerary, Expense, Flight, TravelMethod, MyActivity
+
+SQLITE_PROBLEMS = [
+    (re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)(?!.*\bVIRTUAL TABLE\b)'), 'sequential scan'),
+    (re.compile(r'\bUSE TEMP B-TREE\b'), 'sort outside an index'),
+]
+POSTGRES_PROBLEMS = [
+    (re.compile(r'\bSeq Scan\b'), 'sequential scan'),
+    (re.compile(r'\bSort\b'), 'sort outside an index'),
+]
+PLAN_PROBLEMS = {'sqlite': SQLITE_PROBLEMS, 'postgresql': POSTGRES_PROBLEMS}
+
+
+def seed(trips=3, days=5, per_day=4):
+    """Create a few trips worth of rows; returns the first trip and two of its itinerary items"""
+    created = []
+    for t in range(trips):
+        start = date(2026, 5, 1)
+        trip = Trip.objects.create(
+            name=f'Audit trip {t}', destination='Paris',
+            start_date=start, end_date=start + timedelta(days=days - 1), travelers=['Alice', 'Bob'],
+        )
+        Stop.objects.bulk_create([
+            Stop(trip=trip, name=f'Stop {i}', latitude=48.85, longitude=2.35, day=i % days + 1, order=i)
+            for i in range(days * per_day)
+        ])
+        items = Itinerary.objects.bulk_create([
+            Itinerary(trip=trip, date=start + timedelta(days=i // per_day), position=i % per_day, location=f'Place {i}')
+            for i in range(days * per_day)
+        ])
+        TravelMethod.objects.bulk_create([
+            TravelMethod(trip=trip, from_stop=a, to_stop=b, mode='WALK', distance=1, duration=10)
+            for a, b in zip(items, items[1:])
+        ])
+        Expense.objects.bulk_create([
+            Expense(trip=trip, description=f'Expense {i}', amount=10, date=start + timedelta(days=i % days))
+            for i in range(days * per_day)
+        ])
+        Flight.objects.bulk_create([
+            Flight(trip=trip, flight_number=f'SQ{i}', flight_date=start + timedelta(days=i)) for i in range(2)
+        ])
+        MyActivity.objects.bulk_create([
+            MyActivity(trip=trip, place=f'Place {i}', activity='Visit', recommended_time=1) for i in range(per_day)
+        ])
+        created.append((trip, items))
+    trip, items = created[0]
+    return trip, items[0], items[1]
+
+
+def hot_queries(trip, from_stop, to_stop):
+    """(name, queryset) pairs mirroring the queries the viewsets run"""
+    return [
+        ('trip itinerary', Itinerary.objects.filter(trip=trip)),
+        ('itinerary day', Itinerary.objects.filter(trip=trip, date=from_stop.date)),
+        ('trip expenses', Expense.objects.filter(trip=trip)),
+        ('trip flights', Flight.objects.filter(trip=trip).select_related('info')),
+        ('trip stops', Stop.objects.filter(trip=trip)),
+        ('trip travel methods', TravelMethod.objects.filter(trip=trip).order_by('from_stop_id', 'order')),
+        ('connection legs', TravelMethod.objects.filter(
+            trip=trip, from_stop_id=from_stop.id, to_stop_id=to_stop.id
+        ).order_by('order')),
+        ('travel method listing', TravelMethod.objects.order_by('from_stop_id', 'order', 'id')[:100]),
+        ('trip my activities', MyActivity.objects.filter(trip=trip).order_by('-created_at', '-id')[:50]),
+        ('stops nearby', Stop.objects.filter(geohash_filter(48.85, 2.35, 2)).order_by().values_list(
+            'pk', 'latitude', 'longitude'
+        )),
+    ]
+
+
+def is_supported(vendor):
+    """Whether there are plan checks for this database backend"""
+    return vendor in PLAN_PROBLEMS
+
+
+def plan_problems(vendor, plan):
+    patterns = PLAN_PROBLEMS[vendor]
+    problems = []
+    for line in plan.splitlines():
+        for pattern, label in patterns:
+            if pattern.search(line):
+                problems.append(f"{label}: {line.strip()}")
+    return problems
+
+
+def audit_hot_queries():
+    """
+    Seed data and EXPLAIN every hot query. Must run inside a transaction the
+    caller rolls back, on a backend `is_supported` accepts. Returns
+    (name, plan, problems) tuples.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+
+    results = []
+    for name, queryset in hot_queries(*seed()):
+        plan = queryset.explain()
+        results.append((name, plan, plan_problems(connection.vendor, plan)))
+    return results
@@ -0,0 +1,158 @@
+# api/reorder.py
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Max, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Itinerary
+from .versioning import touch_trips
+
+
+def next_position(trip, day):
+    """Position that appends an item to the end of a day"""
+    last = Itinerary.objects.filter(trip=trip, date=day).aggregate(last=Max('position'))['last']
+    return 0 if last is None else last + 1
+
+
+def assign_positions(items):
+    """Give unsaved items consecutive positions at the end of their days, with one query for all days"""
+    trip_ids = {item.trip_id for item in items}
+    days = {item.date for item in items}
+    rows = (
+        Itinerary.objects.filter(trip_id__in=trip_ids, date__in=days)
+        .values('trip_id', 'date')
+        .annotate(last=Max('position'))
+        .order_by()
+    )
+    next_free = {(row['trip_id'], row['date']): row['last'] + 1 for row in rows}
+    for item in items:
+        key = (item.trip_id, item.date)
+        item.position = next_free.get(key, 0)
+        next_free[key] = item.position + 1
+
+
+def relocate_items(moves):
+    """
+    Move items to other days: `moves` is a list of (item, trip_id, date), with
+    each item still holding the day it leaves. Closes the gaps left on the old
+    days and returns {pk: new position} for every item whose position changed:
+    the moved ones go to the end of their new days. The caller saves the moved
+    items. Call inside a transaction.
+    """
+    moving = {item.pk for item, _, _ in moves}
+    old_days = {(item.trip_id, item.date) for item, _, _ in moves}
+    new_days = {(trip_id, day) for _, trip_id, day in moves}
+
+    compacted = []
+    remaining = Itinerary.objects.select_for_update().filter(
+        trip_id__in={trip_id for trip_id, _ in old_days}, date__in={day for _, day in old_days}
+    ).exclude(pk__in=moving).order_by('trip_id', 'date', 'position', 'time', 'pk')
+    key, position = None, 0
+    for item in remaining:
+        if (item.trip_id, item.date) not in old_days:
+            continue
+        if (item.trip_id, item.date) != key:
+            key, position = (item.trip_id, item.date), 0
+        if item.position != position:
+            item.position = position
+            compacted.append(item)
+        position += 1
+    if compacted:
+        Itinerary.objects.bulk_update(compacted, ['position'])
+        touch_trips(item.trip_id for item in compacted)
+
+    rows = (
+        Itinerary.objects.filter(
+            trip_id__in={trip_id for trip_id, _ in new_days}, date__in={day for _, day in new_days}
+        )
+        .exclude(pk__in=moving)
+        .values('trip_id', 'date')
+        .annotate(last=Max('position'))
+        .order_by()
+    )
+    next_free = {(row['trip_id'], row['date']): row['last'] + 1 for row in rows}
+    positions = {item.pk: item.position for item in compacted}
+    for item, trip_id, day in moves:
+        positions[item.pk] = next_free.get((trip_id, day), 0)
+        next_free[trip_id, day] = positions[item.pk] + 1
+    return positions
+
+
+def _parse_days(days):
+    if not isinstance(days, dict) or not days:
+        raise ValidationError({'days': 'Expected an object mapping YYYY-MM-DD dates to lists of itinerary ids'})
+    parsed = {}
+    seen = set()
+    for day, ids in days.items():
+        try:
+            day = date.fromisoformat(day)
+        except (TypeError, ValueError):
+            raise ValidationError({'days': f"Invalid date {day!r}"})
+        if not isinstance(ids, list) or not all(isinstance(item_id, int) for item_id in ids):
+            raise ValidationError({'days': f"Ordering for {day} must be a list of itinerary ids"})
+        duplicates = seen.intersection(ids) | {item_id for item_id in ids if ids.count(item_id) > 1}
+        if duplicates:
+            raise ValidationError({'days': f"Itinerary ids listed more than once: {sorted(duplicates)}"})
+        seen.update(ids)
+        parsed[day] = ids
+    return parsed
+
+
+def apply_itinerary_order(trip, days):
+    """
+    Apply a new ordering for one or more days of a trip's itinerary.
+
+    `days` maps each date to the complete ordered list of item ids that should
+    sit on it; items may move between days. Days that lose an item without
+    being listed are compacted so positions stay dense. Everything is written
+    with one bulk_update in a single transaction. Returns the changed items.
+    """
+    days = _parse_days(days)
+    listed_ids = {item_id for ids in days.values() for item_id in ids}
+
+    with transaction.atomic():
+        items = {
+            item.pk: item
+            for item in Itinerary.objects.select_for_update().filter(
+                Q(date__in=list(days)) | Q(pk__in=listed_ids), trip=trip
+            )
+        }
+        unknown = listed_ids - set(items)
+        if unknown:
+            raise ValidationError({'days': f"Itinerary ids not in this trip: {sorted(unknown)}"})
+        missing = [item.pk for item in items.values() if item.date in days and item.pk not in listed_ids]
+        if missing:
+            raise ValidationError({'days': f"Ordering must list every item on the day; missing ids: {sorted(missing)}"})
+
+        changed = {}
+        source_days = set()
+        for day, ids in days.items():
+            for position, item_id in enumerate(ids):
+                item = items[item_id]
+                if item.date != day:
+                    source_days.add(item.date)
+                if item.date != day or item.position != position:
+                    item.date, item.position = day, position
+                    changed[item.pk] = item
+
+        # Close the gaps left on days that items were moved out of
+        source_days -= set(days)
+        if source_days:
+            remaining = Itinerary.objects.select_for_update().filter(
+                trip=trip, date__in=source_days
+            ).exclude(pk__in=listed_ids).order_by('date', 'position', 'time', 'pk')
+            day, position = None, 0
+            for item in remaining:
+                if item.date != day:
+                    day, position = item.date, 0
+                if item.position != position:
+                    item.position = position
+                    changed[item.pk] = item
+                position += 1
+
+        if changed:
+            Itinerary.objects.bulk_update(list(changed.values()), ['date', 'position'])
+            touch_trips([trip.pk])
+
+    return sorted(changed.values(), key=lambda item: (item.date, item.position))
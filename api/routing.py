@@ -0,0 +1,268 @@
+# api/routing.py
+"""
+Day-route optimisation for a trip's Stops.
+
+Each day is solved on its own as a shortest-path problem over a haversine
+distance matrix:
+
+- ACCOMMODATION stops are pinned: with one, the day is a loop that starts and
+  ends there; with two or more, the first (in the current order) starts the
+  day and the last ends it.
+- Stops with a `visit_time` are anchors: they keep their chronological order,
+  and the other stops are fitted around them.
+- Days with at most ROUTE_EXACT_MAX_STOPS movable stops are solved exactly by
+  enumerating every order. Larger days start from a nearest-neighbour tour
+  (and from the current order when it is already valid), then improve it with
+  2-opt and Or-opt moves until no move helps.
+"""
+from itertools import permutations
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .distance_matrix import get_trip_matrix
+from .geo import haversine_matrix
+from .models import Stop
+from .versioning import touch_trips
+
+_EPS = 1e-9
+
+
+def route_length(dist, route):
+    route = np.asarray(route)
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+class DayRoute:
+    """
+    One day's routing problem. Nodes are indexes into `dist`; a route is the
+    full node sequence including the two fixed ends. When the day has no
+    accommodation the ends are a dummy node at distance 0 from everything.
+    """
+    def __init__(self, dist, start=None, end=None, anchors=()):
+        n = len(dist)
+        self.dist = np.zeros((n + 1, n + 1))
+        self.dist[:n, :n] = dist
+        dummy = n
+        self.start = dummy if start is None else start
+        self.end = dummy if end is None else end
+        self.anchors = list(anchors)   # node ids in required order
+        fixed = {self.start, self.end}
+        self.movable = [node for node in range(n) if node not in fixed]
+
+    # --- helpers ---
+
+    def _anchor_flags(self, route):
+        flags = np.zeros(len(route), dtype=int)
+        anchor_set = set(self.anchors)
+        for position, node in enumerate(route):
+            if node in anchor_set:
+                flags[position] = 1
+        return flags
+
+    def is_valid(self, route):
+        if route[0] != self.start or route[-1] != self.end:
+            return False
+        if sorted(route[1:-1]) != sorted(self.movable):
+            return False
+        anchor_set = set(self.anchors)
+        return [node for node in route if node in anchor_set] == self.anchors
+
+    def length(self, route):
+        return route_length(self.dist, route)
+
+    # --- construction ---
+
+    def exact(self):
+        """Best order by enumeration; only sensible for a handful of stops"""
+        if not self.movable:
+            return [self.start, self.end]
+        local = np.array(list(permutations(range(len(self.movable)))), dtype=int)
+        if len(self.anchors) > 1:
+            # argsort of a permutation is its inverse: the position of each stop
+            positions = np.argsort(local, axis=1)[:, [self.movable.index(node) for node in self.anchors]]
+            local = local[np.all(np.diff(positions, axis=1) > 0, axis=1)]
+        perms = np.array(self.movable)[local]
+        full = np.hstack([
+            np.full((len(perms), 1), self.start), perms, np.full((len(perms), 1), self.end),
+        ])
+        costs = self.dist[full[:, :-1], full[:, 1:]].sum(axis=1)
+        return full[int(np.argmin(costs))].tolist()
+
+    def nearest_neighbour(self):
+        """Greedy tour that always visits the next anchor before any later one"""
+        free = [node for node in self.movable if node not in set(self.anchors)]
+        remaining = set(free)
+        pending = list(self.anchors)
+        route = [self.start]
+        while remaining or pending:
+            candidates = list(remaining) + pending[:1]
+            distances = self.dist[route[-1], candidates]
+            choice = candidates[int(np.argmin(distances))]
+            if pending and choice == pending[0]:
+                pending.pop(0)
+            else:
+                remaining.discard(choice)
+            route.append(choice)
+        route.append(self.end)
+        return route
+
+    # --- improvement ---
+
+    def two_opt(self, route):
+        """Reverse segments while it shortens the route; a segment may hold at most one anchor"""
+        route = np.array(route)
+        dist = self.dist
+        improved = True
+        while improved:
+            improved = False
+            anchors_before = np.concatenate([[0], np.cumsum(self._anchor_flags(route))])
+            for i in range(1, len(route) - 2):
+                j = np.arange(i + 1, len(route) - 1)
+                delta = (
+                    dist[route[i - 1], route[j]] + dist[route[i], route[j + 1]]
+                    - dist[route[i - 1], route[i]] - dist[route[j], route[j + 1]]
+                )
+                delta[anchors_before[j + 1] - anchors_before[i] > 1] = 0
+                best = int(np.argmin(delta))
+                if delta[best] < -_EPS:
+                    route[i:j[best] + 1] = route[i:j[best] + 1][::-1]
+                    improved = True
+                    break
+        return route.tolist()
+
+    def or_opt(self, route):
+        """Move chains of 1-3 anchor-free stops (either way round) to their best position"""
+        route = list(route)
+        dist = self.dist
+        anchor_set = set(self.anchors)
+        improved = True
+        while improved:
+            improved = False
+            for length in (1, 2, 3):
+                for i in range(1, len(route) - length):
+                    chain = route[i:i + length]
+                    if any(node in anchor_set for node in chain):
+                        continue
+                    prev, nxt = route[i - 1], route[i + length]
+                    gain = dist[prev, chain[0]] + dist[chain[-1], nxt] - dist[prev, nxt]
+                    rest = np.array(route[:i] + route[i + length:])
+                    a, b = rest[:-1], rest[1:]
+                    forward = dist[a, chain[0]] + dist[chain[-1], b] - dist[a, b]
+                    backward = dist[a, chain[-1]] + dist[chain[0], b] - dist[a, b]
+                    forward[i - 1] = backward[i - 1] = np.inf   # its current slot
+                    k_forward, k_backward = int(np.argmin(forward)), int(np.argmin(backward))
+                    if forward[k_forward] <= backward[k_backward]:
+                        k, cost, moved = k_forward, forward[k_forward], chain
+                    else:
+                        k, cost, moved = k_backward, backward[k_backward], chain[::-1]
+                    if cost - gain < -_EPS:
+                        rest = rest.tolist()
+                        route = rest[:k + 1] + moved + rest[k + 1:]
+                        improved = True
+                        break
+                if improved:
+                    break
+        return route
+
+    def solve(self, current=None):
+        if len(self.movable) <= settings.ROUTE_EXACT_MAX_STOPS:
+            return self.exact(), 'exact'
+        seeds = [self.nearest_neighbour()]
+        if current is not None and self.is_valid(current):
+            seeds.append(current)
+        best = None
+        for route in seeds:
+            # alternate until neither move finds an improvement
+            while True:
+                before = self.length(route)
+                route = self.or_opt(self.two_opt(route))
+                if self.length(route) >= before - _EPS:
+                    break
+            if best is None or self.length(route) < self.length(best):
+                best = route
+        return best, 'heuristic'
+
+
+def optimize_day(stops, dist=None):
+    """
+    Order one day's stops (already in their current order) for the shortest
+    route. Returns (ordered stops, distance before, distance after, method);
+    distances are in km. `dist` is the stops' distance matrix, if known.
+    """
+    if len(stops) < 2:
+        return list(stops), 0.0, 0.0, 'exact'
+    if dist is None:
+        dist = haversine_matrix([stop.latitude for stop in stops], [stop.longitude for stop in stops])
+
+    lodging = [i for i, stop in enumerate(stops) if stop.category == 'ACCOMMODATION']
+    start = lodging[0] if lodging else None
+    end = lodging[-1] if lodging else None
+    timed = [i for i, stop in enumerate(stops) if stop.visit_time is not None and i not in (start, end)]
+    anchors = sorted(timed, key=lambda i: (stops[i].visit_time, i))
+    problem = DayRoute(dist, start, end, anchors)
+
+    dummy = len(stops)
+    current = list(range(len(stops)))
+    if start is not None:
+        # rotate a single-lodging loop so it starts at the lodging; otherwise pin both ends
+        current = [start] + [i for i in current if i not in (start, end)] + [end]
+    else:
+        current = [dummy] + current + [dummy]
+
+    route, method = problem.solve(current)
+    if start is None:
+        nodes = route[1:-1]    # drop the dummy ends
+    elif start == end:
+        nodes = route[:-1]     # the loop returns to the lodging
+    else:
+        nodes = route
+    return [stops[i] for i in nodes], problem.length(current), problem.length(route), method
+
+
+def _parse_days(days):
+    if days is None:
+        return None
+    if not isinstance(days, list) or not all(isinstance(day, int) for day in days):
+        raise ValidationError({'days': 'Expected a list of day numbers'})
+    return set(days)
+
+
+def optimize_trip_route(trip, days=None):
+    """
+    Reorder the stops of every day (or only `days`) of a trip for the shortest
+    route and save the new orders with one bulk_update. Returns a per-day
+    summary and the stops whose order changed.
+    """
+    days = _parse_days(days)
+    queryset = Stop.objects.filter(trip=trip)
+    if days is not None:
+        queryset = queryset.filter(day__in=days)
+
+    with transaction.atomic():
+        by_day = {}
+        for stop in queryset.select_for_update().order_by('day', 'order', 'id'):
+            by_day.setdefault(stop.day, []).append(stop)
+
+        matrix = get_trip_matrix(trip)
+        summary, changed = [], []
+        for day, stops in sorted(by_day.items()):
+            ordered, before, after, method = optimize_day(stops, matrix.submatrix(stops))
+            for position, stop in enumerate(ordered):
+                if stop.order != position:
+                    stop.order = position
+                    changed.append(stop)
+            summary.append({
+                'day': day,
+                'stops': [stop.pk for stop in ordered],
+                'distance_km_before': round(before, 3),
+                'distance_km': round(after, 3),
+                'method': method,
+            })
+
+        if changed:
+            Stop.objects.bulk_update(changed, ['order'])
+            touch_trips([trip.pk])
+    return summary, changed
@@ -0,0 +1,126 @@
+# api/search.py
+"""
+Full-text search over saved activities (MyActivity.place and .activity).
+
+- PostgreSQL: to_tsvector/websearch_to_tsquery, served by the GIN expression
+  index `myactivity_search_gin` (created in migration 0021)
+- SQLite: an external-content FTS5 table kept in sync by triggers
+- anything else, or SQLite built without FTS5: case-insensitive substring match
+"""
+import re
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+from .models import MyActivity
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'api_myactivity_fts'
+
+_SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        place, activity, content='api_myactivity', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_myactivity BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, place, activity) VALUES (new.id, new.place, new.activity);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_myactivity BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, place, activity) VALUES ('delete', old.id, old.place, old.activity);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON api_myactivity BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, place, activity) VALUES ('delete', old.id, old.place, old.activity);
+        INSERT INTO {FTS_TABLE}(rowid, place, activity) VALUES (new.id, new.place, new.activity);
+    END""",
+    # Re-index whatever is in the table now (no-op cost on an empty table)
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def search_vector():
+    """Weighted document; matches on the place name rank above matches in the description"""
+    from django.contrib.postgres.search import SearchVector
+    return (
+        SearchVector('place', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('activity', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def install_sqlite_fts(connection):
+    """
+    Create the FTS5 table and its triggers if missing. Idempotent; run after
+    every migrate because SQLite table rebuilds drop triggers. Returns False
+    when this SQLite build has no FTS5.
+    """
+    try:
+        with connection.cursor() as cursor:
+            for statement in _SQLITE_FTS_SQL:
+                cursor.execute(statement)
+    except DatabaseError as e:
+        print(f"⚠️ SQLite FTS5 unavailable, activity search will use substring matching: {e}")
+        return False
+    return True
+
+
+def drop_sqlite_fts(connection):
+    with connection.cursor() as cursor:
+        for suffix in ('_ai', '_ad', '_au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def _tokens(text):
+    return re.findall(r'\w+', text)
+
+
+def _fts5_query(text):
+    """Quote every word so user input can't use FTS5 syntax; the last word matches as a prefix"""
+    tokens = _tokens(text)
+    quoted = ['"{}"'.format(token.replace('"', '""')) for token in tokens]
+    if quoted:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _substring_search(queryset, text):
+    for token in _tokens(text):
+        queryset = queryset.filter(Q(place__icontains=token) | Q(activity__icontains=token))
+    return queryset.order_by('-created_at', '-id')
+
+
+def search_activities(text, queryset=None, limit=20):
+    """Return up to `limit` activities matching `text`, best matches first"""
+    if queryset is None:
+        queryset = MyActivity.objects.all()
+    if not _tokens(text):
+        return []
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        results = (
+            queryset.annotate(document=search_vector())
+            .filter(document=query)
+            .annotate(rank=SearchRank(search_vector(), query))
+            .order_by('-rank', '-created_at')
+        )
+        return list(results[:limit])
+
+    if vendor == 'sqlite':
+        results = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = api_myactivity.id', f'{FTS_TABLE} MATCH %s'],
+            params=[_fts5_query(text)],
+            # bm25 with place weighted over activity, like the Postgres A/B weights
+            select={'rank': f'bm25({FTS_TABLE}, 10.0, 1.0)'},
+            order_by=['rank'],
+        )
+        try:
+            return list(results[:limit])
+        except DatabaseError:
+            # FTS5 missing from this SQLite build
+            pass
+
+    return list(_substring_search(queryset, text)[:limit])
@@ -1,41 +1,112 @@
 # api/serializers.py
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Trip, Stop, Itinerary, Expense, Flight, TravelMethod, MyActivity
+from .instrumentation import TimedSerializerMixin
+from .reorder import next_position, relocate_items
 
-class StopSerializer(serializers.ModelSerializer):
+def get_requested_fields(request):
+    """
+    Return the set of field names in ?fields=, or None when every field is wanted.
+    Only reads honour it: a write must validate every field, not just the listed ones.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+class SparseFieldsMixin:
+    """Drop any field not listed in the request's ?fields= parameter"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = get_requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+class BatchRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field that resolves ids from a batch lookup in context['related_objects'] when present"""
+    def to_internal_value(self, data):
+        objects = self.context.get('related_objects', {}).get(self.field_name)
+        if objects is not None and isinstance(data, (int, str)) and str(data) in objects:
+            return objects[str(data)]
+        return super().to_internal_value(data)
+
+class BulkSerializerMixin:
+    """Resolve foreign keys through BatchRelatedField so bulk requests look them up once per batch"""
+    serializer_related_field = BatchRelatedField
+
+class StopSerializer(BulkSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Stop
         fields = '__all__'
 
-class ItinerarySerializer(serializers.ModelSerializer):
+class ItinerarySerializer(BulkSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Itinerary
         fields = '__all__'
+        # Managed by the reorder endpoint; new items are appended to their day
+        read_only_fields = ['position']
 
-class ExpenseSerializer(serializers.ModelSerializer):
+    def create(self, validated_data):
+        validated_data['position'] = next_position(validated_data['trip'], validated_data['date'])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        # An item moved to another day goes to the end of it, and its old day closes up
+        trip = validated_data.get('trip', instance.trip)
+        day = validated_data.get('date', instance.date)
+        if (trip.pk, day) == (instance.trip_id, instance.date):
+            return super().update(instance, validated_data)
+        with transaction.atomic():
+            validated_data['position'] = relocate_items([(instance, trip.pk, day)])[instance.pk]
+            return super().update(instance, validated_data)
+
+class ExpenseSerializer(BulkSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = '__all__'
 
-class FlightSerializer(serializers.ModelSerializer):
+class FlightSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Payload lives on the shared FlightInfo row; exposed here as before
+    flight_data = serializers.SerializerMethodField()
+
     class Meta:
         model = Flight
-        fields = '__all__'
+        exclude = ['info']
+
+    def get_flight_data(self, obj):
+        return obj.info.data if obj.info_id else {}
 
-class TravelMethodSerializer(serializers.ModelSerializer):
+class TravelMethodSerializer(BulkSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = TravelMethod
         fields = '__all__'
 
-class MyActivitySerializer(serializers.ModelSerializer):
+class ConnectionLegSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """One leg of a connection; trip, stops and order come from the URL and list position"""
+    class Meta:
+        model = TravelMethod
+        exclude = ['trip', 'from_stop', 'to_stop', 'order']
+
+class MyActivitySerializer(SparseFieldsMixin, BulkSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = MyActivity
         fields = '__all__'
 
-class TripSerializer(serializers.ModelSerializer):
+class TripSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     # This ensures that when you get a Trip, you also get its Stops inside it
     stops = StopSerializer(many=True, read_only=True)
     
     class Meta:
         model = Trip
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class TripCloneSerializer(serializers.Serializer):
+    """Options for POST /api/trips/{id}/clone/"""
+    name = serializers.CharField(max_length=200, required=False)
+    start_date = serializers.DateField(required=False)
+    include_expenses = serializers.BooleanField(default=False)
@@ -0,0 +1,110 @@
+# api/suggestion_cache.py
+"""
+SuggestedEvent cache: lookups by normalized destination_key with a TTL on
+updated_at, least-recently-used tracking and hit/miss counters.
+"""
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .destinations import normalize_destination
+from .metrics import SUGGESTION_CACHE_LOOKUPS
+from .models import SuggestedEvent
+
+# Per-process hit/miss counters
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats.get('hits', 0) + stats.get('misses', 0)
+    stats.setdefault('hits', 0)
+    stats.setdefault('misses', 0)
+    stats.setdefault('expired', 0)
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _ttl():
+    return timedelta(seconds=settings.SUGGESTED_EVENTS_TTL)
+
+
+def get_cached_suggestions(destination):
+    """Return a fresh SuggestedEvent for the destination, or None on a miss"""
+    entry = SuggestedEvent.objects.filter(destination_key=normalize_destination(destination)).first()
+    if entry is None:
+        _count('misses')
+        SUGGESTION_CACHE_LOOKUPS.inc(result='miss')
+        return None
+
+    now = timezone.now()
+    if entry.updated_at < now - _ttl():
+        _count('misses')
+        _count('expired')
+        SUGGESTION_CACHE_LOOKUPS.inc(result='expired')
+        return None
+
+    _count('hits')
+    SUGGESTION_CACHE_LOOKUPS.inc(result='hit')
+    # Track recency for LRU eviction, but don't write on every single hit
+    touch_interval = timedelta(seconds=settings.SUGGESTED_EVENTS_TOUCH_INTERVAL)
+    if entry.last_used_at is None or entry.last_used_at < now - touch_interval:
+        SuggestedEvent.objects.filter(pk=entry.pk).update(last_used_at=now)
+    return entry
+
+
+def cache_suggestions(destination, events):
+    """Store generated events in the SuggestedEvent cache"""
+    try:
+        SuggestedEvent.objects.update_or_create(
+            destination_key=normalize_destination(destination),
+            defaults={
+                'destination': destination,
+                'events_data': events,
+                'last_used_at': timezone.now(),
+            }
+        )
+        print(f"💾 Cached events for {destination}")
+    except Exception as e:
+        print(f"Warning: Failed to cache events: {e}")
+
+
+def evict_suggestions(max_entries=None, dry_run=False):
+    """
+    Delete entries older than the TTL, then the least recently used ones until
+    at most `max_entries` remain. Returns (expired, evicted) counts.
+    """
+    cutoff = timezone.now() - _ttl()
+    stale = SuggestedEvent.objects.filter(updated_at__lt=cutoff)
+    fresh = SuggestedEvent.objects.filter(updated_at__gte=cutoff)
+
+    lru_ids = []
+    if max_entries is not None:
+        overflow = fresh.count() - max_entries
+        if overflow > 0:
+            lru_ids = list(
+                fresh.order_by(Coalesce('last_used_at', 'updated_at').asc(), 'pk')
+                .values_list('pk', flat=True)[:overflow]
+            )
+
+    expired = stale.count()
+    if not dry_run:
+        stale.delete()
+        SuggestedEvent.objects.filter(pk__in=lru_ids).delete()
+    return expired, len(lru_ids)
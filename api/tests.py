@@ -1,3 +1,1480 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .benchmark import SCENARIOS, compare_results, generate_dataset, run_scenarios
+from .destinations import normalize_destination
+from .fx import clear_rate_cache
+from .http_client import ProviderUnavailable, get_client, reset_clients
+from .instrumentation import end_request, span, start_request
+from .jobs import generate_suggestions, requeue_stale_jobs, run_job
+from .metrics import REGISTRY, Registry, render_prometheus
+from .models import Trip, Stop, Itinerary, Expense, Flight, FlightInfo, TravelMethod, MyActivity, ExchangeRate, GenerationJob, SuggestedEvent
+from .query_audit import plan_problems
+from .distance_matrix import clear_matrix_cache, get_trip_matrix
+from .geo import encode_geohash, geohash_ranges, haversine_matrix
+from .importer import import_csv, insert_rows
+from .routing import DayRoute
+from .versioning import touch_trips
+from .suggestion_cache import cache_stats, evict_suggestions, get_cached_suggestions, reset_cache_stats
+
+
+def make_trip(**kwargs):
+    defaults = {
+        'name': 'Paris Getaway',
+        'destination': 'Paris',
+        'start_date': '2026-05-01',
+        'end_date': '2026-05-05',
+        'travelers': ['Alice', 'Bob'],
+    }
+    defaults.update(kwargs)
+    return Trip.objects.create(**defaults)
+
+
+class TripBundleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+
+    def populate(self, count):
+        for i in range(count):
+            Stop.objects.create(trip=self.trip, name=f'Stop {i}', latitude=48.85, longitude=2.35, order=i)
+            first = Itinerary.objects.create(trip=self.trip, date='2026-05-01', location=f'Place {i}')
+            second = Itinerary.objects.create(trip=self.trip, date='2026-05-02', location=f'Other {i}')
+            TravelMethod.objects.create(
+                trip=self.trip, from_stop=first, to_stop=second, mode='WALK', distance=1, duration=15
+            )
+            Expense.objects.create(trip=self.trip, description=f'Lunch {i}', amount=20, date='2026-05-01')
+            Flight.objects.create(trip=self.trip, flight_number=f'AF{i}', flight_date='2026-05-01')
+            MyActivity.objects.create(trip=self.trip, place=f'Museum {i}', activity='Visit', recommended_time=2)
+
+    def test_bundle_returns_all_collections(self):
+        self.populate(2)
+        response = self.client.get(f'/api/trips/{self.trip.id}/bundle/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['trip']['id'], self.trip.id)
+        self.assertEqual(len(response.data['trip']['stops']), 2)
+        self.assertEqual(len(response.data['itinerary']), 4)
+        for name in ['flights', 'travel_methods', 'expenses', 'my_activities']:
+            self.assertEqual(len(response.data[name]), 2)
+
+    def test_bundle_query_count_is_independent_of_trip_size(self):
+        self.populate(1)
+        # trip + stops + five collections
+        with self.assertNumQueries(7):
+            self.client.get(f'/api/trips/{self.trip.id}/bundle/')
+        self.populate(10)
+        with self.assertNumQueries(7):
+            self.client.get(f'/api/trips/{self.trip.id}/bundle/')
+
+    def test_bundle_include_filters_collections(self):
+        self.populate(1)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/trips/{self.trip.id}/bundle/?include=expenses')
+        self.assertEqual(set(response.data), {'trip', 'expenses'})
+
+    def test_bundle_rejects_unknown_collections(self):
+        response = self.client.get(f'/api/trips/{self.trip.id}/bundle/?include=expenses,photos')
+        self.assertEqual(response.status_code, 400)
+
+
+class TripListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_trips(self, count, stops_per_trip=3):
+        for i in range(count):
+            trip = make_trip(name=f'Trip {i}')
+            for j in range(stops_per_trip):
+                Stop.objects.create(trip=trip, name=f'Stop {j}', latitude=1.3, longitude=103.8, order=j)
+
+    def test_list_query_count_does_not_grow_with_trips(self):
+        self.create_trips(2)
+        # trips + prefetched stops
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/trips/')
+        self.assertEqual(len(response.data), 2)
+        self.create_trips(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/trips/')
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(len(response.data[0]['stops']), 3)
+
+    def test_sparse_fields_skip_stops(self):
+        self.create_trips(5)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/trips/?fields=id,name,start_date')
+        self.assertEqual(set(response.data[0]), {'id', 'name', 'start_date'})
+
+    def test_sparse_fields_do_not_skip_validation_on_writes(self):
+        response = self.client.post('/api/trips/?fields=id', {'name': 'No dates'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_date', response.data)
+
+
+class TravelMethodPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.legs = self.add_legs(self.trip)
+        # Another trip's legs interleave by id and must never show up
+        self.other_legs = self.add_legs(make_trip(name='Other'))
+        self.trip_url = f'/api/trips/{self.trip.id}/travel-methods/'
+
+    def add_legs(self, trip):
+        days = ['2026-05-01', '2026-05-02']
+        stops = [Itinerary.objects.create(trip=trip, date=days[n // 3], location=f'Stop {n}') for n in range(6)]
+        return [
+            TravelMethod.objects.create(trip=trip, from_stop=stops[n], to_stop=stops[n + 1], mode=mode,
+                                        distance=1, duration=10, order=order)
+            for n in range(5) for order, mode in enumerate(['WALK', 'BUS'])
+        ]
+
+    def walk(self, params, url='/api/travel-methods/'):
+        ids, pages = [], 0
+        response = self.client.get(url, {'page_size': 3, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [leg['id'] for leg in response.data['results']]
+            pages += 1
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def on_day(self, legs, day):
+        return [leg.id for leg in legs if str(leg.from_stop.date) == day]
+
+    def test_pages_cover_every_leg_once(self):
+        ids, pages = self.walk({'trip': self.trip.id})
+        self.assertEqual(ids, [leg.id for leg in self.legs])
+        self.assertEqual(pages, 4)
+
+    def test_from_stop_date_filter_follows_the_cursor(self):
+        ids, pages = self.walk({'from_stop__date': '2026-05-02'})
+        self.assertEqual(ids, self.on_day(self.legs, '2026-05-02') + self.on_day(self.other_legs, '2026-05-02'))
+        self.assertEqual(pages, 3)
+
+    def test_trip_listing_is_paginated_and_scoped(self):
+        response = self.client.get(self.trip_url, {'page_size': 3})
+        self.assertEqual([leg['id'] for leg in response.data['results']], [leg.id for leg in self.legs[:3]])
+        self.assertIsNotNone(response.data['next'])
+        ids, pages = self.walk({}, self.trip_url)
+        self.assertEqual(ids, [leg.id for leg in self.legs])
+        self.assertEqual(pages, 4)
+
+    def test_trip_listing_filters_by_from_stop_date(self):
+        ids, pages = self.walk({'from_stop__date': '2026-05-02'}, self.trip_url)
+        self.assertEqual(ids, self.on_day(self.legs, '2026-05-02'))
+        self.assertEqual(pages, 2)
+        response = self.client.get(self.trip_url, {'from_stop__date': 'May 2'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExpenseSummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip(travelers=['Alice', 'Bob', 'Cara'])
+
+    def add_expense(self, amount, paid_by, split_between, **kwargs):
+        return Expense.objects.create(
+            trip=self.trip, description='Expense', amount=amount, date='2026-05-01',
+            paid_by=paid_by, split_between=split_between, **kwargs
+        )
+
+    def test_balances_honor_split_types(self):
+        self.add_expense(90, 'Alice', ['Alice', 'Bob', 'Cara'])
+        self.add_expense(90, 'Alice', ['Alice', 'Bob', 'Cara'])
+        self.add_expense(100, 'Bob', ['Alice', 'Bob'], split_type='percentage',
+                         split_details={'Alice': 70, 'Bob': 30})
+        self.add_expense(50, 'Cara', ['Alice', 'Cara'], split_type='fixed',
+                         split_details={'Alice': 20, 'Cara': 30})
+
+        response = self.client.get(f'/api/trips/{self.trip.id}/expenses/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balances']['USD'], {'Alice': '30.00', 'Bob': '10.00', 'Cara': '-40.00'})
+        self.assertEqual(response.data['settlements']['USD'], [
+            {'from': 'Cara', 'to': 'Alice', 'amount': '30.00'},
+            {'from': 'Cara', 'to': 'Bob', 'amount': '10.00'},
+        ])
+
+    def test_totals_are_kept_apart_per_currency(self):
+        self.add_expense(40, 'Alice', ['Alice', 'Bob'], category='Food')
+        self.add_expense(25, 'Bob', ['Alice', 'Bob'], category='Food', currency='EUR')
+
+        response = self.client.get(f'/api/trips/{self.trip.id}/expenses/summary/')
+        self.assertEqual(response.data['by_category'], [
+            {'category': 'Food', 'currency': 'EUR', 'total': '25.00', 'count': 1},
+            {'category': 'Food', 'currency': 'USD', 'total': '40.00', 'count': 1},
+        ])
+
+    def test_converted_totals_use_trip_base_currency(self):
+        clear_rate_cache()
+        ExchangeRate.objects.create(currency='EUR', date='2026-04-30', rate='0.5')
+        ExchangeRate.objects.create(currency='SGD', date='2026-04-30', rate='2')
+        self.trip.currency = 'SGD'
+        self.trip.budget = 500
+        self.trip.save()
+        self.add_expense(100, 'Alice', ['Alice', 'Bob'])
+        self.add_expense(10, 'Bob', ['Alice', 'Bob'], currency='EUR', split_type='fixed',
+                         split_details={'Alice': 10})
+        self.add_expense(5, 'Bob', ['Alice', 'Bob'], currency='JPY')
+
+        response = self.client.get(f'/api/trips/{self.trip.id}/expenses/summary/')
+        converted = response.data['converted']
+        self.assertEqual(converted['total'], '240.00')
+        self.assertEqual(converted['missing_rates'], ['JPY'])
+        self.assertEqual(converted['balances'], {'Alice': '60.00', 'Bob': '-60.00', 'Cara': '0.00'})
+        self.assertEqual(response.data['budget']['remaining'], '260.00')
+
+
+@override_settings(LLM_JOB_BACKEND='db')
+class GenerateEventsJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_uncached_destination_is_queued(self):
+        response = self.client.post('/api/generate-events/', {'destination': 'Lisbon'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = GenerationJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, GenerationJob.STATUS_PENDING)
+
+        events = [{'name': 'Tram 28'}]
+        with mock.patch('api.views.generate_events_with_llm', return_value=events):
+            self.assertTrue(run_job(job.pk))
+
+        response = self.client.get(response.data['status_url'])
+        self.assertEqual(response.data['status'], GenerationJob.STATUS_SUCCEEDED)
+        self.assertEqual(response.data['events'], events)
+        self.assertTrue(SuggestedEvent.objects.filter(destination='Lisbon').exists())
+
+    def test_cached_destination_returns_immediately(self):
+        SuggestedEvent.objects.create(destination='Lisbon', destination_key='lisbon', events_data=[{'name': 'Belem'}])
+        response = self.client.post('/api/generate-events/', {'destination': 'lisbon '}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['cached'])
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_failed_generation_is_reported(self):
+        with override_settings(LLM_JOB_BACKEND='sync'), self.assertLogs('api.jobs', 'ERROR'), \
+                mock.patch('api.views.generate_events_with_llm', side_effect=RuntimeError('boom')):
+            response = self.client.post('/api/generate-events/', {'destination': 'Oslo'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], GenerationJob.STATUS_FAILED)
+        self.assertEqual(response.data['error'], 'boom')
+
+    @override_settings(LLM_JOB_BACKEND='db', LLM_JOB_TIMEOUT=60)
+    def test_abandoned_jobs_are_requeued(self):
+        long_ago = timezone.now() - timedelta(minutes=5)
+        running = GenerationJob.objects.create(destination='Oslo', destination_key='oslo',
+                                               status=GenerationJob.STATUS_RUNNING, started_at=long_ago)
+        response = self.client.post('/api/generate-events/', {'destination': 'Oslo'}, format='json')
+        self.assertEqual(response.data['job_id'], running.pk)
+        running.refresh_from_db()
+        self.assertEqual(running.status, GenerationJob.STATUS_PENDING)
+        self.assertGreater(running.queued_at, long_ago)
+        # The requeued job is not failed by the next poll
+        response = self.client.get(f'/api/generate-events/jobs/{running.pk}/')
+        self.assertEqual(response.data['status'], GenerationJob.STATUS_PENDING)
+
+    def test_backlog_is_not_stale_with_db_backend(self):
+        pending = GenerationJob.objects.create(destination='Rome', destination_key='rome')
+        GenerationJob.objects.filter(pk=pending.pk).update(queued_at=timezone.now() - timedelta(minutes=5))
+        response = self.client.get(f'/api/generate-events/jobs/{pending.pk}/')
+        self.assertEqual(response.data['status'], GenerationJob.STATUS_PENDING)
+        with override_settings(LLM_JOB_BACKEND='sync'), \
+                mock.patch('api.views.generate_events_with_llm', return_value=[{'name': 'Colosseum'}]):
+            # Left PENDING by an in-process backend, it has lost its runner and is run again
+            response = self.client.get(f'/api/generate-events/jobs/{pending.pk}/')
+        self.assertEqual(response.data['status'], GenerationJob.STATUS_SUCCEEDED)
+
+    def test_late_runner_does_not_overwrite_a_requeued_job(self):
+        job = GenerationJob.objects.create(destination='Oslo', destination_key='oslo')
+
+        def generate(destination):
+            # Meanwhile the job is declared lost and requeued
+            GenerationJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+            requeue_stale_jobs()
+            return [{'name': 'Fjord cruise'}]
+
+        with mock.patch('api.views.generate_events_with_llm', side_effect=generate), \
+                self.assertLogs('api.jobs', 'WARNING'):
+            self.assertTrue(run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.STATUS_PENDING)
+        self.assertIsNone(job.events_data)
+
+
+class GenerationCoalescingTests(TransactionTestCase):
+    def stub_llm(self):
+        calls = []
+
+        def generate(destination):
+            calls.append(destination)
+            time.sleep(0.2)
+            return [{'name': f'{destination} walking tour'}]
+        return calls, mock.patch('api.views.generate_events_with_llm', side_effect=generate)
+
+    def run_concurrently(self, count, target):
+        results = [None] * count
+        barrier = threading.Barrier(count)
+
+        def worker(index):
+            try:
+                barrier.wait()
+                results[index] = target(index)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_generation_calls_llm_once(self):
+        calls, patcher = self.stub_llm()
+        with patcher:
+            results = self.run_concurrently(8, lambda i: generate_suggestions(' paris' if i % 2 else 'Paris'))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    @override_settings(LLM_JOB_BACKEND='sync')
+    def test_concurrent_requests_share_one_job(self):
+        calls, patcher = self.stub_llm()
+        with patcher:
+            responses = self.run_concurrently(
+                6, lambda i: APIClient().post('/api/generate-events/', {'destination': 'Paris'}, format='json')
+            )
+        self.assertEqual(len(calls), 1)
+        job_ids = {response.data['job_id'] for response in responses if response.status_code == 202}
+        self.assertEqual(len(job_ids), 1)
+        self.assertEqual(GenerationJob.objects.count(), 1)
+
+
+class SuggestionCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        reset_cache_stats()
+
+    def test_normalization_folds_case_accents_and_aliases(self):
+        self.assertEqual(normalize_destination('  São   Paulo '), 'sao paulo')
+        self.assertEqual(normalize_destination('ZÜRICH'), 'zurich')
+        self.assertEqual(normalize_destination('NYC'), 'new york')
+        self.assertEqual(normalize_destination('New York City'), 'new york')
+
+    def test_lookup_uses_key_and_counts_hits_and_misses(self):
+        SuggestedEvent.objects.create(destination='New York', destination_key='new york', events_data=[])
+        self.assertIsNotNone(get_cached_suggestions('nyc'))
+        self.assertIsNone(get_cached_suggestions('Boston'))
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+        self.assertEqual(cache_stats()['hit_ratio'], 0.5)
+
+    @override_settings(SUGGESTED_EVENTS_TTL=60)
+    def test_expired_entries_miss_and_are_evicted(self):
+        entry = SuggestedEvent.objects.create(destination='Oslo', destination_key='oslo', events_data=[])
+        SuggestedEvent.objects.filter(pk=entry.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.assertIsNone(get_cached_suggestions('Oslo'))
+        self.assertEqual(evict_suggestions(), (1, 0))
+        self.assertFalse(SuggestedEvent.objects.exists())
+
+    def test_eviction_trims_least_recently_used(self):
+        now = timezone.now()
+        for i, name in enumerate(['Rome', 'Oslo', 'Lima']):
+            SuggestedEvent.objects.create(
+                destination=name, destination_key=name.lower(), events_data=[],
+                last_used_at=now - timedelta(hours=i)
+            )
+        self.assertEqual(evict_suggestions(max_entries=1), (0, 2))
+        self.assertEqual(list(SuggestedEvent.objects.values_list('destination', flat=True)), ['Rome'])
+
+
+class FlightInfoCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trips = [make_trip(name=f'Trip {i}') for i in range(3)]
+
+    def add_flight(self, trip, number='sq 321'):
+        return self.client.post(
+            f'/api/trips/{trip.id}/flights/', {'flight_number': number, 'flight_date': '2026-05-01'}, format='json'
+        )
+
+    def test_trips_share_one_cached_lookup(self):
+        payload = {'flight': {'iata': 'SQ321'}, 'flight_status': 'scheduled'}
+        with mock.patch('api.flight_info.fetch_flight_data', return_value=payload) as fetch:
+            responses = [self.add_flight(trip) for trip in self.trips]
+        fetch.assert_called_once_with('SQ321')
+        self.assertEqual(FlightInfo.objects.count(), 1)
+        self.assertTrue(all(response.data['flight_data'] == payload for response in responses))
+
+    @override_settings(FLIGHT_INFO_TTL=60)
+    def test_stale_entries_are_refreshed_for_everyone(self):
+        with mock.patch('api.flight_info.fetch_flight_data', return_value={'flight_status': 'scheduled'}):
+            self.add_flight(self.trips[0])
+        FlightInfo.objects.update(fetched_at=timezone.now() - timedelta(minutes=5))
+        with mock.patch('api.flight_info.fetch_flight_data', return_value={'flight_status': 'landed'}) as fetch:
+            self.add_flight(self.trips[1])
+        fetch.assert_called_once()
+        response = self.client.get(f'/api/trips/{self.trips[0].id}/flights/')
+        self.assertEqual(response.data[0]['flight_data'], {'flight_status': 'landed'})
+
+    def test_empty_answers_are_not_cached(self):
+        with mock.patch('api.flight_info.fetch_flight_data', return_value={}):
+            self.assertEqual(self.add_flight(self.trips[0]).data['flight_data'], {})
+        with mock.patch('api.flight_info.fetch_flight_data', return_value={'flight_status': 'scheduled'}) as fetch:
+            response = self.add_flight(self.trips[1])
+        fetch.assert_called_once()
+        self.assertEqual(response.data['flight_data'], {'flight_status': 'scheduled'})
+        response = self.client.get(f'/api/trips/{self.trips[0].id}/flights/')
+        self.assertEqual(response.data[0]['flight_data'], {'flight_status': 'scheduled'})
+
+    @override_settings(FLIGHT_INFO_TTL=60)
+    def test_empty_answer_keeps_the_earlier_payload(self):
+        with mock.patch('api.flight_info.fetch_flight_data', return_value={'flight_status': 'landed'}):
+            self.add_flight(self.trips[0])
+        FlightInfo.objects.update(fetched_at=timezone.now() - timedelta(minutes=5))
+        with mock.patch('api.flight_info.fetch_flight_data', return_value={}):
+            response = self.add_flight(self.trips[1])
+        self.assertEqual(response.data['flight_data'], {'flight_status': 'landed'})
+
+    def test_missing_fields_are_rejected(self):
+        response = self.client.post(f'/api/trips/{self.trips[0].id}/flights/', {'flight_number': 'SQ1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StubAviationStack(BaseHTTPRequestHandler):
+    """Local stand-in for AviationStack; tests set `status` and `payload` on the class"""
+    status = 200
+    payload = {'data': [{'flight_status': 'active'}]}
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        body = json.dumps(self.payload).encode()
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboundHttpClientTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubAviationStack)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubAviationStack.status = 200
+        StubAviationStack.hits = 0
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        overrides = override_settings(
+            AVIATIONSTACK_URL=self.url,
+            OUTBOUND_HTTP_PROVIDERS={'aviationstack': {
+                'retries': 1, 'backoff_factor': 0, 'failure_threshold': 2, 'reset_timeout': 60,
+            }},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_clients()
+        self.addCleanup(reset_clients)
+        self.client = APIClient()
+        self.trip = make_trip()
+
+    def add_flight(self):
+        return self.client.post(
+            f'/api/trips/{self.trip.id}/flights/', {'flight_number': 'SQ321', 'flight_date': '2026-05-01'}, format='json'
+        )
+
+    def test_flight_lookup_goes_through_pooled_client(self):
+        response = self.add_flight()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['flight_data'], {'flight_status': 'active'})
+        self.assertEqual(StubAviationStack.hits, 1)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        StubAviationStack.status = 503
+        for _ in range(2):
+            self.assertEqual(self.add_flight().status_code, 502)
+        # one try plus one retry per call
+        self.assertEqual(StubAviationStack.hits, 4)
+
+        response = self.add_flight()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(StubAviationStack.hits, 4)
+        self.assertEqual(get_client('aviationstack').breaker.state, 'open')
+        with self.assertRaises(ProviderUnavailable):
+            get_client('aviationstack').get_json(f'{self.url}/flights')
+
+    def test_client_errors_and_error_bodies_are_not_cached(self):
+        StubAviationStack.status = 401
+        self.assertEqual(self.add_flight().status_code, 502)
+        StubAviationStack.status = 200
+        with mock.patch.object(StubAviationStack, 'payload', {'error': {'code': 'usage_limit_reached'}}):
+            response = self.add_flight()
+        self.assertEqual(response.status_code, 502)
+        self.assertIn('usage_limit_reached', response.data['error'])
+        self.assertFalse(FlightInfo.objects.exists())
+        # Both count towards the breaker (threshold 2)
+        self.assertEqual(get_client('aviationstack').breaker.state, 'open')
+
+    @override_settings(FLIGHT_INFO_TTL=0)
+    def test_stale_data_is_served_while_provider_is_down(self):
+        self.add_flight()
+        StubAviationStack.status = 500
+        with self.assertLogs('api.flight_info', 'WARNING') as logs:
+            response = self.add_flight()
+        self.assertIn('Serving stale flight data for SQ321', logs.output[0])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['flight_data'], {'flight_status': 'active'})
+
+
+class ConnectionReplaceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.first = Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Hotel')
+        self.second = Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Louvre')
+        self.url = f'/api/trips/{self.trip.id}/connections/{self.first.id}/{self.second.id}/'
+
+    def leg(self, mode, **kwargs):
+        return {'mode': mode, 'distance': '1.50', 'duration': '10.00', **kwargs}
+
+    def test_put_replaces_legs_in_order(self):
+        TravelMethod.objects.create(
+            trip=self.trip, from_stop=self.first, to_stop=self.second, mode='DRIVE', distance=3, duration=8
+        )
+        response = self.client.put(self.url, [self.leg('WALK'), self.leg('TRAIN', line_number='M1')], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(leg['mode'], leg['order']) for leg in response.data], [('WALK', 0), ('TRAIN', 1)])
+        self.assertEqual(
+            list(TravelMethod.objects.order_by('order').values_list('mode', flat=True)), ['WALK', 'TRAIN']
+        )
+
+    def test_invalid_leg_leaves_existing_route_untouched(self):
+        TravelMethod.objects.create(
+            trip=self.trip, from_stop=self.first, to_stop=self.second, mode='DRIVE', distance=3, duration=8
+        )
+        response = self.client.put(self.url, [self.leg('WALK'), self.leg('TELEPORT')], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[1]['mode'][0].code, 'invalid_choice')
+        self.assertEqual(list(TravelMethod.objects.values_list('mode', flat=True)), ['DRIVE'])
+
+    def test_stops_must_belong_to_trip(self):
+        other = Itinerary.objects.create(trip=make_trip(), date='2026-05-01', location='Elsewhere')
+        response = self.client.put(
+            f'/api/trips/{self.trip.id}/connections/{self.first.id}/{other.id}/', [self.leg('WALK')], format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(TravelMethod.objects.exists())
+
+
+class ItineraryReorderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.url = f'/api/trips/{self.trip.id}/itinerary/reorder/'
+
+    def add_item(self, day, location):
+        response = self.client.post(
+            f'/api/trips/{self.trip.id}/itinerary/', {'trip': self.trip.id, 'date': day, 'location': location},
+            format='json'
+        )
+        return response.data['id']
+
+    def day_order(self, day):
+        return list(Itinerary.objects.filter(trip=self.trip, date=day).values_list('location', 'position'))
+
+    def test_new_items_are_appended_to_their_day(self):
+        self.add_item('2026-05-01', 'A')
+        self.add_item('2026-05-01', 'B')
+        self.add_item('2026-05-02', 'C')
+        self.assertEqual(self.day_order('2026-05-01'), [('A', 0), ('B', 1)])
+        self.assertEqual(self.day_order('2026-05-02'), [('C', 0)])
+
+    def test_reorder_within_a_day_returns_changed_rows(self):
+        a, b, c = (self.add_item('2026-05-01', name) for name in 'ABC')
+        # trip, savepoint, select, one bulk UPDATE, trip version bump, release
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, {'days': {'2026-05-01': [a, c, b]}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['id'], row['position']) for row in response.data], [(c, 1), (b, 2)])
+        self.assertEqual(self.day_order('2026-05-01'), [('A', 0), ('C', 1), ('B', 2)])
+
+    def test_move_to_unlisted_day_compacts_source(self):
+        a, b, c = (self.add_item('2026-05-01', name) for name in 'ABC')
+        d = self.add_item('2026-05-02', 'D')
+        response = self.client.post(self.url, {'days': {'2026-05-02': [a, d]}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.day_order('2026-05-02'), [('A', 0), ('D', 1)])
+        self.assertEqual(self.day_order('2026-05-01'), [('B', 0), ('C', 1)])
+
+    def test_patching_the_date_appends_to_the_new_day(self):
+        a, b, c = (self.add_item('2026-05-01', name) for name in 'ABC')
+        self.add_item('2026-05-02', 'D')
+        response = self.client.patch(
+            f'/api/itinerary/{a}/', {'trip': self.trip.id, 'date': '2026-05-02', 'location': 'A'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['position'], 1)
+        self.assertEqual(self.day_order('2026-05-02'), [('D', 0), ('A', 1)])
+        self.assertEqual(self.day_order('2026-05-01'), [('B', 0), ('C', 1)])
+        # Saving an unchanged date keeps the position
+        self.client.patch(f'/api/itinerary/{a}/', {'date': '2026-05-02', 'notes': 'Late'}, format='json')
+        self.assertEqual(self.day_order('2026-05-02'), [('D', 0), ('A', 1)])
+
+    def test_bulk_patch_moves_items_between_days(self):
+        a, b, c = (self.add_item('2026-05-01', name) for name in 'ABC')
+        self.add_item('2026-05-02', 'D')
+        response = self.client.patch('/api/itinerary/bulk/', [
+            {'id': a, 'date': '2026-05-02'},
+            {'id': b, 'notes': 'Stays'},
+            {'id': c, 'date': '2026-05-02'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.day_order('2026-05-01'), [('B', 0)])
+        self.assertEqual(self.day_order('2026-05-02'), [('D', 0), ('A', 1), ('C', 2)])
+
+    def test_incomplete_or_foreign_orderings_are_rejected(self):
+        a, b = (self.add_item('2026-05-01', name) for name in 'AB')
+        foreign = Itinerary.objects.create(trip=make_trip(), date='2026-05-01', location='X')
+        self.assertEqual(self.client.post(self.url, {'days': {'2026-05-01': [b]}}, format='json').status_code, 400)
+        self.assertEqual(
+            self.client.post(self.url, {'days': {'2026-05-01': [b, a, foreign.id]}}, format='json').status_code, 400
+        )
+        self.assertEqual(self.day_order('2026-05-01'), [('A', 0), ('B', 1)])
+
+
+class BulkOperationsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+
+    def expense(self, description, **kwargs):
+        return {
+            'trip': self.trip.id, 'description': description, 'amount': '10.00',
+            'date': '2026-05-01', 'paid_by': 'Alice', 'split_between': ['Alice', 'Bob'], **kwargs
+        }
+
+    def test_bulk_create_uses_constant_queries(self):
+        payload = [self.expense(f'Item {i}') for i in range(50)]
+        # trip lookup, savepoint, insert, trip version bump, release
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/expenses/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 50)
+        self.assertTrue(all(row['id'] for row in response.data))
+        self.assertEqual(Expense.objects.filter(trip=self.trip).count(), 50)
+
+    def test_invalid_item_reports_per_item_errors_and_writes_nothing(self):
+        payload = [self.expense('Lunch'), self.expense('Dinner', amount='lots'), self.expense('Taxi', trip=999999)]
+        response = self.client.post('/api/expenses/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('amount', response.data[1])
+        self.assertIn('trip', response.data[2])
+        self.assertFalse(Expense.objects.exists())
+
+    def test_bulk_itinerary_create_appends_positions(self):
+        Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Hotel', position=0)
+        payload = [
+            {'trip': self.trip.id, 'date': day, 'location': location}
+            for day, location in [('2026-05-01', 'Louvre'), ('2026-05-02', 'Versailles'), ('2026-05-01', 'Seine')]
+        ]
+        response = self.client.post('/api/itinerary/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['position'] for row in response.data], [1, 0, 2])
+
+    def test_bulk_update_and_delete(self):
+        lunch = Expense.objects.create(trip=self.trip, description='Lunch', amount=10, date='2026-05-01')
+        taxi = Expense.objects.create(trip=self.trip, description='Taxi', amount=20, date='2026-05-01')
+
+        response = self.client.patch(
+            '/api/expenses/bulk/', [{'id': lunch.id, 'amount': '12.00'}, {'id': 999999, 'amount': '1.00'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        lunch.refresh_from_db()
+        self.assertEqual(str(lunch.amount), '10.00')
+
+        response = self.client.patch(
+            '/api/expenses/bulk/',
+            [{'id': lunch.id, 'amount': '12.00'}, {'id': taxi.id, 'category': 'Transport'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(Expense.objects.values_list('description', 'amount', 'category')),
+            {('Lunch', Decimal('12.00'), 'Other'), ('Taxi', Decimal('20.00'), 'Transport')}
+        )
+
+        response = self.client.delete('/api/expenses/bulk/', {'ids': [lunch.id, taxi.id]}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Expense.objects.exists())
+
+    @override_settings(BULK_MAX_BATCH_SIZE=2)
+    def test_batch_size_is_capped(self):
+        payload = [self.expense(f'Item {i}') for i in range(3)]
+        response = self.client.post('/api/expenses/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_benchmark_command_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_bulk', sizes=[5], stdout=out)
+        self.assertIn('speedup', out.getvalue())
+        self.assertFalse(Trip.objects.exclude(pk=self.trip.pk).exists())
+        self.assertFalse(Expense.objects.exists())
+
+
+class TripCloneTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip(budget=500, currency='EUR')
+        Stop.objects.create(trip=self.trip, name='Eiffel Tower', latitude=48.85, longitude=2.29, day=1)
+        self.items = Itinerary.objects.bulk_create([
+            Itinerary(trip=self.trip, date='2026-05-01', location=f'Place {i}', position=i) for i in range(30)
+        ])
+        TravelMethod.objects.bulk_create([
+            TravelMethod(trip=self.trip, from_stop=a, to_stop=b, mode='WALK', distance=1, duration=10)
+            for a, b in zip(self.items, self.items[1:])
+        ])
+        MyActivity.objects.create(trip=self.trip, place='Louvre', activity='Museum', recommended_time=3)
+        Expense.objects.create(trip=self.trip, description='Hotel', amount=200, date='2026-05-02')
+
+    def test_clone_remaps_legs_and_shifts_dates(self):
+        # trip, savepoint, new trip, a read and a write for each of the five tables,
+        # release, then the new trip's stops for the response
+        with self.assertNumQueries(15):
+            response = self.client.post(
+                f'/api/trips/{self.trip.id}/clone/', {'start_date': '2027-05-01', 'include_expenses': True},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['copied']['travel_methods'], 29)
+        new_trip = Trip.objects.get(pk=response.data['trip']['id'])
+        self.assertEqual((str(new_trip.start_date), str(new_trip.end_date)), ('2027-05-01', '2027-05-05'))
+        self.assertEqual(new_trip.name, 'Paris Getaway (copy)')
+        self.assertEqual(new_trip.currency, 'EUR')
+
+        self.assertEqual(set(new_trip.itinerary.values_list('date', flat=True)), {date(2027, 5, 1)})
+        self.assertFalse(TravelMethod.objects.filter(trip=new_trip).exclude(from_stop__trip=new_trip).exists())
+        self.assertFalse(TravelMethod.objects.filter(trip=new_trip).exclude(to_stop__trip=new_trip).exists())
+        first_leg = TravelMethod.objects.filter(trip=new_trip, from_stop__location='Place 0').get()
+        self.assertEqual(first_leg.to_stop.location, 'Place 1')
+        self.assertEqual(str(new_trip.expenses.get().date), '2027-05-02')
+        self.assertEqual(new_trip.my_activities.count(), 1)
+        self.assertEqual(new_trip.stops.count(), 1)
+        # The source trip is untouched
+        self.assertEqual(TravelMethod.objects.filter(trip=self.trip).count(), 29)
+
+    def test_expenses_are_skipped_by_default(self):
+        response = self.client.post(f'/api/trips/{self.trip.id}/clone/', {'name': 'Template'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        new_trip = Trip.objects.get(pk=response.data['trip']['id'])
+        self.assertEqual(new_trip.name, 'Template')
+        self.assertEqual(str(new_trip.start_date), '2026-05-01')
+        self.assertFalse(new_trip.expenses.exists())
+
+
+class MyActivitySearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.other = make_trip(name='Rome')
+        for trip, place, activity in [
+            (self.trip, 'Louvre Museum', 'See the Mona Lisa and Egyptian antiquities'),
+            (self.trip, 'Café de Flore', 'Coffee and croissants on Saint-Germain'),
+            (self.trip, 'Seine Cruise', 'Evening boat ride past the museums'),
+            (self.other, 'Vatican Museums', 'Sistine Chapel'),
+        ]:
+            MyActivity.objects.create(trip=trip, place=place, activity=activity, recommended_time=2)
+
+    def places(self, response):
+        return [row['place'] for row in response.data['results']]
+
+    def test_trip_listing_is_paginated_and_scoped(self):
+        response = self.client.get(f'/api/trips/{self.trip.id}/my-activities/', {'page_size': 2, 'fields': 'id,place'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'place'})
+        rest = self.client.get(response.data['next'])
+        self.assertEqual(len(rest.data['results']), 1)
+        self.assertIsNone(rest.data['next'])
+
+        response = self.client.get('/api/my-activities/', {'trip': self.other.id})
+        self.assertEqual([row['place'] for row in response.data['results']], ['Vatican Museums'])
+        self.assertEqual(self.client.get('/api/my-activities/', {'trip': 'x'}).status_code, 400)
+
+    def test_search_ranks_matches_and_filters_by_trip(self):
+        response = self.client.get('/api/my-activities/search/', {'q': 'museum', 'trip': self.trip.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.places(response)[0], 'Louvre Museum')
+        self.assertNotIn('Vatican Museums', self.places(response))
+
+        # Accent-insensitive, prefix match on the last word, and FTS syntax is treated as text
+        self.assertEqual(self.places(self.client.get('/api/my-activities/search/', {'q': 'cafe croiss'})), ['Café de Flore'])
+        self.assertEqual(self.client.get('/api/my-activities/search/', {'q': '"mona" OR ('}).status_code, 200)
+        self.assertEqual(self.client.get('/api/my-activities/search/', {'q': ' '}).status_code, 400)
+
+    def test_index_follows_updates_and_deletes(self):
+        cafe = MyActivity.objects.get(place='Café de Flore')
+        cafe.activity = 'Hot chocolate'
+        cafe.save()
+        self.assertEqual(self.places(self.client.get('/api/my-activities/search/', {'q': 'chocolate'})), ['Café de Flore'])
+        self.assertEqual(self.places(self.client.get('/api/my-activities/search/', {'q': 'croissants'})), [])
+        cafe.delete()
+        self.assertEqual(self.places(self.client.get('/api/my-activities/search/', {'q': 'chocolate'})), [])
+
+
+class QueryPlanAuditTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('audit_query_plans', stdout=out)
+        self.assertNotIn('✗', out.getvalue())
+        self.assertFalse(Trip.objects.exists())
+
+    def test_unsupported_backend_is_a_command_error(self):
+        with mock.patch.object(connections['default'], 'vendor', 'oracle'):
+            with self.assertRaisesMessage(CommandError, 'the oracle backend is not checked'):
+                call_command('audit_query_plans', stdout=StringIO())
+        self.assertFalse(Trip.objects.exists())
+
+    def test_plan_problems(self):
+        self.assertEqual(plan_problems('sqlite', 'SEARCH api_expense USING INDEX expense_trip_date (trip_id=?)'), [])
+        self.assertEqual(plan_problems('sqlite', 'SCAN api_travelmethod USING INDEX travelmethod_stop_order'), [])
+        self.assertEqual(len(plan_problems('sqlite', 'SCAN api_expense\nUSE TEMP B-TREE FOR ORDER BY')), 2)
+        self.assertEqual(
+            len(plan_problems('postgresql', 'Sort  (cost=1.1..1.2)\n  ->  Seq Scan on api_expense')), 2
+        )
+        self.assertEqual(plan_problems('postgresql', 'Index Scan using expense_trip_date on api_expense'), [])
+
+
+class BenchmarkHarnessTests(TestCase):
+    def test_generated_data_serves_every_scenario(self):
+        counts = generate_dataset(trips=3, items_per_trip=4, expenses_per_trip=5, activities_per_trip=2)
+        self.assertEqual(counts, {
+            'trips': 3, 'itinerary': 12, 'expenses': 15, 'travel_methods': 9, 'my_activities': 6,
+        })
+        results = run_scenarios(iterations=1, warmup=0)
+        self.assertEqual(len(results), len(SCENARIOS))
+        for result in results:
+            self.assertTrue(all(200 <= status < 300 for status in result['statuses']), result)
+            self.assertGreaterEqual(result['queries'], 1)
+
+    def test_compare_flags_slower_or_chattier_endpoints(self):
+        baseline = {'results': [{'name': 'trip list', 'p50_ms': 10.0, 'queries': 2}]}
+        self.assertEqual(compare_results(baseline, [{'name': 'trip list', 'p50_ms': 11.0, 'queries': 2}]), [])
+        self.assertEqual(len(compare_results(baseline, [{'name': 'trip list', 'p50_ms': 20.0, 'queries': 3}])), 2)
+
+
+@override_settings(PERF_LOG_REQUESTS=True)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Louvre')
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_reports_sql_and_serializer_time(self):
+        with self.assertLogs('api.performance', 'INFO') as logs:
+            response = self.client.get(f'/api/trips/{self.trip.id}/itinerary/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'app', 'db', 'serialize'})
+        self.assertEqual(timings['db']['desc'], '"2 queries"')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'trip-itinerary')
+        self.assertEqual(record['db_queries'], 2)
+        self.assertGreater(record['serialize_ms'], 0)
+
+    @override_settings(LLM_JOB_BACKEND='sync')
+    def test_llm_time_is_reported(self):
+        with mock.patch('api.views.generate_events_with_llm', return_value=[{'name': 'Tour'}]), \
+                self.assertLogs('api.performance', 'INFO'):
+            response = self.client.post('/api/generate-events/', {'destination': 'Oslo'}, format='json')
+        self.assertIn('llm', self.timings(response))
+
+    @override_settings(PERF_LOG_REQUESTS=False)
+    def test_request_log_is_off_by_default(self):
+        with self.assertNoLogs('api.performance'):
+            response = self.client.get(f'/api/trips/{self.trip.id}/itinerary/')
+        self.assertIn('db', self.timings(response))
+
+    def test_streamed_body_is_logged_after_it_is_sent(self):
+        with self.assertNoLogs('api.performance'):
+            response = self.client.get(f'/api/trips/{self.trip.id}/export/')
+        with self.assertLogs('api.performance', 'INFO') as logs:
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'trip-export')
+        # Trip lookup before the headers plus one query per exported collection
+        self.assertEqual(record['db_queries'], 8)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0.001)
+    def test_slow_requests_dump_their_sql(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            self.client.get(f'/api/trips/{self.trip.id}/itinerary/')
+        slow = json.loads(logs.records[-1].getMessage())['slow_request']
+        self.assertEqual(len(slow['sql']), 2)
+        self.assertIn('api_itinerary', slow['sql'][1]['sql'])
+
+    def test_nested_spans_are_counted_once(self):
+        metrics, token = start_request()
+        try:
+            with span('serialize'):
+                with span('serialize'):
+                    pass
+        finally:
+            end_request(token)
+        self.assertEqual(metrics.counts, {'serialize': 1})
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        REGISTRY.reset()
+        reset_cache_stats()
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = Registry()
+        latency = registry.histogram('latency_seconds', 'Latency', ['view'], buckets=(0.1, 1))
+        latency.observe(0.05, view='a')
+        latency.observe(0.5, view='a')
+        latency.observe(5, view='a')
+        text = render_prometheus(registry.snapshot())
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{view="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{view="a",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{view="a",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{view="a"} 3', text)
+
+    def test_worker_snapshots_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            workers = [Registry(), Registry()]
+            for worker, pid in zip(workers, (101, 102)):
+                worker._path = lambda pid=pid: f'{directory}/metrics-{pid}.json'
+                worker.counter('lookups_total', 'Lookups', ['result']).inc(result='hit')
+                worker.flush()
+            text = render_prometheus(workers[0].collect())
+        self.assertIn('lookups_total{result="hit"} 2', text)
+
+    def test_last_increments_are_flushed_without_more_traffic(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0.05):
+            registry = Registry()
+            counter = registry.counter('lookups_total', 'Lookups', ['result'])
+            counter.inc(result='hit')
+            counter.inc(result='hit')
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                try:
+                    with open(registry._path()) as handle:
+                        if json.load(handle)['lookups_total']['samples'] == [[['hit'], 2]]:
+                            break
+                except (OSError, ValueError):
+                    pass
+                time.sleep(0.01)
+            else:
+                self.fail('The idle worker never wrote its last increments')
+
+    def test_concurrent_flushes_leave_one_complete_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            registry = Registry()
+            counter = registry.counter('lookups_total', 'Lookups', ['result'])
+
+            def worker():
+                for _ in range(20):
+                    counter.inc(result='hit')
+                    registry.flush()
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            registry.flush()
+            self.assertEqual(os.listdir(directory), [os.path.basename(registry._path())])
+            self.assertIn('lookups_total{result="hit"} 80', render_prometheus(registry.collect()))
+
+    @override_settings(LLM_JOB_BACKEND='sync')
+    def test_endpoint_reports_cache_and_request_metrics(self):
+        with mock.patch('api.views.generate_events_with_llm', return_value=[{'name': 'Tour'}]):
+            self.client.post('/api/generate-events/', {'destination': 'Oslo'}, format='json')
+            self.client.post('/api/generate-events/', {'destination': 'Oslo'}, format='json')
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('travelplanner_suggestion_cache_lookups_total{result="hit"} 1', text)
+        self.assertIn('travelplanner_suggestion_cache_lookups_total{result="miss"} 1', text)
+        # the miss queues a job (202), the second call is served from the cache
+        for status in (202, 200):
+            self.assertIn(
+                f'travelplanner_http_request_duration_seconds_count{{view="generate-events",method="POST",status="{status}"}} 1',
+                text,
+            )
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.item = Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Louvre')
+        self.url = f'/api/trips/{self.trip.id}/itinerary/'
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_collection_answers_304_without_serializing(self):
+        etag = self.client.get(self.url)['ETag']
+        # trip lookup only: no itinerary query
+        with self.assertNumQueries(1):
+            response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_child_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(f'/api/itinerary/{self.item.id}/', {'notes': 'Book ahead'}, format='json')
+        response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['notes'], 'Book ahead')
+
+        etag = response['ETag']
+        self.client.delete(f'/api/itinerary/{self.item.id}/')
+        self.assertEqual(self.revalidate(self.url, etag).status_code, 200)
+
+    def test_bulk_writes_and_trip_edits_change_the_etag(self):
+        url = f'/api/trips/{self.trip.id}/expenses/'
+        etag = self.client.get(url)['ETag']
+        self.client.post('/api/expenses/bulk/', [{
+            'trip': self.trip.id, 'description': 'Taxi', 'amount': '12.00', 'date': '2026-05-01',
+            'paid_by': 'Alice', 'split_between': ['Alice'],
+        }], format='json')
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+        bundle = f'/api/trips/{self.trip.id}/bundle/'
+        etag = self.client.get(bundle)['ETag']
+        self.client.patch(f'/api/trips/{self.trip.id}/', {'name': 'Paris again'}, format='json')
+        self.assertEqual(self.revalidate(bundle, etag).status_code, 200)
+
+    def test_representations_get_distinct_etags(self):
+        bundle = f'/api/trips/{self.trip.id}/bundle/'
+        self.assertNotEqual(
+            self.client.get(bundle)['ETag'], self.client.get(bundle, {'include': 'expenses'})['ETag']
+        )
+        self.assertNotEqual(self.client.get(self.url)['ETag'], self.client.get(f'/api/trips/{self.trip.id}/flights/')['ETag'])
+
+    def test_stale_trip_instance_cannot_roll_the_version_back(self):
+        stale = Trip.objects.get(pk=self.trip.pk)
+        touch_trips([self.trip.pk])
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).version, stale.version)
+        self.assertEqual(stale.version, self.trip.version + 3)  # item added in setUp, touch, save
+
+
+class RouteOptimizerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.url = f'/api/trips/{self.trip.id}/optimize-route/'
+
+    def add_stop(self, name, longitude, order, day=1, latitude=48.85, **kwargs):
+        return Stop.objects.create(
+            trip=self.trip, name=name, latitude=latitude, longitude=longitude, day=day, order=order, **kwargs
+        )
+
+    def day_names(self, day=1):
+        return list(Stop.objects.filter(trip=self.trip, day=day).values_list('name', flat=True))
+
+    def test_stops_on_a_line_are_visited_in_line(self):
+        for order, (name, longitude) in enumerate([('C', 2.33), ('A', 2.31), ('D', 2.34), ('B', 2.32)]):
+            self.add_stop(name, longitude, order)
+        self.add_stop('Elsewhere', 2.30, 0, day=2)
+
+        response = self.client.post(self.url, {'days': [1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.day_names(), [['A', 'B', 'C', 'D'], ['D', 'C', 'B', 'A']])
+        [summary] = response.data['days']
+        self.assertEqual(summary['method'], 'exact')
+        self.assertLess(summary['distance_km'], summary['distance_km_before'])
+        self.assertEqual(self.day_names(day=2), ['Elsewhere'])
+
+    def test_single_lodging_makes_a_loop(self):
+        # Corners of a square, saved criss-cross; the hotel ends up first
+        self.add_stop('Far', 2.31, 0, latitude=48.86)
+        self.add_stop('North', 2.30, 1, latitude=48.86)
+        self.add_stop('East', 2.31, 2)
+        self.add_stop('Hotel', 2.30, 3, category='ACCOMMODATION')
+        response = self.client.post(self.url, {}, format='json')
+        self.assertIn(self.day_names(), [['Hotel', 'North', 'Far', 'East'], ['Hotel', 'East', 'Far', 'North']])
+        self.assertIn('Hotel', [stop['name'] for stop in response.data['updated']])
+
+    def test_timed_stops_keep_their_order(self):
+        self.add_stop('Late', 2.31, 0, visit_time='18:00')
+        self.add_stop('Early', 2.34, 1, visit_time='09:00')
+        self.add_stop('Middle', 2.32, 2)
+        self.client.post(self.url, {}, format='json')
+        names = self.day_names()
+        self.assertLess(names.index('Early'), names.index('Late'))
+
+    def test_two_lodgings_start_and_end_the_day(self):
+        self.add_stop('Museum', 2.32, 0)
+        self.add_stop('New hotel', 2.30, 1, category='ACCOMMODATION')
+        self.add_stop('Old hotel', 2.35, 2, category='ACCOMMODATION')
+        self.add_stop('Park', 2.33, 3)
+        self.client.post(self.url, {}, format='json')
+        self.assertEqual(self.day_names(), ['New hotel', 'Museum', 'Park', 'Old hotel'])
+
+    def test_rejects_bad_days(self):
+        response = self.client.post(self.url, {'days': 'all'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(ROUTE_EXACT_MAX_STOPS=0)
+    def test_heuristic_matches_exact_on_small_days(self):
+        for seed in range(5):
+            points = np.random.default_rng(seed).random((8, 2))
+            problem = DayRoute(haversine_matrix(points[:, 0], points[:, 1]), start=0, end=0, anchors=[3, 5])
+            route, method = problem.solve()
+            self.assertEqual(method, 'heuristic')
+            self.assertTrue(problem.is_valid(route))
+            self.assertLessEqual(problem.length(route), problem.length(problem.exact()) * 1.05)
+
+    def test_large_days_get_a_valid_route(self):
+        points = np.random.default_rng(0).random((60, 2))
+        problem = DayRoute(haversine_matrix(points[:, 0], points[:, 1]), start=0, end=59, anchors=[10, 20, 30])
+        route, method = problem.solve()
+        self.assertEqual(method, 'heuristic')
+        self.assertTrue(problem.is_valid(route))
+        self.assertLess(problem.length(route), problem.length(problem.nearest_neighbour()) + 1e-9)
+
+
+class DistanceMatrixTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        clear_matrix_cache()
+        self.trip = make_trip()
+        self.stops = [
+            Stop.objects.create(trip=self.trip, name=f'S{i}', latitude=48.85, longitude=2.30 + i * 0.01, order=i)
+            for i in range(6)
+        ]
+
+    def current(self):
+        return Trip.objects.get(pk=self.trip.pk)
+
+    def assertMatchesFreshBuild(self, matrix):
+        rows = Stop.objects.filter(trip=self.trip).order_by('id')
+        expected = haversine_matrix([s.latitude for s in rows], [s.longitude for s in rows])
+        self.assertEqual(matrix.ids.tolist(), [s.id for s in rows])
+        np.testing.assert_allclose(matrix.dist, expected, rtol=1e-5, atol=1e-6)
+
+    def test_cached_until_the_trip_changes(self):
+        trip = self.current()
+        first = get_trip_matrix(trip)
+        with self.assertNumQueries(0):
+            self.assertIs(get_trip_matrix(trip), first)
+
+    def test_single_stop_changes_are_applied_incrementally(self):
+        get_trip_matrix(self.current())
+        self.stops[2].longitude = 2.50
+        self.stops[2].save()
+        Stop.objects.create(trip=self.trip, name='New', latitude=48.86, longitude=2.31)
+        self.stops[4].delete()
+
+        with mock.patch('api.distance_matrix.TripMatrix.build') as build:
+            matrix = get_trip_matrix(self.current())
+        build.assert_not_called()
+        self.assertMatchesFreshBuild(matrix)
+
+    def test_many_changes_rebuild(self):
+        get_trip_matrix(self.current())
+        Stop.objects.filter(trip=self.trip).update(latitude=40.0)
+        touch_trips([self.trip.pk])
+        self.assertMatchesFreshBuild(get_trip_matrix(self.current()))
+
+    def test_durations_follow_speed_profiles(self):
+        profiles = {'WALK': {'speed_kmh': 5, 'detour': 1.0, 'overhead_min': 0},
+                    'BUS': {'speed_kmh': 20, 'detour': 1.0, 'overhead_min': 10}}
+        with override_settings(TRAVEL_SPEED_PROFILES=profiles):
+            response = self.client.get(f'/api/trips/{self.trip.id}/distance-matrix/')
+        self.assertEqual(response.status_code, 200)
+        km = response.data['distance_km'][0][1]
+        self.assertAlmostEqual(response.data['duration_min']['WALK'][0][1], km / 5 * 60, places=0)
+        self.assertAlmostEqual(response.data['duration_min']['BUS'][0][1], km / 20 * 60 + 10, places=0)
+        self.assertEqual(response.data['duration_min']['BUS'][1][1], 0)
+
+    def test_rejects_unknown_mode(self):
+        response = self.client.get(f'/api/trips/{self.trip.id}/distance-matrix/', {'mode': 'TELEPORT'})
+        self.assertEqual(response.status_code, 400)
+
+
+class NearbyStopsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        self.other = make_trip(name='Other')
+        # roughly 0, 0.7, 2.2 and 11 km east of the Louvre
+        self.stops = [
+            Stop.objects.create(trip=self.trip, name=f'S{i}', latitude=48.8606, longitude=2.3376 + offset)
+            for i, offset in enumerate((0.0, 0.01, 0.03, 0.15))
+        ]
+        self.elsewhere = Stop.objects.create(trip=self.other, name='Elsewhere', latitude=48.8607, longitude=2.3377)
+
+    def test_geohash_follows_coordinates(self):
+        stop = self.stops[0]
+        self.assertEqual(stop.geohash, encode_geohash(stop.latitude, stop.longitude))
+        stop.latitude = 51.5
+        stop.save(update_fields=['latitude'])
+        stop.refresh_from_db()
+        self.assertEqual(stop.geohash, encode_geohash(51.5, stop.longitude))
+
+        created = Stop.objects.bulk_create([Stop(trip=self.trip, name='Bulk', latitude=-33.9, longitude=151.2)])
+        self.assertEqual(Stop.objects.get(pk=created[0].pk).geohash, encode_geohash(-33.9, 151.2))
+
+    def test_ranges_cover_the_radius(self):
+        rng = np.random.default_rng(1)
+        # include points next to the poles and the antimeridian
+        centres = [(0.0, 179.999), (0.0, -180.0), (89.9, 10.0), (-89.95, -45.0), (48.86, 2.34)]
+        centres += list(zip(rng.uniform(-80, 80, 20), rng.uniform(-180, 180, 20)))
+        for lat, lon in centres:
+            for radius in (0.05, 1.0, 25.0):
+                lats = np.clip(lat + rng.uniform(-1, 1, 400) * radius / 111 * 1.2, -90, 90)
+                lons = (lon + rng.uniform(-1, 1, 400) * 0.5 + 180) % 360 - 180
+                inside = haversine_matrix([lat], [lon], lats, lons)[0] <= radius
+                codes = encode_geohash(lats[inside], lons[inside])
+                covered = np.zeros(len(codes), dtype=bool)
+                for low, high in geohash_ranges(lat, lon, radius):
+                    covered |= (codes >= low) & (codes < high)
+                self.assertTrue(covered.all(), f'({lat}, {lon}) r={radius}')
+
+    def test_nearest_first_within_radius(self):
+        response = self.client.get('/api/stops/nearby/', {'lat': 48.8606, 'lng': 2.3376, 'radius': 3, 'trip': self.trip.id})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [s.id for s in self.stops[:3]])
+        self.assertEqual(results[0]['distance_km'], 0)
+        self.assertAlmostEqual(results[2]['distance_km'], 2.2, places=1)
+
+    def test_limit_and_all_trips(self):
+        response = self.client.get('/api/stops/nearby/', {'lat': 48.8606, 'lng': 2.3376, 'limit': 2})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.stops[0].id, self.elsewhere.id])
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'lng': 2.3}, {'lat': 'north', 'lng': 2.3}, {'lat': 91, 'lng': 2.3},
+                       {'lat': 48, 'lng': 2.3, 'radius': 10_000}, {'lat': 48, 'lng': 2.3, 'limit': 0}):
+            response = self.client.get('/api/stops/nearby/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip()
+        first = Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Louvre', links=[{'url': 'https://x'}])
+        second = Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Orsay')
+        TravelMethod.objects.create(trip=self.trip, from_stop=first, to_stop=second, mode='WALK', distance=1, duration=12)
+        Stop.objects.create(trip=self.trip, name='Hotel', latitude=48.86, longitude=2.34)
+        Expense.objects.create(trip=self.trip, description='Café, "au lait"', amount='4.50', currency='EUR',
+                               date='2026-05-01', split_between=['Alice', 'Bob'])
+        Flight.objects.create(trip=self.trip, flight_number='AF1', flight_date='2026-05-01')
+        MyActivity.objects.create(trip=self.trip, place='Seine', activity='Boat tour', recommended_time=1)
+        self.other = make_trip(name='Other')
+        Expense.objects.create(trip=self.other, description='Taxi', amount='20', date='2026-05-02')
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_trip_jsonl_holds_every_collection(self):
+        with self.assertNumQueries(8):   # the trip, then one query per collection
+            response, body = self.export(f'/api/trips/{self.trip.id}/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [r['type'] for r in records],
+            ['trip', 'stop', 'itinerary', 'itinerary', 'expense', 'travel_method', 'flight', 'my_activity'],
+        )
+        self.assertTrue(all(r.get('trip', r['id']) == self.trip.id for r in records))
+        expense = records[4]
+        self.assertEqual((expense['amount'], expense['split_between']), ('4.50', ['Alice', 'Bob']))
+
+    def test_all_trips_csv(self):
+        response, body = self.export('/api/trips/export/', format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="trips.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(body.splitlines()))
+        expenses = [row for row in rows if row['type'] == 'expense']
+        self.assertEqual([row['trip'] for row in expenses], [str(self.trip.id), str(self.other.id)])
+        self.assertEqual(expenses[0]['description'], 'Café, "au lait"')
+        self.assertEqual(json.loads(expenses[0]['split_between']), ['Alice', 'Bob'])
+        self.assertEqual(expenses[0]['flight_number'], '')
+
+    def test_unchanged_trip_export_is_not_modified(self):
+        response, _ = self.export(f'/api/trips/{self.trip.id}/export/')
+        response = self.client.get(f'/api/trips/{self.trip.id}/export/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/trips/export/', {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/trips/999999/export/').status_code, 404)
+        self.assertEqual(self.client.post('/api/trips/export/').status_code, 405)
+
+
+class CsvImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.trip = make_trip(currency='SGD')
+
+    def upload(self, kind, text):
+        upload = SimpleUploadedFile('rows.csv', text.encode(), content_type='text/csv')
+        return self.client.post(f'/api/trips/{self.trip.id}/{kind}/import/', {'file': upload}, format='multipart')
+
+    def test_expenses_with_bad_rows(self):
+        version = self.trip.version
+        response = self.upload('expenses', (
+            'Date,Description,Amount,Currency,Split Between,Notes\n'
+            '2026-05-01,Dinner,"1,234.50",eur,Alice;Bob,x\n'
+            '2026-05-02,Bus,€2,,,\n'
+            '2026-05-02,Snack,$3,,,\n'
+            '2026-13-01,,abc,XX,,\n'
+            '2026-05-03,Coffee,"4,5",,"[""Bob""]",\n'
+            '2026-05-03,Mixed,€5,USD,,\n'
+        ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (4, 2))
+        self.assertEqual(response.data['ignored_columns'], ['notes'])
+        self.assertEqual(response.data['errors'][0]['line'], 5)
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'date', 'description', 'amount', 'currency'})
+        self.assertEqual(list(response.data['errors'][1]['errors']), ['amount'])
+
+        rows = list(Expense.objects.filter(trip=self.trip).order_by('id').values_list(
+            'description', 'amount', 'currency', 'split_between', 'split_type'
+        ))
+        self.assertEqual(rows, [
+            ('Dinner', Decimal('1234.50'), 'EUR', ['Alice', 'Bob'], 'equal'),
+            ('Bus', Decimal('2.00'), 'EUR', [], 'equal'),
+            ('Snack', Decimal('3.00'), 'SGD', [], 'equal'),   # a bare $ is the trip's own dollars
+            ('Coffee', Decimal('4.50'), 'SGD', ['Bob'], 'equal'),
+        ])
+        self.assertEqual(Trip.objects.get(pk=self.trip.pk).version, version + 1)
+
+    def test_thousands_and_decimal_separators(self):
+        response = self.upload('expenses', (
+            'date,description,amount\n'
+            '2026-05-01,Hotel,"1.234,50 €"\n'
+            '2026-05-01,Flight,"$1,234.50"\n'
+            '2026-05-01,Tour,"1.234.567,89"\n'
+            '2026-05-02,Museum,1.234\n'
+            '2026-05-02,Taxi,"1.23,4"\n'
+        ))
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 2))
+        self.assertEqual([error['line'] for error in response.data['errors']], [5, 6])
+        self.assertIn('Ambiguous number', str(response.data['errors'][0]['errors']['amount']))
+        amounts = Expense.objects.filter(trip=self.trip).order_by('id').values_list('amount', flat=True)
+        self.assertEqual(list(amounts), [Decimal('1234.50'), Decimal('1234.50'), Decimal('1234567.89')])
+
+    def test_itinerary_appends_to_days_across_chunks(self):
+        Itinerary.objects.create(trip=self.trip, date='2026-05-01', location='Existing')
+        lines = ['date,location,time'] + [f'2026-05-01,Place {n},10:{n:02d}' for n in range(5)]
+        with override_settings(IMPORT_CHUNK_SIZE=2):
+            response = self.upload('itinerary', '\n'.join(lines))
+        self.assertEqual(response.data['created'], 5)
+        items = Itinerary.objects.filter(trip=self.trip).order_by('position')
+        self.assertEqual([item.position for item in items], list(range(6)))
+        self.assertEqual(items[5].location, 'Place 4')
+
+    def test_insert_rows_honours_overrides_and_defaults(self):
+        # Stop's queryset overrides bulk_create to fill in geohash
+        insert_rows(Stop, [{'trip_id': self.trip.pk, 'name': 'Louvre', 'latitude': 48.86, 'longitude': 2.34}], 10)
+        stop = Stop.objects.get()
+        self.assertEqual(stop.geohash, encode_geohash(48.86, 2.34))
+        # Callable and auto_now_add defaults are evaluated per row rather than frozen
+        insert_rows(GenerationJob, [{'destination': 'Oslo', 'destination_key': 'oslo', 'status': 'FAILED'}], 10)
+        job = GenerationJob.objects.get()
+        self.assertIsNotNone(job.created_at)
+        self.assertLessEqual(abs(job.queued_at - timezone.now()), timedelta(minutes=1))
+
+    def test_photo_urls_are_validated(self):
+        response = self.upload('itinerary', (
+            'date,location,photo_url\n'
+            '2026-05-01,Louvre,https://example.com/louvre.jpg?w=800\n'
+            '2026-05-01,Orsay,https://example.com/orsay 1.jpg\n'
+            '2026-05-01,Eiffel,https://-bad.example/x.jpg\n'
+        ))
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 2))
+        self.assertEqual(response.data['errors'][0]['errors'], {'photo_url': ['Enter a valid URL.']})
+
+    def test_unusable_file_imports_nothing(self):
+        response = self.client.post(
+            f'/api/trips/{self.trip.id}/expenses/import/', data='description,amount\nx,1\n', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.data['file'][0])
+        response = self.upload('expenses', 'date,description,amount\n2026-05-01,x,1\n2026-05-01,"unterminated,1\n')
+        self.assertEqual(response.status_code, 201)   # a trailing open quote runs to the end of the file
+        self.assertEqual(response.data['failed'], 1)
+
+    def test_reimports_a_csv_export(self):
+        source = make_trip(name='Source')
+        Expense.objects.create(trip=source, description='Taxi', amount='12.00', currency='EUR', date='2026-05-02')
+        Itinerary.objects.create(trip=source, date='2026-05-02', location='Louvre')
+        export = b''.join(self.client.get(f'/api/trips/{source.id}/export/', {'format': 'csv'}).streaming_content)
+        response = self.upload('expenses', export.decode())
+        self.assertEqual((response.data['created'], response.data['skipped']), (1, 2))
+        self.assertEqual(response.data['ignored_columns'], [])
+        self.assertEqual(Expense.objects.get(trip=self.trip).currency, 'EUR')
+
+    def test_import_trip_command(self):
+        out, err = StringIO(), StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as handle:
+            handle.write('date,description,amount\n2026-05-01,Museum,15\n2026-05-01,Broken,\n')
+            handle.flush()
+            call_command('import_trip', self.trip.id, expenses=handle.name, stdout=out, stderr=err)
+        self.assertIn('1 expense rows imported, 1 failed', out.getvalue())
+        self.assertIn('line 3: amount', err.getvalue())
+        self.assertEqual(Expense.objects.get(trip=self.trip).amount, Decimal('15.00'))
+
+    def test_returns_rows_created_per_chunk(self):
+        lines = ['date,description,amount'] + ['2026-05-01,x,1'] * 7
+        report = import_csv(self.trip, 'expense', lines, chunk_size=3)
+        self.assertEqual(report['created'], 7)
+        self.assertEqual(Expense.objects.filter(trip=self.trip).count(), 7)
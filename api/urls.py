@@ -1,7 +1,7 @@
 # api/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TripViewSet, StopViewSet, ItineraryViewSet, ExpenseViewSet, FlightViewSet, TravelMethodViewSet, MyActivityViewSet, generate_events_view
+from .views import TripViewSet, StopViewSet, ItineraryViewSet, ExpenseViewSet, FlightViewSet, TravelMethodViewSet, MyActivityViewSet, generate_events_view, generation_job_view, suggestion_cache_stats_view, trip_export_view, trips_export_view
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
@@ -15,6 +15,11 @@ router.register(r'my-activities', MyActivityViewSet)
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
+    # Ahead of the router, whose trips/{pk}/ route would otherwise claim trips/export/
+    path('trips/export/', trips_export_view, name='trips-export'),
+    path('trips/<int:pk>/export/', trip_export_view, name='trip-export'),
     path('', include(router.urls)),
     path('generate-events/', generate_events_view, name='generate-events'),
+    path('generate-events/jobs/<int:job_id>/', generation_job_view, name='generation-job'),
+    path('generate-events/stats/', suggestion_cache_stats_view, name='generate-events-stats'),
 ]
\ No newline at end of file
@@ -0,0 +1,107 @@
+# api/versioning.py
+"""
+Per-trip version tracking for conditional GETs.
+
+Trip.version goes up (and Trip.updated_at moves) whenever the trip or
+anything shown with it changes. That covers its stops, itinerary, expenses,
+flights (including their shared FlightInfo), travel methods and saved
+activities. The trip's child collection endpoints derive a strong ETag from
+the version, so an unchanged collection can be answered with a 304 before
+anything is serialized.
+
+Single-row saves bump the version from post_save receivers. Bulk writes,
+queryset deletes and deletes through the API bump it explicitly with
+`touch_trips`. There is deliberately no post_delete receiver: it would stop
+Django from fast-deleting a trip's children when the trip itself is deleted.
+"""
+import hashlib
+
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Trip, Stop, Itinerary, Expense, Flight, FlightInfo, TravelMethod, MyActivity
+
+TRIP_CHILD_MODELS = (Stop, Itinerary, Expense, Flight, TravelMethod, MyActivity)
+
+
+def touch_trips(trip_ids):
+    """Bump the version of every trip in `trip_ids` with a single UPDATE"""
+    trip_ids = {pk for pk in trip_ids if pk is not None}
+    if trip_ids:
+        Trip.objects.filter(pk__in=trip_ids).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def trip_etag(request, trip):
+    """
+    Strong ETag for a trip-scoped response. The trip's version covers the data;
+    the view, query string and renderer distinguish representations of it.
+    updated_at tells apart a new trip that reuses a deleted trip's id.
+    """
+    variant = '|'.join([
+        trip.updated_at.isoformat(),
+        request.path,
+        '&'.join(sorted(f'{key}={value}' for key, values in request.GET.lists() for value in values)),
+        getattr(getattr(request, 'accepted_renderer', None), 'format', '') or '',
+    ])
+    digest = hashlib.sha1(variant.encode()).hexdigest()[:12]
+    return f'"{trip.pk}-{trip.version}-{digest}"'
+
+
+def conditional_trip_response(request, trip, build):
+    """
+    Answer If-None-Match / If-Modified-Since from the trip's version, calling
+    `build()` to produce the full response only when the client's copy is stale.
+    """
+    etag = trip_etag(request, trip)
+    response = get_conditional_response(request, etag=etag, last_modified=trip.updated_at.timestamp())
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(trip.updated_at.timestamp())
+    # Let browsers keep the body but revalidate it on every request
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class TripVersionMixin:
+    """Viewset mixin bumping the owning trip(s) on update and delete"""
+    def perform_update(self, serializer):
+        old_trip_id = serializer.instance.trip_id
+        super().perform_update(serializer)
+        if serializer.instance.trip_id != old_trip_id:
+            touch_trips([old_trip_id])
+
+    def perform_destroy(self, instance):
+        trip_id = instance.trip_id
+        super().perform_destroy(instance)
+        touch_trips([trip_id])
+
+
+def _child_saved(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    touch_trips([instance.trip_id])
+
+
+def _trip_saved(sender, instance, created, **kwargs):
+    if created or kwargs.get('raw'):
+        return
+    touch_trips([instance.pk])
+    instance.refresh_from_db(fields=['version', 'updated_at'])
+
+
+def _flight_info_saved(sender, instance, created, **kwargs):
+    # A refreshed FlightInfo changes the flight payload of every trip that uses it
+    if created or kwargs.get('raw'):
+        return
+    touch_trips(Flight.objects.filter(info=instance).values_list('trip_id', flat=True).distinct())
+
+
+def connect_signals():
+    for model in TRIP_CHILD_MODELS:
+        post_save.connect(_child_saved, sender=model, dispatch_uid=f'trip_version_{model.__name__}')
+    post_save.connect(_trip_saved, sender=Trip, dispatch_uid='trip_version_Trip')
+    post_save.connect(_flight_info_saved, sender=FlightInfo, dispatch_uid='trip_version_FlightInfo')
@@ -1,12 +1,41 @@
 # api/views.py
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from .models import Trip, Stop, Itinerary, Expense, Flight, TravelMethod, MyActivity
-from .serializers import TripSerializer, StopSerializer, ItinerarySerializer, ExpenseSerializer, FlightSerializer, TravelMethodSerializer, MyActivitySerializer
-import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+from django.urls import reverse
+from .models import Trip, Stop, Itinerary, Expense, Flight, TravelMethod, MyActivity, GenerationJob, SuggestedEvent
+from .serializers import get_requested_fields, ConnectionLegSerializer, TripSerializer, StopSerializer, ItinerarySerializer, ExpenseSerializer, FlightSerializer, TravelMethodSerializer, MyActivitySerializer, TripCloneSerializer
+from .pagination import MyActivityCursorPagination, TravelMethodCursorPagination
+from .bulk import BulkModelMixin
+from .cloning import clone_trip
+from .expense_summary import summarize_expenses
+from .jobs import enqueue_generation, requeue_stale_jobs
+from .flight_info import get_flight_info
+from .importer import ImportFileError, decode_lines, import_csv
+from .http_client import ProviderUnavailable
+from .reorder import apply_itinerary_order, assign_positions, relocate_items
+from .routing import optimize_trip_route
+from .distance_matrix import get_trip_matrix, speed_profiles
+from .export import EXPORT_FORMATS, stream_export
+from .geo import nearby
+from .search import search_activities
+from .versioning import TripVersionMixin, conditional_trip_response, touch_trips
+from .suggestion_cache import cache_stats, get_cached_suggestions
+from .metrics import LLM_CALL_SECONDS, LLM_FALLBACKS, LLM_TOKENS, REGISTRY, render_prometheus
 import json
 import os
+import time
+from datetime import date
+
+import numpy as np
+import requests
 
 # You can use OpenAI, Anthropic, or any other LLM
 # For this example, I'll show a structure that works with OpenAI
@@ -26,13 +55,23 @@ def generate_events_with_llm(destination):
             import anthropic
             client = anthropic.Anthropic(api_key=os.environ.get('ANTHROPIC_API_KEY'))
             
-            message = client.messages.create(
-                model="claude-sonnet-4-5",
-                max_tokens=1500,
-                messages=[
-                    {"role": "user", "content": f"Suggest 5 tourist activities in {destination}. For each activity, provide a real Unsplash image URL that represents it. Return ONLY a valid JSON array (no markdown): [{{'name':'Activity Name','category':'Food|Attraction|Museum|Activity|Tour|Entertainment|Cultural|Shopping|Dining','duration':2.0,'estimatedCost':30,'description':'Description','imageUrl':'https://images.unsplash.com/photo-...'}}]. Use appropriate Unsplash URLs for real photos."}
-                ]
-            )
+            started = time.perf_counter()
+            try:
+                message = client.messages.create(
+                    model="claude-sonnet-4-5",
+                    max_tokens=1500,
+                    messages=[
+                        {"role": "user", "content": f"Suggest 5 tourist activities in {destination}. For each activity, provide a real Unsplash image URL that represents it. Return ONLY a valid JSON array (no markdown): [{{'name':'Activity Name','category':'Food|Attraction|Museum|Activity|Tour|Entertainment|Cultural|Shopping|Dining','duration':2.0,'estimatedCost':30,'description':'Description','imageUrl':'https://images.unsplash.com/photo-...'}}]. Use appropriate Unsplash URLs for real photos."}
+                    ]
+                )
+            except Exception:
+                LLM_CALL_SECONDS.observe(time.perf_counter() - started, provider='anthropic', outcome='error')
+                raise
+            LLM_CALL_SECONDS.observe(time.perf_counter() - started, provider='anthropic', outcome='success')
+            usage = getattr(message, 'usage', None)
+            if usage is not None:
+                LLM_TOKENS.inc(usage.input_tokens, provider='anthropic', type='input')
+                LLM_TOKENS.inc(usage.output_tokens, provider='anthropic', type='output')
             
             content = message.content[0].text.strip()
             if content.startswith('```'):
@@ -68,6 +107,7 @@ def generate_events_with_llm(destination):
     
     # Fallback to smart suggestions
     print(f"ℹ️  Using smart fallback for {destination}")
+    LLM_FALLBACKS.inc()
     return generate_smart_fallback(destination)
 
 def generate_smart_fallback(destination):
@@ -106,22 +146,22 @@ def generate_smart_fallback(destination):
 
 @api_view(['POST'])
 def generate_events_view(request):
-    """API endpoint to generate suggested events for a destination"""
-    from .models import SuggestedEvent
-    
+    """
+    API endpoint to generate suggested events for a destination.
+
+    Cached suggestions are returned immediately. Otherwise generation is queued
+    and a 202 with a job id is returned; poll the job's status_url for the result.
+    """
     destination = request.data.get('destination', '')
     force_regenerate = request.data.get('regenerate', False)  # Allow forcing new generation
     
     if not destination:
         return Response({'error': 'Destination is required'}, status=400)
     
-    # Normalize destination for consistent caching
-    destination_key = destination.strip().lower()
-    
     # Check if we have cached suggestions (unless force regenerate)
     if not force_regenerate:
-        try:
-            cached = SuggestedEvent.objects.get(destination__iexact=destination_key)
+        cached = get_cached_suggestions(destination)
+        if cached is not None:
             print(f"✨ Using cached events for {destination}")
             return Response({
                 'events': cached.events_data, 
@@ -129,43 +169,169 @@ def generate_events_view(request):
                 'cached': True,
                 'generated_at': cached.updated_at
             })
-        except SuggestedEvent.DoesNotExist:
-            pass
     
-    # Generate new events
-    events = generate_events_with_llm(destination)
-    
-    # Cache the results
+    # Generate new events in the background
+    job = enqueue_generation(destination)
+    return Response(_job_payload(request, job), status=202)
+
+def _job_payload(request, job):
+    payload = {
+        'job_id': job.pk,
+        'status': job.status,
+        'destination': job.destination,
+        'status_url': request.build_absolute_uri(reverse('generation-job', args=[job.pk])),
+        'created_at': job.created_at,
+    }
+    if job.status == GenerationJob.STATUS_SUCCEEDED:
+        payload.update({'events': job.events_data, 'cached': False, 'generated_at': job.finished_at})
+    elif job.status == GenerationJob.STATUS_FAILED:
+        payload['error'] = job.error
+    return payload
+
+@api_view(['GET'])
+def suggestion_cache_stats_view(request):
+    """Hit/miss counters for the suggested events cache (this worker process)"""
+    return Response({**cache_stats(), 'entries': SuggestedEvent.objects.count()})
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; a plain Django view so DRF content negotiation stays out of it"""
+    return HttpResponse(render_prometheus(REGISTRY.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _export_response(request, trip_ids, filename):
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'format': f"Expected one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+    response = StreamingHttpResponse(stream_export(export_format, trip_ids), content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+# Plain Django views: DRF would treat ?format= as a renderer choice
+@require_GET
+def trip_export_view(request, pk):
+    """Stream one trip with all its collections as JSON Lines (default) or ?format=csv"""
+    trip = get_object_or_404(Trip, pk=pk)
+    return conditional_trip_response(request, trip, lambda: _export_response(request, [trip.pk], f'trip-{trip.pk}'))
+
+@require_GET
+def trips_export_view(request):
+    """Stream every trip with all its collections as JSON Lines (default) or ?format=csv"""
+    return _export_response(request, None, 'trips')
+
+@api_view(['GET'])
+def generation_job_view(request, job_id):
+    """Poll the status of a background generation job"""
     try:
-        SuggestedEvent.objects.update_or_create(
-            destination__iexact=destination_key,
-            defaults={
-                'destination': destination,
-                'events_data': events
-            }
-        )
-        print(f"💾 Cached events for {destination}")
-    except Exception as e:
-        print(f"Warning: Failed to cache events: {e}")
-    
-    return Response({
-        'events': events, 
-        'destination': destination,
-        'cached': False
-    })
+        job = GenerationJob.objects.get(pk=job_id)
+    except GenerationJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=404)
+    if job.status in (GenerationJob.STATUS_PENDING, GenerationJob.STATUS_RUNNING) and requeue_stale_jobs(pk=job.pk):
+        job.refresh_from_db()
+    return Response(_job_payload(request, job))
+
+# Child collections the trip bundle can return: name -> (related_name, serializer)
+BUNDLE_COLLECTIONS = {
+    'itinerary': ('itinerary', ItinerarySerializer),
+    'flights': ('flights', FlightSerializer),
+    'travel_methods': ('travel_methods', TravelMethodSerializer),
+    'expenses': ('expenses', ExpenseSerializer),
+    'my_activities': ('my_activities', MyActivitySerializer),
+}
+
+def _bundle_prefetch(related_name):
+    if related_name == 'flights':
+        # Flight payloads live on the shared FlightInfo rows
+        return Prefetch('flights', queryset=Flight.objects.select_related('info'))
+    return related_name
 
 class TripViewSet(viewsets.ModelViewSet):
     queryset = Trip.objects.all()
     serializer_class = TripSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Nested stops are serialized per trip; load them in one query up front
+            requested = get_requested_fields(self.request)
+            if requested is None or 'stops' in requested:
+                queryset = queryset.prefetch_related('stops')
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def bundle(self, request, pk=None):
+        """Return the trip and its child collections in a single response"""
+        include = request.query_params.get('include')
+        if include:
+            names = [name.strip() for name in include.split(',') if name.strip()]
+            unknown = [name for name in names if name not in BUNDLE_COLLECTIONS]
+            if unknown:
+                return Response({
+                    'error': f"Unknown collection(s): {', '.join(unknown)}",
+                    'available': list(BUNDLE_COLLECTIONS),
+                }, status=400)
+        else:
+            names = list(BUNDLE_COLLECTIONS)
+
+        trip = self.get_object()
+        def build():
+            # One query per collection, however large the trip is
+            prefetch_related_objects(
+                [trip], 'stops', *[_bundle_prefetch(BUNDLE_COLLECTIONS[name][0]) for name in names]
+            )
+            data = {'trip': TripSerializer(trip).data}
+            for name in names:
+                related_name, serializer_class = BUNDLE_COLLECTIONS[name]
+                data[name] = serializer_class(getattr(trip, related_name).all(), many=True).data
+            return Response(data)
+
+        return conditional_trip_response(request, trip, build)
+
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Copy the trip and its contents server-side, optionally moved to a new start date"""
+        trip = self.get_object()
+        options = TripCloneSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+        new_trip, copied = clone_trip(trip, **options.validated_data)
+        return Response({'trip': TripSerializer(new_trip).data, 'copied': copied}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='optimize-route')
+    def optimize_route(self, request, pk=None):
+        """Reorder each day's stops for the shortest route (optionally only {"days": [1, 2]})"""
+        trip = self.get_object()
+        days = request.data.get('days') if isinstance(request.data, dict) else None
+        summary, changed = optimize_trip_route(trip, days)
+        return Response({'days': summary, 'updated': StopSerializer(changed, many=True).data})
+
+    @action(detail=True, methods=['get'], url_path='distance-matrix')
+    def distance_matrix(self, request, pk=None):
+        """Pairwise km and travel minutes between the trip's stops (?mode=WALK for one mode)"""
+        trip = self.get_object()
+        modes = [mode for mode, _ in speed_profiles()]
+        mode = request.query_params.get('mode')
+        if mode is not None and mode not in modes:
+            raise ValidationError({'mode': f"Must be one of: {', '.join(modes)}"})
+
+        def build():
+            matrix = get_trip_matrix(trip)
+            durations = matrix.durations()
+            return Response({
+                'stops': matrix.ids.tolist(),
+                'distance_km': np.round(matrix.dist, 3).tolist(),
+                'duration_min': {
+                    name: np.round(durations[name], 1).tolist() for name in ([mode] if mode else modes)
+                },
+            })
+
+        return conditional_trip_response(request, trip, build)
+
     @action(detail=True, methods=['get', 'post'])
     def itinerary(self, request, pk=None):
         trip = self.get_object()
         
         if request.method == 'GET':
-            itinerary = Itinerary.objects.filter(trip=trip)
-            serializer = ItinerarySerializer(itinerary, many=True)
-            return Response(serializer.data)
+            return conditional_trip_response(request, trip, lambda: Response(
+                ItinerarySerializer(Itinerary.objects.filter(trip=trip), many=True).data
+            ))
         
         elif request.method == 'POST':
             serializer = ItinerarySerializer(data=request.data)
@@ -174,14 +340,22 @@ class TripViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data, status=201)
             return Response(serializer.errors, status=400)
 
+    @action(detail=True, methods=['post'], url_path='itinerary/reorder')
+    def reorder_itinerary(self, request, pk=None):
+        """Persist a new ordering for one or more days; returns only the rows that changed"""
+        trip = self.get_object()
+        days = request.data.get('days') if isinstance(request.data, dict) else None
+        changed = apply_itinerary_order(trip, days)
+        return Response(ItinerarySerializer(changed, many=True).data)
+
     @action(detail=True, methods=['get', 'post'])
     def expenses(self, request, pk=None):
         trip = self.get_object()
         
         if request.method == 'GET':
-            expenses = Expense.objects.filter(trip=trip)
-            serializer = ExpenseSerializer(expenses, many=True)
-            return Response(serializer.data)
+            return conditional_trip_response(request, trip, lambda: Response(
+                ExpenseSerializer(Expense.objects.filter(trip=trip), many=True).data
+            ))
         
         elif request.method == 'POST':
             serializer = ExpenseSerializer(data=request.data)
@@ -190,68 +364,207 @@ class TripViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data, status=201)
             return Response(serializer.errors, status=400)
     
+    def _import(self, request, kind):
+        """CSV from a multipart `file` field, or a text/csv request body read as it arrives"""
+        trip = self.get_object()
+        if request.content_type.startswith('text/csv'):
+            source = request.stream or []
+        else:
+            source = request.FILES.get('file')
+            if source is None:
+                raise ValidationError({'file': ['Upload a CSV file in the "file" field or send a text/csv body.']})
+        try:
+            report = import_csv(trip, kind, decode_lines(source))
+        except ImportFileError as e:
+            raise ValidationError({'file': [str(e)]})
+        if report['created']:
+            return Response(report, status=201)
+        return Response(report, status=400 if report['failed'] else 200)
+
+    @action(detail=True, methods=['post'], url_path='expenses/import')
+    def expenses_import(self, request, pk=None):
+        """Import expenses from CSV; invalid rows are reported by line and skipped"""
+        return self._import(request, 'expense')
+
+    @action(detail=True, methods=['post'], url_path='itinerary/import')
+    def itinerary_import(self, request, pk=None):
+        """Import itinerary items from CSV, appended to their days; invalid rows are reported and skipped"""
+        return self._import(request, 'itinerary')
+
+    @action(detail=True, methods=['get'], url_path='expenses/summary')
+    def expenses_summary(self, request, pk=None):
+        """Totals, per-traveler balances and settle-up transfers computed server-side"""
+        trip = self.get_object()
+        return Response(summarize_expenses(trip))
+
     @action(detail=True, methods=['get', 'post'])
     def flights(self, request, pk=None):
         trip = self.get_object()
         
         if request.method == 'GET':
-            flights = Flight.objects.filter(trip=trip)
-            serializer = FlightSerializer(flights, many=True)
-            return Response(serializer.data)
+            return conditional_trip_response(request, trip, lambda: Response(
+                FlightSerializer(Flight.objects.filter(trip=trip).select_related('info'), many=True).data
+            ))
         
         elif request.method == 'POST':
             flight_number = request.data.get('flight_number')
             flight_date = request.data.get('flight_date')
+            if not flight_number or not flight_date:
+                return Response({'error': 'flight_number and flight_date are required'}, status=400)
+            try:
+                flight_date = date.fromisoformat(str(flight_date))
+            except ValueError:
+                return Response({'error': 'flight_date must be in YYYY-MM-DD format'}, status=400)
             
-            # Check if flight data already exists in cache (database)
-            existing_flight = Flight.objects.filter(
-                flight_number=flight_number,
-                flight_date=flight_date
-            ).first()
-            
-            if existing_flight and existing_flight.flight_data:
-                # Use cached data, just create new instance for this trip
-                flight = Flight.objects.create(
-                    trip=trip,
-                    flight_number=flight_number,
-                    flight_date=flight_date,
-                    flight_data=existing_flight.flight_data
-                )
-                serializer = FlightSerializer(flight)
-                return Response(serializer.data, status=201)
-            
-            # Call AviationStack API only if not cached
-            api_key = '07bae69d8481c9ded885382fc2e5c6e8'
-            url = f'http://api.aviationstack.com/v1/flights'
-            params = {
-                'access_key': api_key,
-                'flight_iata': flight_number
-            }
-            
+            # Shared cache: one AviationStack lookup per flight and day, reused by every trip
             try:
-                response = requests.get(url, params=params)
-                api_data = response.json()
-                
-                # Create flight with API data
-                flight = Flight.objects.create(
-                    trip=trip,
-                    flight_number=flight_number,
-                    flight_date=flight_date,
-                    flight_data=api_data.get('data', [{}])[0] if api_data.get('data') else {}
-                )
-                
-                serializer = FlightSerializer(flight)
-                return Response(serializer.data, status=201)
+                info = get_flight_info(flight_number, flight_date)
+            except ProviderUnavailable as e:
+                return Response({'error': str(e)}, status=503)
+            except (requests.RequestException, ValueError) as e:
+                # Upstream failure (5xx, timeout, bad JSON) with nothing cached to fall back on
+                return Response({'error': f'Flight provider error: {e}'}, status=502)
             except Exception as e:
                 return Response({'error': str(e)}, status=400)
 
-class StopViewSet(viewsets.ModelViewSet):
+            flight = Flight.objects.create(
+                trip=trip,
+                flight_number=flight_number,
+                flight_date=flight_date,
+                info=info
+            )
+            serializer = FlightSerializer(flight)
+            return Response(serializer.data, status=201)
+
+    @action(detail=True, methods=['get'], url_path='travel-methods')
+    def travel_methods(self, request, pk=None):
+        """Cursor-paginated travel methods for this trip (supports ?from_stop__date= and ?page_size=)"""
+        trip = self.get_object()
+        paginator = TravelMethodCursorPagination()
+        travel_methods = filter_by_from_stop_date(TravelMethod.objects.filter(trip=trip), request.query_params)
+        page = paginator.paginate_queryset(travel_methods, request, view=self)
+        serializer = TravelMethodSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='my-activities')
+    def my_activities(self, request, pk=None):
+        """Cursor-paginated saved activities for this trip (supports ?fields= and ?page_size=)"""
+        trip = self.get_object()
+        paginator = MyActivityCursorPagination()
+        page = paginator.paginate_queryset(MyActivity.objects.filter(trip=trip), request, view=self)
+        serializer = MyActivitySerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get', 'put'], url_path=r'connections/(?P<from_stop>\d+)/(?P<to_stop>\d+)')
+    def connections(self, request, pk=None, from_stop=None, to_stop=None):
+        """Read or atomically replace the ordered travel legs between two itinerary stops"""
+        trip = self.get_object()
+        from_stop, to_stop = int(from_stop), int(to_stop)
+        stops = Itinerary.objects.filter(trip=trip).in_bulk([from_stop, to_stop])
+        missing = [stop_id for stop_id in (from_stop, to_stop) if stop_id not in stops]
+        if missing:
+            return Response({'error': f"Itinerary stop(s) {missing} do not belong to this trip"}, status=404)
+        
+        legs = TravelMethod.objects.filter(trip=trip, from_stop_id=from_stop, to_stop_id=to_stop)
+        
+        if request.method == 'GET':
+            serializer = TravelMethodSerializer(legs.order_by('order'), many=True)
+            return Response(serializer.data)
+        
+        elif request.method == 'PUT':
+            if from_stop == to_stop:
+                return Response({'error': 'A connection needs two different stops'}, status=400)
+            # Accept a bare list of legs or {"legs": [...]}
+            data = request.data.get('legs') if isinstance(request.data, dict) else request.data
+            if not isinstance(data, list):
+                return Response({'error': 'Expected a list of legs'}, status=400)
+            serializer = ConnectionLegSerializer(data=data, many=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=400)
+            
+            with transaction.atomic():
+                legs.delete()
+                created = TravelMethod.objects.bulk_create([
+                    TravelMethod(trip=trip, from_stop=stops[from_stop], to_stop=stops[to_stop], order=order, **leg)
+                    for order, leg in enumerate(serializer.validated_data)
+                ])
+                touch_trips([trip.pk])
+            return Response(TravelMethodSerializer(created, many=True).data)
+
+def filter_by_trip(queryset, params):
+    """Apply ?trip=<id> to a queryset of trip-owned rows"""
+    trip = params.get('trip')
+    if trip is not None:
+        if not trip.isdigit():
+            raise ValidationError({'trip': 'Must be an integer trip id'})
+        queryset = queryset.filter(trip_id=int(trip))
+    return queryset
+
+def filter_by_from_stop_date(queryset, params):
+    """Apply ?from_stop__date=YYYY-MM-DD to a queryset of travel methods"""
+    from_stop_date = params.get('from_stop__date')
+    if from_stop_date is not None:
+        try:
+            from_stop_date = date.fromisoformat(from_stop_date)
+        except ValueError:
+            raise ValidationError({'from_stop__date': 'Must be a date in YYYY-MM-DD format'})
+        queryset = queryset.filter(from_stop__date=from_stop_date)
+    return queryset
+
+def _float_param(params, name, low, high, default=None):
+    value = params.get(name)
+    if value is None and default is not None:
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'A number is required'})
+    if not low <= value <= high:
+        raise ValidationError({name: f'Must be between {low} and {high}'})
+    return value
+
+class StopViewSet(TripVersionMixin, BulkModelMixin, viewsets.ModelViewSet):
     queryset = Stop.objects.all()
     serializer_class = StopSerializer
 
-class ItineraryViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Stops within ?radius= km (default 1) of ?lat=&lng=, nearest first (optional ?trip= and ?limit=)"""
+        params = request.query_params
+        latitude = _float_param(params, 'lat', -90, 90)
+        longitude = _float_param(params, 'lng', -180, 180)
+        radius = _float_param(params, 'radius', 0, settings.NEARBY_MAX_RADIUS_KM, default=1.0)
+        limit = params.get('limit', '50')
+        if not limit.isdigit() or not 1 <= int(limit) <= 500:
+            raise ValidationError({'limit': 'Must be an integer between 1 and 500'})
+
+        hits = nearby(filter_by_trip(self.get_queryset(), params), latitude, longitude, radius, int(limit))
+        stops = Stop.objects.in_bulk([pk for pk, _ in hits])
+        results = [
+            {**self.get_serializer(stops[pk]).data, 'distance_km': round(km, 3)} for pk, km in hits
+        ]
+        return Response({'results': results})
+
+class ItineraryViewSet(TripVersionMixin, BulkModelMixin, viewsets.ModelViewSet):
     queryset = Itinerary.objects.all()
     serializer_class = ItinerarySerializer
+
+    def prepare_bulk_create(self, instances):
+        assign_positions(instances)
+
+    def prepare_bulk_update(self, changes):
+        moves = []
+        for instance, data in changes:
+            trip_id = data['trip'].pk if 'trip' in data else instance.trip_id
+            day = data.get('date', instance.date)
+            if (trip_id, day) != (instance.trip_id, instance.date):
+                moves.append((instance, trip_id, day, data))
+        if moves:
+            positions = relocate_items([(instance, trip_id, day) for instance, trip_id, day, _ in moves])
+            # Includes items of this batch that only closed up behind a moved one
+            for instance, data in changes:
+                if instance.pk in positions:
+                    data['position'] = positions[instance.pk]
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -260,19 +573,46 @@ class ItineraryViewSet(viewsets.ModelViewSet):
         TravelMethod.objects.filter(to_stop=instance).delete()
         return super().destroy(request, *args, **kwargs)
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(TripVersionMixin, BulkModelMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
 
-class FlightViewSet(viewsets.ModelViewSet):
-    queryset = Flight.objects.all()
+class FlightViewSet(TripVersionMixin, viewsets.ModelViewSet):
+    queryset = Flight.objects.select_related('info')
     serializer_class = FlightSerializer
 
-class TravelMethodViewSet(viewsets.ModelViewSet):
+class TravelMethodViewSet(TripVersionMixin, BulkModelMixin, viewsets.ModelViewSet):
     queryset = TravelMethod.objects.all()
     serializer_class = TravelMethodSerializer
+    pagination_class = TravelMethodCursorPagination
 
-class MyActivityViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+
+        # ?trip=<id> keeps the listing on the (trip, from_stop, order) index
+        queryset = filter_by_trip(queryset, params)
+        return filter_by_from_stop_date(queryset, params)
+
+class MyActivityViewSet(TripVersionMixin, BulkModelMixin, viewsets.ModelViewSet):
     queryset = MyActivity.objects.all()
     serializer_class = MyActivitySerializer
+    pagination_class = MyActivityCursorPagination
+
+    def get_queryset(self):
+        return filter_by_trip(super().get_queryset(), self.request.query_params)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over place and activity (?q=, optional ?trip= and ?limit=, max 100)"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'A search query is required'})
+        limit = request.query_params.get('limit', '20')
+        if not limit.isdigit() or not 1 <= int(limit) <= 100:
+            raise ValidationError({'limit': 'Must be an integer between 1 and 100'})
+
+        results = search_activities(text, self.get_queryset(), limit=int(limit))
+        serializer = self.get_serializer(results, many=True)
+        return Response({'query': text, 'results': serializer.data})
 
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 import dj_database_url
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -98,6 +100,9 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # A file rather than shared-cache memory, so threaded tests wait
+            # on locks instead of failing with "table is locked"
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
@@ -153,6 +158,112 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
     'http://localhost:5173'
 ).split(',')
 
+# How long looked-up FX rates stay in the in-process cache (seconds)
+FX_RATE_CACHE_SECONDS = int(os.environ.get('FX_RATE_CACHE_SECONDS', '3600'))
+
+# Background LLM generation: 'thread' (in-process pool), 'db' (run_generation_jobs worker) or 'sync'
+LLM_JOB_BACKEND = os.environ.get('LLM_JOB_BACKEND', 'thread')
+LLM_JOB_WORKERS = int(os.environ.get('LLM_JOB_WORKERS', '2'))
+LLM_MAX_CONCURRENT_CALLS = int(os.environ.get('LLM_MAX_CONCURRENT_CALLS', '2'))
+# Jobs RUNNING longer than this (seconds), or left PENDING that long by the thread
+# or sync backend, are assumed to have lost their runner and are requeued
+LLM_JOB_TIMEOUT = int(os.environ.get('LLM_JOB_TIMEOUT', '300'))
+
+# Suggested events cache: entries older than the TTL (seconds) are regenerated,
+# and evict_suggested_events trims the table down to SUGGESTED_EVENTS_MAX_ENTRIES
+SUGGESTED_EVENTS_TTL = int(os.environ.get('SUGGESTED_EVENTS_TTL', str(30 * 24 * 3600)))
+SUGGESTED_EVENTS_MAX_ENTRIES = int(os.environ.get('SUGGESTED_EVENTS_MAX_ENTRIES', '5000'))
+# Minimum seconds between last_used_at writes for the same entry
+SUGGESTED_EVENTS_TOUCH_INTERVAL = int(os.environ.get('SUGGESTED_EVENTS_TOUCH_INTERVAL', '3600'))
+
+# AviationStack flight lookups, shared across trips for FLIGHT_INFO_TTL seconds
+AVIATIONSTACK_URL = os.environ.get('AVIATIONSTACK_URL', 'http://api.aviationstack.com/v1')
+AVIATIONSTACK_API_KEY = os.environ.get('AVIATIONSTACK_API_KEY', '07bae69d8481c9ded885382fc2e5c6e8')
+FLIGHT_INFO_TTL = int(os.environ.get('FLIGHT_INFO_TTL', str(6 * 3600)))
+
+# Outbound HTTP (api/http_client.py): timeouts in seconds, retries with backoff,
+# and a circuit breaker that fails fast after consecutive failures
+OUTBOUND_HTTP_DEFAULTS = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'backoff_factor': 0.5,
+    'pool_connections': 4,
+    'pool_maxsize': 10,
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+OUTBOUND_HTTP_PROVIDERS = {
+    'aviationstack': {
+        'read_timeout': float(os.environ.get('AVIATIONSTACK_TIMEOUT', '5')),
+    },
+}
+
+# Largest list accepted by the /bulk/ endpoints on each resource
+BULK_MAX_BATCH_SIZE = int(os.environ.get('BULK_MAX_BATCH_SIZE', '1000'))
+
+# Rows fetched per database round trip by the streaming exports (api/export.py)
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))
+
+# CSV imports (api/importer.py): rows per bulk_create, and per-row errors listed in the report
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '5000'))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', '1000'))
+
+# optimize-route (api/routing.py) solves days with up to this many movable stops
+# exactly (every order is tried, so keep it small); larger days use 2-opt/Or-opt
+ROUTE_EXACT_MAX_STOPS = int(os.environ.get('ROUTE_EXACT_MAX_STOPS', '8'))
+
+# Door-to-door estimates per TravelMethod mode for the trip distance matrix
+# (api/distance_matrix.py): km * detour / speed_kmh * 60 + overhead_min minutes.
+# TRAVEL_SPEED_PROFILES in the environment (JSON) overrides individual modes.
+TRAVEL_SPEED_PROFILES = {
+    'WALK': {'speed_kmh': 4.8, 'detour': 1.3, 'overhead_min': 0},
+    'CYCLE': {'speed_kmh': 15, 'detour': 1.3, 'overhead_min': 2},
+    'BUS': {'speed_kmh': 18, 'detour': 1.4, 'overhead_min': 8},
+    'TRAIN': {'speed_kmh': 35, 'detour': 1.2, 'overhead_min': 10},
+    'DRIVE': {'speed_kmh': 30, 'detour': 1.4, 'overhead_min': 5},
+    'PRIVATE_HIRE': {'speed_kmh': 30, 'detour': 1.4, 'overhead_min': 8},
+}
+TRAVEL_SPEED_PROFILES.update(json.loads(os.environ.get('TRAVEL_SPEED_PROFILES', '{}')))
+# Largest ?radius= (km) accepted by /api/stops/nearby/
+NEARBY_MAX_RADIUS_KM = float(os.environ.get('NEARBY_MAX_RADIUS_KM', '100'))
+# Trips whose distance matrices each worker keeps in memory
+DISTANCE_MATRIX_CACHE_TRIPS = int(os.environ.get('DISTANCE_MATRIX_CACHE_TRIPS', '256'))
+
+# Per-request instrumentation (api/middleware.py): Server-Timing header and, with
+# PERF_LOG_REQUESTS, a JSON log line per request; requests slower than
+# PERF_SLOW_REQUEST_MS (0 = off) also log up to PERF_SLOW_SQL_LIMIT of the SQL
+# statements they ran
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', 'True') == 'True'
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', 'True') == 'True'
+PERF_LOG_REQUESTS = os.environ.get('PERF_LOG_REQUESTS', 'False') == 'True'
+PERF_SLOW_REQUEST_MS = float(os.environ.get('PERF_SLOW_REQUEST_MS', '0'))
+PERF_SLOW_SQL_LIMIT = int(os.environ.get('PERF_SLOW_SQL_LIMIT', '200'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'performance': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'api.performance': {
+            'handlers': ['performance'],
+            'level': os.environ.get('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Prometheus metrics (api/metrics.py). Under gunicorn, point METRICS_DIR at a
+# directory shared by the workers (emptied on restart) so /metrics reports all
+# of them; each worker rewrites its snapshot every METRICS_FLUSH_INTERVAL s after a change
+METRICS_DIR = os.environ.get('METRICS_DIR', os.environ.get('PROMETHEUS_MULTIPROC_DIR', ''))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0'))
+
 # Allow CORS for all origins in development
 if DEBUG:
     CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
@@ -91,9 +91,15 @@ export default function ItineraryTab({ trip }) {
 
   const fetchTravelMethods = async () => {
     try {
-      const response = await axios.get(`${API_URL}/api/travel-methods/`);
-      const tripMethods = response.data.filter(tm => tm.trip === trip.id);
-      setTravelMethods(tripMethods);
+      // Cursor-paginated: follow `next` until every leg is loaded
+      const methods = [];
+      let url = `${API_URL}/api/trips/${trip.id}/travel-methods/`;
+      while (url) {
+        const response = await axios.get(url);
+        methods.push(...response.data.results);
+        url = response.data.next;
+      }
+      setTravelMethods(methods);
     } catch (error) {
       console.error("Error fetching travel methods:", error);
       setTravelMethods([]);
@@ -181,19 +187,10 @@ export default function ItineraryTab({ trip }) {
 
   const handleSubmitTravelMethod = async (methods) => {
     try {
-      const existing = travelMethods.filter(
-        tm => tm.from_stop === selectedFromStop.id && tm.to_stop === selectedToStop.id
-      );
-      for (const tm of existing) {
-        await axios.delete(`${API_URL}/api/travel-methods/${tm.id}/`);
-      }
-
-      for (let i = 0; i < methods.length; i++) {
-        const method = methods[i];
-        await axios.post(`${API_URL}/api/travel-methods/`, {
-          trip: trip.id,
-          from_stop: selectedFromStop.id,
-          to_stop: selectedToStop.id,
+      // Replace every leg of this connection in one atomic request
+      const response = await axios.put(
+        `${API_URL}/api/trips/${trip.id}/connections/${selectedFromStop.id}/${selectedToStop.id}/`,
+        methods.map(method => ({
           mode: method.mode,
           distance: parseFloat(method.distance),
           duration: parseFloat(method.duration),
@@ -201,15 +198,18 @@ export default function ItineraryTab({ trip }) {
           line_number: method.lineNumber || '',
           boarding_stop: method.boardingStop || '',
           alighting_stop: method.alightingStop || '',
-          number_of_stops: parseInt(method.numberOfStops || 0),
-          order: i
-        });
-      }
+          number_of_stops: parseInt(method.numberOfStops || 0)
+        }))
+      );
 
+      // The response holds the new legs, so no refetch is needed
+      setTravelMethods(prev => [
+        ...prev.filter(tm => !(tm.from_stop === selectedFromStop.id && tm.to_stop === selectedToStop.id)),
+        ...response.data
+      ]);
       setIsTravelModalOpen(false);
       setSelectedFromStop(null);
       setSelectedToStop(null);
-      await fetchTravelMethods();
     } catch (error) {
       console.error("Error saving travel method:", error);
       alert("Failed to save travel method");
@@ -247,6 +247,38 @@ export default function ItineraryTab({ trip }) {
     setDragOverStop(stopId);
   };
 
+  // Send the new ordering for the affected days and merge the rows the server changed
+  const saveOrder = async (dayOrders) => {
+    const response = await axios.post(`${API_URL}/api/trips/${trip.id}/itinerary/reorder/`, {
+      days: dayOrders
+    });
+    const changed = new Map(response.data.map(stop => [stop.id, stop]));
+    setItinerary(prev => {
+      const grouped = {};
+      Object.values(prev).flat().forEach(stop => {
+        const updated = changed.get(stop.id) || stop;
+        if (!grouped[updated.date]) {
+          grouped[updated.date] = [];
+        }
+        grouped[updated.date].push(updated);
+      });
+      Object.values(grouped).forEach(stops => stops.sort((a, b) => a.position - b.position));
+      return grouped;
+    });
+  };
+
+  // Orderings for a move of `stop` into `targetDay` at `targetIndex` (end of day if null)
+  const buildDayOrders = (stop, originalDay, targetDay, targetIndex) => {
+    const targetIds = (itinerary[targetDay] || []).map(s => s.id).filter(id => id !== stop.id);
+    const index = targetIndex === null || targetIndex < 0 ? targetIds.length : targetIndex;
+    targetIds.splice(index, 0, stop.id);
+    const dayOrders = { [targetDay]: targetIds };
+    if (originalDay !== targetDay) {
+      dayOrders[originalDay] = (itinerary[originalDay] || []).map(s => s.id).filter(id => id !== stop.id);
+    }
+    return dayOrders;
+  };
+
   const handleStopDrop = async (e, targetStop, targetDay) => {
     e.preventDefault();
     e.stopPropagation();
@@ -258,14 +290,8 @@ export default function ItineraryTab({ trip }) {
     // Reorder stops within the same day or move to different day
     try {
       const stops = itinerary[targetDay] || [];
-      const targetIndex = stops.findIndex(s => s.id === targetStop.id);
-      
-      // Update the dragged stop's date
-      await axios.patch(`${API_URL}/api/itinerary/${draggedStop.stop.id}/`, {
-        date: targetDay
-      });
-      
-      await fetchItinerary();
+      const targetIndex = stops.filter(s => s.id !== draggedStop.stop.id).findIndex(s => s.id === targetStop.id);
+      await saveOrder(buildDayOrders(draggedStop.stop, draggedStop.originalDay, targetDay, targetIndex));
       setDraggedStop(null);
     } catch (error) {
       console.error('Error reordering stop:', error);
@@ -313,10 +339,7 @@ export default function ItineraryTab({ trip }) {
     // Handle moving existing stop to new day
     if (draggedStop) {
       try {
-        await axios.patch(`${API_URL}/api/itinerary/${draggedStop.stop.id}/`, {
-          date: dayInfo.dateString
-        });
-        await fetchItinerary();
+        await saveOrder(buildDayOrders(draggedStop.stop, draggedStop.originalDay, dayInfo.dateString, null));
         setDraggedStop(null);
       } catch (error) {
         console.error('Error moving stop:', error);
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { Plus, Clock, DollarSign, GripVertical, ExternalLink, Edit, Trash2 } from 'lucide-react';
+import { Plus, Clock, DollarSign, GripVertical, ExternalLink, Edit, Trash2, Search } from 'lucide-react';
 import axios from 'axios';
 import API_URL from '../config';
 import AddMyActivityModal from './AddMyActivityModal';
@@ -9,25 +9,58 @@ export default function MyActivities({ tripId, onDragStart }) {
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [editingActivity, setEditingActivity] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [searchQuery, setSearchQuery] = useState('');
 
+  // First page of this trip's activities; further pages are loaded on demand
   const fetchActivities = async () => {
     try {
-      const response = await axios.get(`${API_URL}/api/my-activities/`);
-      const tripActivities = response.data.filter(activity => activity.trip === tripId);
-      setActivities(tripActivities);
+      const response = await axios.get(`${API_URL}/api/trips/${tripId}/my-activities/`);
+      setActivities(response.data.results);
+      setNextPage(response.data.next);
       setIsLoading(false);
     } catch (error) {
       console.error('Error fetching my activities:', error);
       setActivities([]);
+      setNextPage(null);
       setIsLoading(false);
     }
   };
 
+  const loadMore = async () => {
+    if (!nextPage) return;
+    try {
+      const response = await axios.get(nextPage);
+      setActivities(prev => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Error loading more activities:', error);
+    }
+  };
+
+  const searchActivities = async (query) => {
+    try {
+      const response = await axios.get(`${API_URL}/api/my-activities/search/`, {
+        params: { q: query, trip: tripId }
+      });
+      setActivities(response.data.results);
+      setNextPage(null);
+    } catch (error) {
+      console.error('Error searching activities:', error);
+    }
+  };
+
+  // Debounce typing so each keystroke doesn't hit the server
   useEffect(() => {
-    if (tripId) {
+    if (!tripId) return;
+    const query = searchQuery.trim();
+    if (!query) {
       fetchActivities();
+      return;
     }
-  }, [tripId]);
+    const timer = setTimeout(() => searchActivities(query), 300);
+    return () => clearTimeout(timer);
+  }, [tripId, searchQuery]);
 
   const handleSubmit = async (activityData) => {
     try {
@@ -106,6 +139,17 @@ export default function MyActivities({ tripId, onDragStart }) {
         Drag activities to add them to your itinerary
       </p>
 
+      <div className="relative mb-4">
+        <Search size={16} className="absolute left-3 top-1/2 -translate-y-1/2 text-gray-400" />
+        <input
+          type="text"
+          value={searchQuery}
+          onChange={(e) => setSearchQuery(e.target.value)}
+          placeholder="Search activities..."
+          className="w-full pl-9 pr-3 py-2 text-sm border border-gray-200 rounded-lg focus:outline-none focus:ring-2 focus:ring-teal-500"
+        />
+      </div>
+
       {isLoading ? (
         <div className="text-center py-8">
           <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-teal-600 mx-auto"></div>
@@ -113,8 +157,14 @@ export default function MyActivities({ tripId, onDragStart }) {
         </div>
       ) : activities.length === 0 ? (
         <div className="text-center py-8 border-2 border-dashed border-gray-200 rounded-lg">
-          <p className="text-gray-400 mb-2">No activities yet</p>
-          <p className="text-sm text-gray-400">Click + to add your first activity</p>
+          {searchQuery.trim() ? (
+            <p className="text-gray-400">No matching activities</p>
+          ) : (
+            <>
+              <p className="text-gray-400 mb-2">No activities yet</p>
+              <p className="text-sm text-gray-400">Click + to add your first activity</p>
+            </>
+          )}
         </div>
       ) : (
         <div className="space-y-3 max-h-[600px] overflow-y-auto pr-2">
@@ -204,6 +254,14 @@ export default function MyActivities({ tripId, onDragStart }) {
               )}
             </div>
           ))}
+          {nextPage && (
+            <button
+              onClick={loadMore}
+              className="w-full py-2 text-sm text-teal-700 hover:bg-teal-50 rounded-lg transition"
+            >
+              Load more
+            </button>
+          )}
         </div>
       )}
 
@@ -44,6 +44,10 @@ const getFallbackEvents = (destination) => {
   return eventDatabase[destinationKey];
 };
 
+// Give up on a background generation job after ~90s and show the fallback events
+const POLL_INTERVAL_MS = 1500;
+const MAX_POLL_ATTEMPTS = 60;
+
 // Category color mapping
 const getCategoryColors = (category) => {
   const colors = {
@@ -75,12 +79,26 @@ export default function SuggestedEvents({ destination, onDragStart }) {
         destination: destination,
         regenerate: forceRegenerate  // Force new generation on refresh
       });
+
+      // Uncached destinations are generated in the background: poll the job until it finishes
+      let result = response.data;
+      let attempts = 0;
+      while (result.status === 'PENDING' || result.status === 'RUNNING') {
+        if (++attempts > MAX_POLL_ATTEMPTS) {
+          throw new Error('Timed out waiting for suggestions');
+        }
+        await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+        result = (await axios.get(result.status_url)).data;
+      }
+      if (result.status === 'FAILED') {
+        throw new Error(result.error || 'Generation failed');
+      }
       
-      setEvents(response.data.events || []);
+      setEvents(result.events || []);
       
       // Show if using cached data
-      if (response.data.cached && !forceRegenerate) {
-        console.log('📦 Using cached suggestions from', new Date(response.data.generated_at).toLocaleString());
+      if (result.cached && !forceRegenerate) {
+        console.log('📦 Using cached suggestions from', new Date(result.generated_at).toLocaleString());
       }
     } catch (err) {
       console.error('Error generating events:', err);